@@ -0,0 +1,78 @@
+"""Compare the time to load every family in the content directory, and the
+memory the loaded families use, with 'data' as a list of rows and as a
+``DatasetTable``.
+
+Usage:
+    python lib/benchmarks/dataset_table.py [content_dir]
+"""
+
+import gc
+import json
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import Any
+
+from dsets.lib.doctree import Doctree
+from dsets.schemas import DatasetFamily
+
+
+def _to_table(rows: list[dict[str, Any]]) -> dict[str, Any]:
+    names = list(dict.fromkeys(name for row in rows for name in row["parameters"]))
+    table: dict[str, Any] = {
+        "dataUrl": [row.get("dataUrl") for row in rows],
+        "parameters": {
+            name: [row["parameters"].get(name) for row in rows] for name in names
+        },
+    }
+    if any(row.get("extra") for row in rows):
+        table["extra"] = [row.get("extra", {}) for row in rows]
+
+    return table
+
+
+def _convert(content_dir: Path) -> None:
+    for path in content_dir.rglob("**/dataset.json"):
+        family = json.loads(path.read_text("utf-8"))
+        if isinstance(rows := family.get("data"), list):
+            family["data"] = _to_table(rows)
+            path.write_text(json.dumps(family), "utf-8")
+
+
+def _run(content_dir: Path) -> dict[str, float]:
+    dataset_json_paths = list(content_dir.rglob("**/dataset.json"))
+    doctree = Doctree(content_dir)
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    families = [
+        DatasetFamily.from_os_path(doctree, path) for path in dataset_json_paths
+    ]
+    seconds = time.perf_counter() - start
+    gc.collect()
+    retained, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "families": len(families),
+        "seconds": seconds,
+        "retained_kib": retained / 1024,
+    }
+
+
+def main(content_dir: Path) -> None:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        table_content_dir = Path(shutil.copytree(content_dir, Path(tmp_dir, "content")))
+        _convert(table_content_dir)
+
+        for name, path in (("rows", content_dir), ("table", table_content_dir)):
+            result = _run(path)
+            print(name, " ".join(f"{key}={value:g}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main(Path(sys.argv[1] if len(sys.argv) > 1 else "content"))
@@ -0,0 +1,61 @@
+"""Compare the time and memory used to load every family in the content
+directory, when every object is registered in the ``Doctree`` and when no
+types are tracked.
+
+Usage:
+    python lib/benchmarks/doctree_registration.py [content_dir]
+"""
+
+import gc
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from dsets.builder import validate_family
+from dsets.lib.doctree import Doctree
+from dsets.lib.doctree.object import DoctreeObj
+
+
+class _TrackAllDoctree(Doctree):
+    """Registers every object, like the tree did before ``tracked_types``."""
+
+    def register_object(self, obj: DoctreeObj) -> None:
+        self._objects[type(obj)][next(self._object_ids)] = obj
+
+
+def _run(doctree: Doctree, content_dir: Path) -> dict[str, float]:
+    dataset_json_paths = list(content_dir.rglob("**/dataset.json"))
+
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    families = [validate_family(doctree, path) for path in dataset_json_paths]
+    seconds = time.perf_counter() - start
+    gc.collect()
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "families": len(families),
+        "registered": sum(len(objects) for objects in doctree._objects.values()),
+        "seconds": seconds,
+        "retained_kib": retained / 1024,
+        "peak_kib": peak / 1024,
+    }
+
+
+def main(content_dir: Path) -> None:
+    # Load once, so that both runs start with warm adapters and imports
+    _run(Doctree(content_dir), content_dir)
+
+    for name, doctree in (
+        ("track_all", _TrackAllDoctree(content_dir)),
+        ("track_none", Doctree(content_dir)),
+    ):
+        result = _run(doctree, content_dir)
+        print(name, " ".join(f"{key}={value:g}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main(Path(sys.argv[1] if len(sys.argv) > 1 else "content"))
@@ -0,0 +1,61 @@
+"""Count the ``TypeAdapter`` instances built while compiling the content
+directory, with and without the adapter registry.
+
+Usage:
+    python lib/benchmarks/type_adapters.py [content_dir]
+"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+from unittest.mock import patch
+
+import pydantic
+from dsets.builder import compile_dataset_build
+from dsets.lib.pydantic_util import TypeAdapterRegistry, type_adapters
+
+
+class _UncachedRegistry(TypeAdapterRegistry):
+    def get(self, type_):
+        return self._build(type_)
+
+
+def _run(content_dir: Path, registry: TypeAdapterRegistry) -> dict[str, float]:
+    adapters_built = 0
+    type_adapter_init = pydantic.TypeAdapter.__init__
+
+    def count_init(self, *args, **kwargs):
+        nonlocal adapters_built
+        adapters_built += 1
+        type_adapter_init(self, *args, **kwargs)
+
+    with (
+        tempfile.TemporaryDirectory() as build_dir,
+        patch.object(pydantic.TypeAdapter, "__init__", count_init),
+        patch("dsets.lib.pydantic_util.type_adapters", registry),
+    ):
+        start = time.perf_counter()
+        compile_dataset_build(Path(build_dir), content_dir, "https://example.com")
+        seconds = time.perf_counter() - start
+
+    return {
+        "registry_builds": registry.builds,
+        "registry_hits": registry.hits,
+        "type_adapters_built": adapters_built,
+        "seconds": seconds,
+    }
+
+
+def main(content_dir: Path) -> None:
+    for name, registry in (
+        ("uncached", _UncachedRegistry()),
+        ("cached", type_adapters),
+    ):
+        registry.clear()
+        result = _run(content_dir, registry)
+        print(name, " ".join(f"{key}={value:g}" for key, value in result.items()))
+
+
+if __name__ == "__main__":
+    main(Path(sys.argv[1] if len(sys.argv) > 1 else "content"))
@@ -1,16 +1,15 @@
-import hashlib
 import json
 import logging
 import shutil
+import threading
 import webbrowser
-from datetime import datetime
+from datetime import date, datetime
 from pathlib import Path
-from typing import Annotated
+from typing import Annotated, Optional
 
 import inflection
 import rich
 import typer
-from pennylane.data import Dataset
 
 from dsets import schemas
 from dsets.lib import (
@@ -19,16 +18,33 @@ from dsets.lib import (
     deploy,
     device_auth,
     doctree,
+    file_hash,
+    fs_watch,
+    git,
     graphql,
     json_fmt,
     markdown,
     msg,
+    profiling,
     progress,
+    upload_journal,
 )
 from dsets.schemas import Author, fields
 from dsets.settings import CLIContext, Settings
 
-from .builder import AssetLoader, compile_dataset_build
+from .builder import (
+    AssetLoader,
+    AssetOptimizer,
+    LiveBuild,
+    RebuildSummary,
+    find_affected_families,
+    iter_family_builds,
+    validate_family,
+    write_dataset_build,
+    write_sharded_build,
+)
+
+logger = logging.getLogger(__name__)
 
 app = typer.Typer(name="dsets", add_completion=True)
 
@@ -76,6 +92,17 @@ def upload(
         Path,
         typer.Argument(help="Path to dataset .h5 file", file_okay=True, dir_okay=False),
     ],
+    jobs: Annotated[
+        int,
+        typer.Option("--jobs", "-j", min=1, help="Number of parts uploaded at once"),
+    ] = 4,
+    resume: Annotated[
+        bool,
+        typer.Option(
+            help="Resume an interrupted upload of the same file, skipping parts"
+            " that were already uploaded"
+        ),
+    ] = True,
 ) -> None:
     """Upload a new dataset file."""
     ctx = CLIContext()
@@ -85,14 +112,38 @@ def upload(
     gql_client = _get_gql_client(ctx)
 
     size = src_file.stat().st_size
-    with open(src_file, "rb") as f:
-        digest = hashlib.file_digest(f, "sha256").digest()
+    with progress.IOProgressBarManager() as pbar:
+        cb = pbar.add_bar(size, f"Hash {src_file}")
+        digests = file_hash.file_digests(
+            src_file, ["sha256"], progress_cb=cb, cache=ctx.digest_cache
+        )
+
+    digest = digests["sha256"]
+
+    journal = upload_journal.UploadJournal(
+        ctx.upload_journal_path, name, src_file, size, digest
+    )
+    if not resume:
+        journal.start()
+    elif journal.resumable:
+        msg.structured_print(
+            "Resuming upload", file=src_file, parts=len(journal.uploaded_parts)
+        )
 
     error = None
     with open(src_file, "rb") as f, progress.IOProgressBarManager() as pbar:
         cb = pbar.add_bar(size, f"Upload {src_file}")
         try:
-            graphql.files.upload_file(gql_client, f, name, size, digest, callback=cb)
+            graphql.files.upload_file(
+                gql_client,
+                f,
+                name,
+                size,
+                digest,
+                callback=cb,
+                max_workers=jobs,
+                journal=journal,
+            )
         except graphql.files.APIError as exc:
             error = exc.args[0]
 
@@ -112,28 +163,327 @@ def list_files():
 
 
 @app.command(name="build")
-def build():
+def build(
+    incremental: Annotated[
+        bool,
+        typer.Option(help="Only recompile families that changed since the last build"),
+    ] = False,
+    jobs: Annotated[
+        int,
+        typer.Option(
+            "--jobs", "-j", min=1, help="Number of processes used to compile families"
+        ),
+    ] = 1,
+    compact: Annotated[
+        bool, typer.Option(help="Write the build without indentation")
+    ] = False,
+    gzip: Annotated[
+        bool, typer.Option(help="Compress the build to 'datasets-build.json.gz'")
+    ] = False,
+    optimize_assets: Annotated[
+        bool,
+        typer.Option(help="Add resized WebP variants of image assets. Requires Pillow"),
+    ] = False,
+    sharded: Annotated[
+        bool,
+        typer.Option(
+            help="Write one document per family, class and collection, with an "
+            "index, to 'datasets-build/'"
+        ),
+    ] = False,
+    profile: Annotated[
+        Optional[Path],
+        typer.Option(
+            help="Write the time spent in each build phase, and counts of files "
+            "read and cache hits, to a JSON report"
+        ),
+    ] = None,
+    trace: Annotated[
+        Optional[Path],
+        typer.Option(
+            help="Write a timeline of the build phases as Chrome trace events, "
+            "for 'chrome://tracing' or Perfetto"
+        ),
+    ] = None,
+):
     """Compile 'datasets-build.json' from content directory."""
 
     ctx = CLIContext()
+    if sharded and gzip:
+        print("Error: --gzip cannot be used with --sharded")
+        raise typer.Exit(1)
+
+    profiler = None
+    if profile or trace:
+        if jobs > 1:
+            print("Error: --profile and --trace cannot be used with --jobs")
+            raise typer.Exit(1)
+
+        profiler = profiling.Profiler(trace=bool(trace))
+
+    optimizer = None
+    if optimize_assets:
+        try:
+            optimizer = AssetOptimizer(ctx.cache_dir / "asset-variants")
+        except ImportError as exc:
+            print(f"Error: {exc}")
+            raise typer.Exit(1)
+
     build_dir = ctx.build_dir
     build_dir.mkdir(exist_ok=True)
-    build_file = build_dir / "datasets-build.json"
-
-    datasets_build = compile_dataset_build(
-        build_dir, ctx.content_dir, ctx.settings.url_prefix_assets
+    if sharded:
+        build_file = build_dir / "datasets-build"
+    elif gzip:
+        build_file = build_dir / "datasets-build.json.gz"
+    else:
+        build_file = build_dir / "datasets-build.json"
+
+    family_builds = iter_family_builds(
+        build_dir,
+        ctx.content_dir,
+        ctx.settings.url_prefix_assets,
+        incremental=incremental,
+        jobs=jobs,
+        digest_cache=ctx.digest_cache,
+        asset_store_dir=ctx.cache_dir / "assets",
+        optimizer=optimizer,
+        bibtex_cache=ctx.bibtex_cache,
     )
-    with open(build_file, "w", encoding="utf-8") as f:
-        json.dump(datasets_build, f, indent=2)
+    with profiling.use_profiler(profiler), profiling.span("build"):
+        if sharded:
+            write_sharded_build(build_file, family_builds, compact=compact)
+        else:
+            write_dataset_build(
+                build_file,
+                family_builds,
+                compact=compact,
+                compress=gzip,
+                index_path=build_dir / "datasets-build.index.json",
+            )
 
+    _remove_other_builds(build_dir, build_file)
     msg.structured_print("Created build", file=build_file)
 
+    if profiler:
+        _print_profile(profiler, profile, trace)
+
+
+def _remove_other_builds(build_dir: Path, build_file: Path) -> None:
+    """Remove builds in other formats than ``build_file`` left in ``build_dir``
+    by earlier incremental builds, so that 'deploy-build' finds ``build_file``."""
+    keep = {build_file.name}
+    if not build_file.is_dir():
+        keep.add("datasets-build.index.json")
+
+    for name in (
+        "datasets-build",
+        "datasets-build.json",
+        "datasets-build.json.gz",
+        "datasets-build.index.json",
+    ):
+        if name in keep or not (path := build_dir / name).exists():
+            continue
+
+        if path.is_dir():
+            shutil.rmtree(path)
+        else:
+            path.unlink()
+
+
+def _print_profile(
+    profiler: profiling.Profiler, profile: Path | None, trace: Path | None
+) -> None:
+    report = profiler.report()
+    for name, phase in list(report["phases"].items())[:5]:
+        msg.structured_print(
+            "Phase",
+            name=name,
+            count=phase["count"],
+            self_seconds=round(phase["self_seconds"], 3),
+        )
+
+    if profile:
+        profiler.write_report(profile)
+        msg.structured_print("Wrote profile", file=profile)
+
+    if trace:
+        profiler.write_trace(trace)
+        msg.structured_print("Wrote trace", file=trace)
+
+
+@app.command(name="watch")
+def watch(
+    debounce: Annotated[
+        float,
+        typer.Option(
+            min=0, help="Seconds to wait for further changes before rebuilding"
+        ),
+    ] = 0.1,
+    poll: Annotated[
+        bool,
+        typer.Option(help="Poll for changes, instead of using filesystem events"),
+    ] = False,
+):
+    """Rebuild 'datasets-build.json' whenever files in the content directory
+    change. Only families affected by a change are compiled again."""
+    ctx = CLIContext()
+    live_build = LiveBuild(
+        ctx.build_dir,
+        ctx.content_dir,
+        ctx.settings.url_prefix_assets,
+        digest_cache=ctx.digest_cache,
+        asset_store_dir=ctx.cache_dir / "assets",
+        bibtex_cache=ctx.bibtex_cache,
+    )
+
+    _print_rebuild(live_build.build())
+    msg.structured_print("Watching for changes", directory=ctx.content_dir)
+
+    try:
+        for changed_paths in fs_watch.watch(
+            ctx.content_dir, debounce=debounce, poll=poll
+        ):
+            try:
+                _print_rebuild(live_build.update(changed_paths))
+            except Exception:
+                # Keep watching, so the next change can fix the build
+                logger.exception("Rebuild failed: paths=%s", changed_paths)
+    except KeyboardInterrupt:
+        pass
+
+
+def _print_rebuild(summary: RebuildSummary) -> None:
+    for path, exc in summary.errors.items():
+        rich.print(f"[bold red]Build error[/bold red]: {path}")
+        print(exc)
+
+    if summary.written:
+        status = "Rebuilt"
+    elif summary.errors:
+        status = "Build failed"
+    else:
+        status = "Nothing to rebuild"
+
+    msg.structured_print(
+        status,
+        compiled=summary.compiled,
+        removed=summary.removed,
+        errors=len(summary.errors),
+        ms=round(summary.seconds * 1000, 1),
+    )
+
+
+@app.command(name="serve")
+def serve(
+    host: Annotated[str, typer.Option(help="Host to listen on")] = "127.0.0.1",
+    port: Annotated[int, typer.Option(help="Port to listen on")] = 8000,
+    watch: Annotated[
+        bool, typer.Option(help="Rebuild when files in the content directory change")
+    ] = True,
+    debounce: Annotated[
+        float,
+        typer.Option(
+            min=0, help="Seconds to wait for further changes before rebuilding"
+        ),
+    ] = 0.1,
+    poll: Annotated[
+        bool,
+        typer.Option(help="Poll for changes, instead of using filesystem events"),
+    ] = False,
+):
+    """Serve the build and its assets over HTTP, for previewing it locally."""
+    # Importing aiohttp is slow, so only do it for commands that need it
+    from aiohttp import web
+
+    from .builder.preview import PreviewServer
+
+    ctx = CLIContext()
+    live_build = LiveBuild(
+        ctx.build_dir,
+        ctx.content_dir,
+        ctx.settings.url_prefix_assets,
+        digest_cache=ctx.digest_cache,
+        asset_store_dir=ctx.cache_dir / "assets",
+        bibtex_cache=ctx.bibtex_cache,
+    )
+
+    summary = live_build.build()
+    _print_rebuild(summary)
+    server = PreviewServer(live_build, summary)
+
+    if watch:
+        changes = fs_watch.watch(ctx.content_dir, debounce=debounce, poll=poll)
+
+        def rebuild_on_change():
+            try:
+                for changed_paths in changes:
+                    try:
+                        _print_rebuild(server.update(changed_paths))
+                    except Exception:
+                        # Keep watching, so the next change can fix the build
+                        logger.exception("Rebuild failed: paths=%s", changed_paths)
+            except Exception:
+                logger.exception("Stopped watching for changes")
+
+        threading.Thread(target=rebuild_on_change, daemon=True).start()
+        msg.structured_print("Watching for changes", directory=ctx.content_dir)
+
+    msg.structured_print("Serving build", url=f"http://{host}:{port}/")
+    web.run_app(server.make_app(), host=host, port=port, print=None)
+
+
+@app.command(name="validate")
+def validate(
+    changed: Annotated[
+        bool,
+        typer.Option(
+            help="Only validate families affected by files changed since '--base'"
+        ),
+    ] = False,
+    base: Annotated[
+        str, typer.Option(help="Git ref to compare against with '--changed'")
+    ] = "origin/main",
+):
+    """Validate dataset families in the content directory, without building."""
+    ctx = CLIContext()
+
+    if changed:
+        changed_paths = git.changed_paths(ctx.repo, base)
+        package_dir = Path(__file__).parent.absolute()
+        if any(path.is_relative_to(package_dir) for path in changed_paths):
+            # Schema changes can affect every family
+            dataset_json_paths = list(ctx.content_dir.rglob("**/dataset.json"))
+        else:
+            dataset_json_paths = find_affected_families(ctx.content_dir, changed_paths)
+    else:
+        dataset_json_paths = list(ctx.content_dir.rglob("**/dataset.json"))
+
+    content_doctree = doctree.Doctree(ctx.content_dir)
+    errors = 0
+    for dataset_json_path in dataset_json_paths:
+        try:
+            with bibtex.use_cache(ctx.bibtex_cache):
+                validate_family(content_doctree, dataset_json_path)
+        except (ValueError, OSError) as exc:
+            errors += 1
+            rich.print(f"[bold red]Invalid family[/bold red]: {dataset_json_path}")
+            print(exc)
+
+    msg.structured_print(
+        "Validated families", count=len(dataset_json_paths), errors=errors
+    )
+    if errors:
+        raise typer.Exit(1)
+
 
 @app.command(name="add")
 def add(dataset_file: Path):
     """
     Add a new dataset to an existing family, or create a new one.
     """
+    # Importing pennylane is slow, so only do it for commands that need it
+    from pennylane.data import Dataset
+
     ctx = CLIContext()
 
     content_doctree = doctree.Doctree(ctx.content_dir)
@@ -242,7 +592,7 @@ def add(dataset_file: Path):
 
     if family_doc.exists():
         family = schemas.DatasetFamily.from_os_path(content_doctree, family_doc)
-        family.date_of_last_modification = today
+        _set_date_of_last_modification(content_doctree, family, today)
     else:
         print(f"Creating new family with slug {repr(family_slug)}")
         family_title = typer.prompt(
@@ -351,37 +701,99 @@ def add(dataset_file: Path):
     family.data.append(schemas.Dataset(parameters=param_values))
 
     with open(family_doc, "w", encoding="utf-8") as f:
-        f.write(family.model_dump_json(indent=2, by_alias=True))
+        f.write(
+            family.model_dump_json(indent=2, by_alias=True, context={"columnar": True})
+        )
 
     print(f"Wrote data to {family_doc}")
 
 
+def _set_date_of_last_modification(
+    content_doctree: doctree.Doctree, family: schemas.DatasetFamily, today: date
+) -> None:
+    """Set the date of last modification in the metadata of ``family``,
+    writing it back to its own document if it is referenced."""
+    if not isinstance(family.meta, doctree.Reference):
+        family.meta.date_of_last_modification = today
+        return
+
+    meta_doc = content_doctree.get_os_path(
+        family.document_context.resolve_reference_path(family.meta.path)
+    )
+    meta = schemas.DatasetFamilyMeta.from_os_path(content_doctree, meta_doc)
+    meta.date_of_last_modification = today
+
+    with open(meta_doc, "w", encoding="utf-8") as f:
+        f.write(meta.model_dump_json(indent=2, by_alias=True))
+
+
 @app.command(name="upload-assets")
-def upload_assets():
+def upload_assets(
+    jobs: Annotated[
+        int,
+        typer.Option("--jobs", "-j", min=1, help="Number of concurrent uploads"),
+    ] = 8,
+):
     """Upload assets from the build directory."""
     ctx = CLIContext()
 
     asset_loader = AssetLoader(ctx.build_dir, ctx.settings.url_prefix_assets)
 
-    uploaded = asset_loader.upload_assets(
-        ctx.s3_client, ctx.settings.bucket_name, ctx.settings.bucket_prefix_assets
+    summary = asset_loader.upload_assets(
+        ctx.s3_client,
+        ctx.settings.bucket_name,
+        ctx.settings.bucket_prefix_assets,
+        max_workers=jobs,
+    )
+    msg.structured_print(
+        "Uploaded assets",
+        count=summary.uploaded,
+        skipped=summary.skipped,
+        bytes=summary.bytes_uploaded,
+        seconds=round(summary.seconds, 2),
+        bytes_per_second=round(summary.throughput),
     )
-    msg.structured_print("Uploaded assets", count=uploaded)
 
 
 @app.command(name="deploy-build")
-def deploy_build():
+def deploy_build(
+    delta: Annotated[
+        bool,
+        typer.Option(
+            "--delta/--full",
+            help="Only deploy the families, classes, collections and assets that "
+            "changed since the last deploy from this repository. Requires an admin "
+            "API that accepts delta deploys",
+        ),
+    ] = False,
+):
     """Deploy datasets-build.json to the datasets service."""
     ctx = CLIContext()
     short_sha = ctx.commit_sha(short=True)
-    build_path = ctx.build_dir / "datasets-build.json"
+    build_path, index_path = _find_build(ctx.build_dir)
+    if not build_path.exists():
+        print(f"Error: No build in '{ctx.build_dir}'. Run 'dsets build' first")
+        raise typer.Exit(1)
 
     if (admin_url := ctx.settings.datasets_admin_api_url) is not None:
-        deploy.deploy_datasets_build(admin_url, build_path, commit_sha=short_sha)
+        result = deploy.deploy_datasets_build(
+            admin_url,
+            build_path,
+            commit_sha=short_sha,
+            index_path=index_path if index_path.exists() else None,
+            manifest_path=ctx.cache_dir / "deploy-manifest.json",
+            delta=delta,
+        )
         msg.structured_print(
             "Deployed build to new datasets service",
             commmit_sha=short_sha,
             url=admin_url,
+            delta=result.delta,
+            changed=result.changed,
+            deleted=result.deleted,
+            bytes=result.request_bytes,
+            compression_ratio=round(result.compression_ratio, 1),
+            ms=round(result.seconds * 1000, 1),
         )
     else:
         msg.structured_print(
@@ -390,6 +802,19 @@ def deploy_build():
         typer.Exit(1)
 
 
+def _find_build(build_dir: Path) -> tuple[Path, Path]:
+    """Return the path of the build written to ``build_dir`` by 'dsets build',
+    and the path of its index."""
+    if (sharded := build_dir / "datasets-build").is_dir():
+        return sharded, sharded / "index.json"
+
+    index_path = build_dir / "datasets-build.index.json"
+    if (compressed := build_dir / "datasets-build.json.gz").exists():
+        return compressed, index_path
+
+    return build_dir / "datasets-build.json", index_path
+
+
 @app.command(name="format")
 def format(check: bool = False):
     """Format dataset metadata files in the content directory."""
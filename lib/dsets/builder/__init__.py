@@ -1,4 +1,23 @@
+from .asset_variants import AssetOptimizer
 from .assets import AssetLoader
-from .datasets_build import compile_dataset_build
+from .datasets_build import (
+    compile_dataset_build,
+    iter_family_builds,
+    write_dataset_build,
+    write_sharded_build,
+)
+from .validate import find_affected_families, validate_family
+from .watch import LiveBuild, RebuildSummary
 
-__all__ = ["AssetLoader", "compile_dataset_build"]
+__all__ = [
+    "AssetLoader",
+    "AssetOptimizer",
+    "LiveBuild",
+    "RebuildSummary",
+    "compile_dataset_build",
+    "find_affected_families",
+    "iter_family_builds",
+    "validate_family",
+    "write_dataset_build",
+    "write_sharded_build",
+]
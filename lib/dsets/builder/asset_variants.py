@@ -0,0 +1,173 @@
+import hashlib
+import importlib.util
+import io
+import json
+import os
+import tempfile
+from collections.abc import Sequence
+from pathlib import Path
+from typing import ClassVar
+
+from pydantic import BaseModel, TypeAdapter
+
+from dsets.lib.pydantic_util import CamelCaseMixin
+
+
+class AssetVariant(BaseModel, CamelCaseMixin):
+    """A resized and recompressed copy of an image asset.
+
+    Attributes:
+        url: Destination URL of the variant. Only set in the build
+        name: File name of the variant, which includes its content hash
+        width: Width in pixels
+        height: Height in pixels
+        size_bytes: Size of the file in bytes
+        format: Image format, e.g 'webp'
+    """
+
+    url: str = ""
+    name: str
+    width: int
+    height: int
+    size_bytes: int
+    format: str
+
+
+class AssetOptimizer:
+    """Generates size-bounded, recompressed variants of image assets, for
+    use as responsive images. Requires Pillow.
+
+    Variants are cached in ``cache_dir`` by the SHA1 of the source image and
+    the optimizer settings, so an image is only processed once.
+
+    Attributes:
+        cache_dir: Directory for generated variants
+        widths: Maximum width of each variant. Images are never enlarged, so
+            smaller images have fewer variants
+        format: Pillow format of the variants
+        quality: Encoder quality, from 0 to 100
+    """
+
+    image_suffixes: ClassVar[frozenset[str]] = frozenset(
+        {".png", ".jpg", ".jpeg", ".webp"}
+    )
+
+    def __init__(
+        self,
+        cache_dir: Path,
+        widths: Sequence[int] = (400, 800, 1600),
+        format: str = "WEBP",
+        quality: int = 80,
+    ):
+        _require_pillow()
+
+        self.widths = tuple(sorted(widths))
+        self.format = format
+        self.quality = quality
+        self.cache_dir = Path(cache_dir) / self.settings_key
+
+    @property
+    def settings_key(self) -> str:
+        """Short hash of the optimizer settings. Variants generated with
+        different settings are cached separately."""
+        settings = json.dumps([self.widths, self.format, self.quality])
+
+        return hashlib.sha1(settings.encode("utf-8")).hexdigest()[:12]
+
+    def get_variants(self, os_path: Path, digest: str) -> list[AssetVariant]:
+        """Return the variants of the image at ``os_path``, generating them if
+        they are not cached. Returns an empty list if the file is not an image.
+
+        Args:
+            os_path: Path to the image
+            digest: SHA1 of the image, in hex format
+
+        Returns:
+            Variants, from smallest to largest. Their files are in ``cache_dir``
+        """
+        if os_path.suffix.lower() not in self.image_suffixes:
+            return []
+
+        index_path = self.cache_dir / f"{digest}.json"
+        try:
+            return _variant_list.validate_json(index_path.read_bytes())
+        except FileNotFoundError:
+            pass
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        variants = []
+        for data, width, height in self._render(os_path):
+            variant_digest = hashlib.sha1(data).hexdigest()
+            name = f"{os_path.stem}-{variant_digest}.{self.format.lower()}"
+            _write_atomic(self.cache_dir / name, data)
+
+            variants.append(
+                AssetVariant(
+                    name=name,
+                    width=width,
+                    height=height,
+                    size_bytes=len(data),
+                    format=self.format.lower(),
+                )
+            )
+
+        _write_atomic(index_path, _variant_list.dump_json(variants))
+
+        return variants
+
+    def _render(self, os_path: Path) -> list[tuple[bytes, int, int]]:
+        """Encode each variant of the image at ``os_path``.
+
+        Returns:
+            The encoded bytes, width and height of each variant
+        """
+        from PIL import Image
+
+        rendered = []
+        with Image.open(os_path) as image:
+            image.load()
+            if image.mode == "P" and "transparency" in image.info:
+                # Converting to RGB would drop the transparent palette entry
+                image = image.convert("RGBA")
+            elif image.mode not in ("RGB", "RGBA"):
+                image = image.convert("RGBA" if "A" in image.getbands() else "RGB")
+
+            sizes = {min(width, image.width) for width in self.widths}
+            for width in sorted(sizes):
+                height = max(1, round(image.height * width / image.width))
+                resized = (
+                    image
+                    if width == image.width
+                    else image.resize((width, height), Image.Resampling.LANCZOS)
+                )
+
+                buffer = io.BytesIO()
+                resized.save(
+                    buffer, format=self.format, quality=self.quality, optimize=True
+                )
+                rendered.append((buffer.getvalue(), width, height))
+
+        return rendered
+
+
+_variant_list = TypeAdapter(list[AssetVariant])
+
+
+def _require_pillow() -> None:
+    if importlib.util.find_spec("PIL") is None:
+        raise ImportError(
+            "Pillow is required to optimize assets. Install it with"
+            " 'pip install pillow'."
+        )
+
+
+def _write_atomic(path: Path, data: bytes) -> None:
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
@@ -1,11 +1,22 @@
-import hashlib
-import shutil
-from collections.abc import Iterator
+import os
+import time
+import typing
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
 from logging import getLogger
 from pathlib import Path
 
-from dsets.lib import s3
+from boto3.exceptions import S3UploadFailedError
+from botocore.exceptions import BotoCoreError, ClientError
+
+from dsets.lib import profiling, s3
 from dsets.lib.doctree import Asset
+from dsets.lib.file_hash import DigestCache, file_sha1_hash
+from dsets.lib.file_stage import stage_file
+from dsets.lib.retry import call_with_retries
+
+from .asset_variants import AssetOptimizer, AssetVariant
 
 logger = getLogger(__name__)
 
@@ -15,16 +26,40 @@ class AssetLoader:
     assets added will be copied into `asset_dir` under a unique name that
     includes the file hash of the asset.
 
+    If ``store_dir`` is set, each asset is copied once into a content-addressed
+    store, which can be kept between builds. Assets are then hard linked from
+    the store into `asset_dir`, so rebuilding the build directory does not copy
+    any unchanged assets.
+
+    If ``optimizer`` is set, resized variants of local images are also added
+    to `asset_dir`, and recorded in ``asset_variants``.
+
     Attributes:
         build_dir: The content build directory
         asset_destination_url_prefix: The public URL under which assets
             will be accessible after upload.
+        digest_cache: Cache used when hashing assets
+        store_dir: Directory of the asset store
+        optimizer: Generates variants of image assets
+        asset_variants: Variants of each image asset, keyed by the destination
+            URL of the original
     """
 
-    def __init__(self, build_dir: Path, asset_destination_url_prefix: str):
+    def __init__(
+        self,
+        build_dir: Path,
+        asset_destination_url_prefix: str,
+        digest_cache: DigestCache | None = None,
+        store_dir: Path | None = None,
+        optimizer: AssetOptimizer | None = None,
+    ):
         self.build_dir = Path(build_dir)
         self.asset_destination_url_prefix = asset_destination_url_prefix.strip("/")
+        self.digest_cache = digest_cache
+        self.store_dir = store_dir
+        self.optimizer = optimizer
         self.copied_asset_names: dict[Path, str] = {}
+        self.asset_variants: dict[str, list[AssetVariant]] = {}
 
         self.asset_dir.mkdir(exist_ok=True)
 
@@ -48,6 +83,21 @@ class AssetLoader:
         """
         return f"{self.asset_destination_url_prefix}/{asset_name}"
 
+    def asset_name(self, url: str) -> str | None:
+        """Returns the name of the asset in the asset directory with the given
+        destination URL, or ``None`` if ``url`` is not under
+        `asset_destination_url_prefix`.
+
+        >>> loader = AssetLoader("_build", "https://datasets.cloud.pennylane.ai/assets")
+        >>> loader.asset_name("https://datasets.cloud.pennylane.ai/assets/hero-e98e.jpg")
+        'hero-e98e.jpg'
+        """
+        prefix = f"{self.asset_destination_url_prefix}/"
+        if not url.startswith(prefix):
+            return None
+
+        return url.removeprefix(prefix)
+
     def add_asset(self, asset: Asset) -> str:
         """
         Add an asset to the build and return its destination url.
@@ -56,45 +106,207 @@ class AssetLoader:
         URL.
 
         If `asset` is a local asset, copy it to the asset directory under a unique
-        name and return its destination URL.
+        name and return its destination URL. Copies are made by hard linking from
+        the asset store if there is one, or as copy-on-write clones where the
+        filesystem supports them.
         """
         if not asset.is_local:
             return str(asset.root)
 
         os_path = asset.os_path
         if not (name := self.copied_asset_names.get(os_path)):
-            with open(os_path, "rb") as f:
-                digest = hashlib.file_digest(f, "sha1").hexdigest()
+            with profiling.span("asset_hash"):
+                digest = file_sha1_hash(os_path, cache=self.digest_cache).hex()
 
             name = f"{os_path.stem}-{digest}{os_path.suffix}"
             copy_dest = self.asset_dir / name
             if not copy_dest.exists():
-                shutil.copy(os_path, copy_dest)
+                profiling.count("assets_copied")
+                with profiling.span("asset_copy"):
+                    self._stage_asset(os_path, digest, copy_dest)
+
+            if self.optimizer:
+                self._add_variants(os_path, digest, name)
 
             self.copied_asset_names[os_path] = name
 
         return self.asset_destination_url(name)
 
+    def _add_variants(self, os_path: Path, digest: str, name: str) -> None:
+        """Add the variants of the image at ``os_path`` to the asset directory."""
+        optimizer = typing.cast(AssetOptimizer, self.optimizer)
+        variants = optimizer.get_variants(os_path, digest)
+
+        for variant in variants:
+            variant_dest = self.asset_dir / variant.name
+            if not variant_dest.exists():
+                stage_file(optimizer.cache_dir / variant.name, variant_dest, link=True)
+
+            variant.url = self.asset_destination_url(variant.name)
+
+        if variants:
+            self.asset_variants[self.asset_destination_url(name)] = variants
+
+    def _stage_asset(self, os_path: Path, digest: str, dest: Path) -> None:
+        """Copy the asset at ``os_path`` with SHA1 ``digest`` to ``dest``, through
+        the asset store if there is one."""
+        if not self.store_dir:
+            stage_file(os_path, dest)
+            return
+
+        stored = self.store_dir / digest
+        if not stored.exists():
+            self.store_dir.mkdir(parents=True, exist_ok=True)
+            stage_file(os_path, stored)
+
+        stage_file(stored, dest, link=True)
+
+    def invalidate(self, os_paths: Iterable[Path]) -> None:
+        """Forget the names of the local assets at ``os_paths``, so they are
+        hashed and copied again if they are added. Used when a loader is kept
+        while files change."""
+        changed = {os.path.normpath(Path(os_path).absolute()) for os_path in os_paths}
+        for os_path in list(self.copied_asset_names):
+            if os.path.normpath(os_path.absolute()) in changed:
+                del self.copied_asset_names[os_path]
+
+    def remove_unused_assets(self, used_urls: Iterable[str]) -> None:
+        """Delete assets in the asset directory whose destination URL is not
+        in ``used_urls``, and assets in the asset store that are no longer
+        used by any build."""
+        used_urls = set(used_urls)
+        for asset_path in list(self.assets):
+            if self.asset_destination_url(asset_path.name) not in used_urls:
+                logger.info("Removing unused asset: name=%s", asset_path.name)
+                asset_path.unlink()
+
+        if self.store_dir and self.store_dir.exists():
+            self._prune_store(self.store_dir)
+
+    def _prune_store(self, store_dir: Path) -> None:
+        """Delete assets in the asset store that are not in the asset directory.
+        Assets that are hard linked elsewhere, e.g into the asset directory of
+        another build, are kept."""
+        digests = {_asset_digest(asset_path.name) for asset_path in self.assets}
+        for stored in list(store_dir.iterdir()):
+            if stored.name not in digests and stored.stat().st_nlink == 1:
+                logger.info("Removing unused stored asset: digest=%s", stored.name)
+                stored.unlink()
+
     def upload_assets(
-        self, s3_client: s3.S3Client, bucket: str, prefix: s3.S3Path
-    ) -> int:
+        self,
+        s3_client: s3.S3Client,
+        bucket: str,
+        prefix: s3.S3Path,
+        *,
+        max_workers: int = 8,
+        attempts: int = 3,
+    ) -> "AssetUploadSummary":
         """Upload all assets in the asset directory to the given bucket, under
-        the given prefix. Return the number of assets uploaded."""
+        the given prefix.
+
+        Asset names include their content hash, so an asset that already exists
+        under the prefix is skipped. Existing assets are found by listing the
+        prefix, rather than requesting each object. Missing assets are uploaded
+        concurrently.
+
+        Args:
+            s3_client: S3 client
+            bucket: Name of the bucket
+            prefix: Key prefix for assets
+            max_workers: Maximum number of concurrent uploads
+            attempts: Maximum number of attempts for each upload
+
+        Returns:
+            Summary of the upload
+
+        Raises:
+            S3UploadFailedError, BotoCoreError, ClientError: If an asset could
+                not be uploaded after ``attempts`` attempts
+        """
+        start = time.perf_counter()
         prefix = s3.S3Path(prefix)
-        uploaded_count = 0
+        existing = s3.list_keys(s3_client, bucket, prefix)
 
-        for asset_path in self.assets:
+        pending: list[tuple[Path, s3.S3Path]] = []
+        skipped = 0
+        for asset_path in sorted(self.assets):
             name = asset_path.name
             key = prefix / name
 
-            if s3.object_exists(s3_client, bucket, key):
+            if key in existing:
                 logger.info(
                     "Asset already uploaded, skipping: asset_name=%s, key=%s", name, key
                 )
+                skipped += 1
                 continue
 
-            s3_client.upload_file(Filename=str(asset_path), Bucket=bucket, Key=str(key))
-            logger.info("Uploaded asset: name=%s, key=%s", name, key)
-            uploaded_count += 1
+            pending.append((asset_path, key))
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [
+                executor.submit(
+                    call_with_retries,
+                    _upload_asset,
+                    _UPLOAD_RETRY_ON,
+                    s3_client,
+                    bucket,
+                    asset_path,
+                    key,
+                    attempts=attempts,
+                )
+                for asset_path, key in pending
+            ]
+            bytes_uploaded = sum(future.result() for future in futures)
+
+        return AssetUploadSummary(
+            uploaded=len(pending),
+            skipped=skipped,
+            bytes_uploaded=bytes_uploaded,
+            seconds=time.perf_counter() - start,
+        )
+
+
+@dataclass(frozen=True)
+class AssetUploadSummary:
+    """Summary of an asset upload.
+
+    Attributes:
+        uploaded: Number of assets uploaded
+        skipped: Number of assets that were already uploaded
+        bytes_uploaded: Total size of uploaded assets, in bytes
+        seconds: Duration of the upload, in seconds
+    """
+
+    uploaded: int
+    skipped: int
+    bytes_uploaded: int
+    seconds: float
+
+    @property
+    def throughput(self) -> float:
+        """Upload throughput, in bytes per second."""
+        return self.bytes_uploaded / self.seconds if self.seconds else 0.0
+
+
+_UPLOAD_RETRY_ON = (S3UploadFailedError, BotoCoreError, ClientError)
+
 
-        return uploaded_count
+def _upload_asset(
+    s3_client: s3.S3Client, bucket: str, asset_path: Path, key: s3.S3Path
+) -> int:
+    """Upload a single asset, and return its size in bytes."""
+    s3_client.upload_file(Filename=str(asset_path), Bucket=bucket, Key=str(key))
+    logger.info("Uploaded asset: name=%s, key=%s", asset_path.name, key)
+
+    return asset_path.stat().st_size
+
+
+def _asset_digest(name: str) -> str:
+    """Return the SHA1 in the name of a local asset, as named by
+    ``AssetLoader.add_asset()``.
+
+    >>> _asset_digest("qchem_hero-e98e34a7d58e039da35f793cb6d9bd0da78847f9.jpg")
+    'e98e34a7d58e039da35f793cb6d9bd0da78847f9'
+    """
+    return Path(name).stem.rpartition("-")[2]
@@ -0,0 +1,340 @@
+import hashlib
+import os
+from collections.abc import Iterable
+from logging import getLogger
+from pathlib import Path
+from typing import Any, ClassVar, Self
+
+from pydantic import BaseModel, ConfigDict, ValidationError
+
+from dsets.lib.file_hash import DigestCache, file_sha1_hash
+
+from .asset_variants import AssetVariant
+
+logger = getLogger(__name__)
+
+
+class FileStamp(BaseModel):
+    """Records the state of a file that was read during a build.
+
+    Attributes:
+        mtime_ns: Modification time of the file, in nanoseconds
+        size: Size of the file in bytes
+        sha1: SHA1 hash of the file contents, in hex format
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    mtime_ns: int
+    size: int
+    sha1: str
+
+    @classmethod
+    def from_os_path(
+        cls, os_path: Path, digest_cache: DigestCache | None = None
+    ) -> Self:
+        """Create a stamp for the file at ``os_path``."""
+        stat = os_path.stat()
+
+        return cls(
+            mtime_ns=stat.st_mtime_ns,
+            size=stat.st_size,
+            sha1=file_sha1_hash(os_path, cache=digest_cache).hex(),
+        )
+
+    def matches(self, os_path: Path, digest_cache: DigestCache | None = None) -> bool:
+        """Return ``True`` if the file at ``os_path`` has the same contents as when
+        this stamp was created. The file is assumed unchanged if its size and
+        modification time are unchanged, otherwise its content hash is compared."""
+        try:
+            stat = os_path.stat()
+        except FileNotFoundError:
+            return False
+
+        if stat.st_size != self.size:
+            return False
+
+        if stat.st_mtime_ns == self.mtime_ns:
+            return True
+
+        return file_sha1_hash(os_path, cache=digest_cache).hex() == self.sha1
+
+
+class DocumentBuild(BaseModel):
+    """Compiled output of a document shared between families, e.g a
+    ``DatasetClass``.
+
+    Attributes:
+        slug: Slug of the document
+        source: Path of the file that defines the document
+        content: JSON content of the document
+    """
+
+    slug: str
+    source: str
+    content: dict[str, Any]
+
+
+class FamilyBuild(BaseModel):
+    """Compiled output of a single 'dataset.json' file.
+
+    Attributes:
+        slug: Slug of the family
+        family: JSON content of the family
+        dataset_class: The family's class
+        dataset_collection: The family's collection, if it has one
+        tags: Tags of the family
+        assets: Destination URLs of all assets used by the family, including
+            image variants
+        asset_variants: Variants of the family's image assets, keyed by the
+            destination URL of the original
+        staged_assets: Paths of the asset files copied to the build directory
+            for the family, relative to the build directory
+    """
+
+    slug: str
+    family: dict[str, Any]
+    dataset_class: DocumentBuild
+    dataset_collection: DocumentBuild | None = None
+    tags: list[str] = []
+    assets: list[str] = []
+    asset_variants: dict[str, list[AssetVariant]] = {}
+    staged_assets: list[str] = []
+
+
+class BuildManifestEntry(BaseModel):
+    """Manifest entry for a compiled family.
+
+    Attributes:
+        fragment: Name of the file in the cache directory containing
+            the ``FamilyBuild``
+        dependencies: Stamps of every file the family was compiled from,
+            keyed by path
+        outputs: Paths of the files written to the build directory for the
+            family, relative to the build directory. The entry is stale if any
+            of them are missing
+    """
+
+    fragment: str
+    dependencies: dict[str, FileStamp]
+    outputs: list[str] = []
+
+
+class BuildManifest(BaseModel):
+    """Model for the build manifest file.
+
+    Attributes:
+        version: Version of the manifest format. Manifests with a different
+            version are ignored
+        asset_destination_url_prefix: Asset URL prefix used by the build
+        options: Other options that affect the output of the build
+        families: Manifest entries, keyed by the path of their 'dataset.json'
+    """
+
+    version: int
+    asset_destination_url_prefix: str
+    options: dict[str, Any] = {}
+    families: dict[str, BuildManifestEntry] = {}
+
+
+class BuildCache:
+    """Persistent cache of compiled dataset families, kept in the build directory.
+
+    Each compiled family is stored as a fragment in the cache directory, and
+    the manifest records the state of every file that was read to compile it.
+    A family can be reused by the next build if none of those files have changed.
+
+    Attributes:
+        build_dir: The build directory
+        docpath_root: Root of the document tree. Paths in the manifest are
+            relative to this directory
+        asset_destination_url_prefix: Asset URL prefix used by the build. Cached
+            families are discarded if this changes
+        digest_cache: Cache used when hashing files
+        options: Other options that affect the output of the build. Cached
+            families are discarded if these change
+    """
+
+    manifest_version: ClassVar[int] = 2
+
+    def __init__(
+        self,
+        build_dir: Path,
+        docpath_root: Path,
+        asset_destination_url_prefix: str,
+        digest_cache: DigestCache | None = None,
+        options: dict[str, Any] | None = None,
+    ):
+        self.build_dir = Path(build_dir)
+        self.docpath_root = Path(docpath_root).absolute().resolve()
+        self.asset_destination_url_prefix = asset_destination_url_prefix
+        self.digest_cache = digest_cache
+        self.options = options or {}
+
+        self._previous = self._load_manifest()
+        self._manifest = BuildManifest(
+            version=self.manifest_version,
+            asset_destination_url_prefix=asset_destination_url_prefix,
+            options=self.options,
+        )
+        self._fresh: dict[tuple[str, FileStamp], bool] = {}
+        self._stamps: dict[str, FileStamp] = {}
+
+    @property
+    def manifest_path(self) -> Path:
+        """Path to the manifest file."""
+        return self.build_dir / "build-manifest.json"
+
+    @property
+    def cache_dir(self) -> Path:
+        """Directory containing the compiled family fragments."""
+        return self.build_dir / "cache"
+
+    def is_fresh(self, os_path: Path) -> bool:
+        """Return ``True`` if the family defined at ``os_path`` is cached, none
+        of the files it was compiled from have changed, and the files written to
+        the build directory for it still exist. The cached build is not loaded."""
+        if not (entry := self._previous.families.get(self._key(os_path))):
+            return False
+
+        return (
+            all(
+                self._is_fresh(dependency, stamp)
+                for dependency, stamp in entry.dependencies.items()
+            )
+            and (self.cache_dir / entry.fragment).exists()
+            and all((self.build_dir / output).exists() for output in entry.outputs)
+        )
+
+    def get(self, os_path: Path) -> FamilyBuild | None:
+        """Return the cached build of the family defined at ``os_path``, if none
+        of the files it was compiled from have changed. The entry will be kept
+        in the manifest written by ``save()``."""
+        if not self.is_fresh(os_path):
+            return None
+
+        key = self._key(os_path)
+        entry = self._previous.families[key]
+        try:
+            family_build = FamilyBuild.model_validate_json(
+                (self.cache_dir / entry.fragment).read_bytes()
+            )
+        except (FileNotFoundError, ValidationError):
+            return None
+
+        self._manifest.families[key] = entry
+
+        return family_build
+
+    def put(
+        self, os_path: Path, family_build: FamilyBuild, dependencies: Iterable[Path]
+    ) -> None:
+        """Add the build of the family defined at ``os_path`` to the cache.
+
+        Args:
+            os_path: Path to the family's 'dataset.json'
+            family_build: Compiled family
+            dependencies: Paths of all files the family was compiled from
+        """
+        key = self._key(os_path)
+        fragment = f"{hashlib.sha1(key.encode('utf-8')).hexdigest()}.json"
+
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        (self.cache_dir / fragment).write_text(
+            family_build.model_dump_json(), encoding="utf-8"
+        )
+
+        self._manifest.families[key] = BuildManifestEntry(
+            fragment=fragment,
+            dependencies={
+                (dep_key := self._key(dependency)): self._stamp(dep_key)
+                for dependency in sorted(dependencies)
+            },
+            outputs=family_build.staged_assets,
+        )
+
+    def remove(self, os_path: Path) -> None:
+        """Remove the family defined at ``os_path`` from the cache."""
+        self._manifest.families.pop(self._key(os_path), None)
+
+    def invalidate(self, os_paths: Iterable[Path]) -> None:
+        """Forget the recorded state of the files at ``os_paths``, so that they
+        are checked again. Used when a cache is kept while files change."""
+        keys = {self._key(os_path) for os_path in os_paths}
+        for key in keys:
+            self._stamps.pop(key, None)
+
+        self._fresh = {
+            (key, stamp): fresh
+            for (key, stamp), fresh in self._fresh.items()
+            if key not in keys
+        }
+
+    def save(self) -> None:
+        """Write the manifest, and delete fragments that are no longer used."""
+        self.build_dir.mkdir(parents=True, exist_ok=True)
+        self.manifest_path.write_text(
+            self._manifest.model_dump_json(indent=2), encoding="utf-8"
+        )
+
+        if not self.cache_dir.exists():
+            return
+
+        fragments = {entry.fragment for entry in self._manifest.families.values()}
+        for path in self.cache_dir.iterdir():
+            if path.name not in fragments:
+                path.unlink()
+
+    def _load_manifest(self) -> BuildManifest:
+        empty = BuildManifest(
+            version=self.manifest_version,
+            asset_destination_url_prefix=self.asset_destination_url_prefix,
+            options=self.options,
+        )
+        try:
+            manifest = BuildManifest.model_validate_json(
+                self.manifest_path.read_bytes()
+            )
+        except FileNotFoundError:
+            return empty
+        except ValidationError:
+            logger.warning("Ignoring invalid build manifest: %s", self.manifest_path)
+            return empty
+
+        if (
+            manifest.version != self.manifest_version
+            or manifest.asset_destination_url_prefix
+            != self.asset_destination_url_prefix
+            or manifest.options != self.options
+        ):
+            return empty
+
+        return manifest
+
+    def _key(self, os_path: Path) -> str:
+        os_path = Path(os.path.normpath(Path(os_path).absolute()))
+        try:
+            return os_path.relative_to(self.docpath_root).as_posix()
+        except ValueError:
+            return str(os_path)
+
+    def _os_path(self, key: str) -> Path:
+        return self.docpath_root / key
+
+    def _is_fresh(self, key: str, stamp: FileStamp) -> bool:
+        if (fresh := self._fresh.get((key, stamp))) is None:
+            fresh = self._fresh[(key, stamp)] = stamp.matches(
+                self._os_path(key), self.digest_cache
+            )
+            if fresh:
+                self._stamps[key] = stamp
+
+        return fresh
+
+    def _stamp(self, key: str) -> FileStamp:
+        if not (stamp := self._stamps.get(key)):
+            stamp = self._stamps[key] = FileStamp.from_os_path(
+                self._os_path(key), self.digest_cache
+            )
+
+        return stamp
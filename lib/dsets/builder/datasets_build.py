@@ -1,16 +1,31 @@
+import gzip
+import hashlib
+import json
+import math
+import os
 import shutil
+import tempfile
 import typing
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from typing import Any
 
 from pydantic import BaseModel
 
-from dsets.lib.doctree import Asset, Doctree
+from dsets.lib import bibtex, profiling
+from dsets.lib.bibtex import BibtexCache
+from dsets.lib.doctree import Asset, Doctree, iter_assets
+from dsets.lib.file_hash import DigestCache
+from dsets.lib.json_stream import JSONObjectWriter
 from dsets.lib.pydantic_util import CamelCaseMixin
 from dsets.schemas import DatasetClass, DatasetCollection, DatasetFamily
 
+from .asset_variants import AssetOptimizer, AssetVariant
 from .assets import AssetLoader
-from .parameters import build_parameter_tree
+from .build_cache import BuildCache, DocumentBuild, FamilyBuild
+from .parameters import ParameterIndex
+from .validate import validate_family
 
 
 class DatasetBuild(BaseModel, CamelCaseMixin):
@@ -28,83 +43,625 @@ class DatasetBuild(BaseModel, CamelCaseMixin):
 
 
 def compile_dataset_build(
-    build_dir: Path, content_dir: Path, asset_destination_url_prefix: str
+    build_dir: Path,
+    content_dir: Path,
+    asset_destination_url_prefix: str,
+    *,
+    incremental: bool = False,
+    jobs: int = 1,
+    digest_cache: DigestCache | None = None,
+    asset_store_dir: Path | None = None,
+    optimizer: AssetOptimizer | None = None,
+    bibtex_cache: BibtexCache | None = None,
 ) -> dict[str, Any]:
     """Compiles all `dataset.json` files in the `content/` directory into
     a single JSON document. All referenced documents will be included,
     and local assets will be uploaded to the assets directory in the datasets bucket.
 
+    The whole build is held in memory. Use ``write_dataset_build()`` with
+    ``iter_family_builds()`` to write it to a file one family at a time.
+
     Args:
         build_dir: The build directory
         content_dir: The content directory
         asset_destination_url_prefix: The URL prefix where uploaded assets (images, etc)
             can be accessed.
+        incremental: Whether to reuse the results of the previous build
+        jobs: Number of processes used to compile families
+        digest_cache: Cache used when hashing content files and assets
+        asset_store_dir: Directory of a content-addressed asset store that is
+            kept between builds. See ``AssetLoader``
+        optimizer: If set, resized variants of image assets are added to the
+            build, and listed under 'assetVariants'
+        bibtex_cache: Persistent cache of parsed citations
 
     Returns:
         A JSON-able dict containing all dataset content
     """
-    if build_dir.exists():
+    merger = _FamilyBuildMerger()
+    dataset_families: dict[str, dict[str, Any]] = {}
+
+    for family_build in iter_family_builds(
+        build_dir,
+        content_dir,
+        asset_destination_url_prefix,
+        incremental=incremental,
+        jobs=jobs,
+        digest_cache=digest_cache,
+        asset_store_dir=asset_store_dir,
+        optimizer=optimizer,
+        bibtex_cache=bibtex_cache,
+    ):
+        merger.add(family_build)
+        dataset_families[family_build.slug] = family_build.family
+
+    shared = merger.shared_content()
+
+    return {
+        "assets": shared.pop("assets"),
+        "datasetClasses": shared.pop("datasetClasses"),
+        "datasetFamilies": dataset_families,
+        "datasetCollections": shared.pop("datasetCollections"),
+        "tags": shared.pop("tags"),
+        **shared,
+    }
+
+
+def write_dataset_build(
+    path: Path,
+    family_builds: Iterable[FamilyBuild],
+    *,
+    compact: bool = False,
+    compress: bool = False,
+    index_path: Path | None = None,
+) -> None:
+    """Write 'datasets-build.json' to ``path``, one family at a time. Only one
+    family is held in memory at once, along with the classes, collections, tags
+    and assets shared between families. Families are streamed to a temporary
+    file, and copied into the build once the shared content is known, so the
+    members are in the same order as in ``compile_dataset_build()``.
+
+    The file is written to a temporary path and moved into place once complete,
+    so ``path`` is never left with a partial build.
+
+    If ``index_path`` is set, an index of the build is written there, in the
+    same form as the index of ``write_sharded_build()``, but without paths. The
+    SHA-256 of each document is that of the document written on its own, so it
+    is the same as in a sharded build with the same ``compact``.
+
+    Args:
+        path: Output path
+        family_builds: Compiled families, e.g from ``iter_family_builds()``
+        compact: If True, write JSON without whitespace. Otherwise, it
+            is indented by 2 spaces
+        compress: If True, gzip the output
+        index_path: Path to write the index of the build to
+
+    Raises:
+        RuntimeError: If two families have the same slug, or if a class or
+            collection slug is defined by more than one document
+    """
+    merger = _FamilyBuildMerger()
+    indent = None if compact else 2
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    family_entries: dict[str, dict[str, str]] = {}
+
+    with tempfile.TemporaryFile(
+        "w+", encoding="utf-8", dir=path.parent
+    ) as families_file:
+        with JSONObjectWriter(families_file, indent, level=1) as dataset_families:
+            for family_build in family_builds:
+                merger.add(family_build)
+                dataset_families.write(family_build.slug, family_build.family)
+                if index_path:
+                    family_entries[family_build.slug] = _index_entry(
+                        _dump_json(family_build.family, indent).encode("utf-8")
+                    )
+
+        shared = merger.shared_content()
+        families_file.seek(0)
+
+        try:
+            with _open_text(tmp_path, compress) as f:
+                with JSONObjectWriter(f, indent=indent) as build:
+                    build.write("assets", shared["assets"])
+                    build.write("datasetClasses", shared["datasetClasses"])
+                    build.copy("datasetFamilies", families_file)
+                    for key, value in shared.items():
+                        if key not in ("assets", "datasetClasses"):
+                            build.write(key, value)
+
+                f.write("\n")
+        except BaseException:
+            tmp_path.unlink(missing_ok=True)
+            raise
+
+    os.replace(tmp_path, path)
+
+    if index_path:
+        index = _make_index(
+            family_entries,
+            shared,
+            lambda kind, slug, content: _index_entry(
+                _dump_json(content, indent).encode("utf-8")
+            ),
+        )
+        _write_file_atomic(index_path, _dump_json(index, indent))
+
+
+def write_sharded_build(
+    output_dir: Path,
+    family_builds: Iterable[FamilyBuild],
+    *,
+    compact: bool = False,
+) -> None:
+    """Write the build to ``output_dir`` as one JSON document per family,
+    class and collection, so that clients can fetch, and deploys can upload,
+    only the documents that changed:
+
+        output_dir/
+            index.json
+            families/<slug>.json
+            classes/<slug>.json
+            collections/<slug>.json
+
+    'index.json' maps the slug of each document to its path and the SHA-256 of
+    its content, and includes the tags and assets of the build, e.g:
+
+        {
+            "datasetFamilies": {
+                "foo": {"path": "families/foo.json", "sha256": "..."}
+            },
+            ...
+            "tags": [...],
+            "assets": [...]
+        }
+
+    Families are written as they are compiled, so only one is held in memory
+    at once. The build is written to a temporary directory, which replaces
+    ``output_dir`` once complete.
+
+    Args:
+        output_dir: Output directory
+        family_builds: Compiled families, e.g from ``iter_family_builds()``
+        compact: If True, write JSON without whitespace. Otherwise, it
+            is indented by 2 spaces
+
+    Raises:
+        RuntimeError: If two families have the same slug, or if a class or
+            collection slug is defined by more than one document
+    """
+    merger = _FamilyBuildMerger()
+    indent = None if compact else 2
+    tmp_dir = output_dir.with_name(f"{output_dir.name}.tmp")
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+
+    try:
+        dataset_families = {}
+        for family_build in family_builds:
+            merger.add(family_build)
+            dataset_families[family_build.slug] = _write_shard(
+                tmp_dir, "families", family_build.slug, family_build.family, indent
+            )
+
+        index = _make_index(
+            dataset_families,
+            merger.shared_content(),
+            lambda kind, slug, content: _write_shard(
+                tmp_dir, kind, slug, content, indent
+            ),
+        )
+        with open(tmp_dir / "index.json", "w", encoding="utf-8") as f:
+            f.write(_dump_json(index, indent))
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    if output_dir.exists():
+        old_dir = output_dir.with_name(f"{output_dir.name}.old")
+        if old_dir.exists():
+            shutil.rmtree(old_dir)
+
+        os.replace(output_dir, old_dir)
+        os.replace(tmp_dir, output_dir)
+        shutil.rmtree(old_dir)
+    else:
+        os.replace(tmp_dir, output_dir)
+
+
+def iter_family_builds(
+    build_dir: Path,
+    content_dir: Path,
+    asset_destination_url_prefix: str,
+    *,
+    incremental: bool = False,
+    jobs: int = 1,
+    digest_cache: DigestCache | None = None,
+    asset_store_dir: Path | None = None,
+    optimizer: AssetOptimizer | None = None,
+    bibtex_cache: BibtexCache | None = None,
+) -> Iterator[FamilyBuild]:
+    """Compile every `dataset.json` file in the `content/` directory, yielding
+    each family as it is compiled. Families are yielded in the same order
+    regardless of ``jobs``.
+
+    Every build writes a manifest of the files each family was compiled from
+    to the build directory. If ``incremental`` is True, the build directory is
+    kept and families whose files are unchanged since the last build are reused.
+    The manifest is written, and assets that are no longer used are removed
+    from the build directory and the asset store, once the last family has
+    been yielded.
+
+    If ``jobs`` is greater than 1, families are loaded and validated in a pool
+    of processes.
+
+    The build directory is cleared when this function is called, rather than
+    when iteration starts, so that output can be written to it.
+
+    Args:
+        build_dir: The build directory
+        content_dir: The content directory
+        asset_destination_url_prefix: The URL prefix where uploaded assets (images, etc)
+            can be accessed.
+        incremental: Whether to reuse the results of the previous build
+        jobs: Number of processes used to compile families
+        digest_cache: Cache used when hashing content files and assets
+        asset_store_dir: Directory of a content-addressed asset store that is
+            kept between builds. See ``AssetLoader``
+        optimizer: If set, resized variants of image assets are added to the
+            build, and listed under 'assetVariants'
+        bibtex_cache: Persistent cache of parsed citations
+    """
+    if build_dir.exists() and not incremental:
         shutil.rmtree(build_dir)
 
-    build_dir.mkdir()
-    doctree = Doctree(content_dir)
+    build_dir.mkdir(exist_ok=True)
+    build_cache = BuildCache(
+        build_dir,
+        content_dir,
+        asset_destination_url_prefix,
+        digest_cache,
+        options={"assetOptimizer": optimizer.settings_key} if optimizer else None,
+    )
+    asset_loader = AssetLoader(
+        build_dir,
+        asset_destination_url_prefix,
+        digest_cache,
+        asset_store_dir,
+        optimizer,
+    )
+
+    return _iter_family_builds(
+        build_cache,
+        asset_loader,
+        content_dir,
+        jobs=jobs,
+        bibtex_cache=bibtex_cache,
+    )
+
 
-    dataset_classes: dict[str, DatasetClass] = {}
-    dataset_families: dict[str, DatasetFamily] = {}
-    dataset_collections: dict[str, DatasetCollection] = {}
-    tagset = set()
+def _iter_family_builds(
+    build_cache: BuildCache,
+    asset_loader: AssetLoader,
+    content_dir: Path,
+    *,
+    jobs: int,
+    bibtex_cache: BibtexCache | None,
+) -> Iterator[FamilyBuild]:
+    dataset_json_paths = list(content_dir.rglob("**/dataset.json"))
+    fresh = {path for path in dataset_json_paths if build_cache.is_fresh(path)}
 
-    for dataset_json_path in content_dir.rglob("**/dataset.json"):
-        family = DatasetFamily.from_os_path(
-            doctree, dataset_json_path, resolve_refs=True
+    uncached = [path for path in dataset_json_paths if path not in fresh]
+    if jobs > 1 and len(uncached) > 1:
+        compiled = _compile_families_parallel(
+            content_dir, asset_loader, bibtex_cache, uncached, jobs
+        )
+    else:
+        compiled = _compile_families(
+            FamilyCompiler(content_dir, asset_loader, bibtex_cache), uncached
         )
 
-        if family.slug in dataset_families:
-            raise RuntimeError(
-                f"DatasetFamily with slug '{family.slug}' already exists"
+    assets: set[str] = set()
+    fallback_compiler: FamilyCompiler | None = None
+    for dataset_json_path in dataset_json_paths:
+        if dataset_json_path not in fresh:
+            family_build, dependencies = next(compiled)
+            build_cache.put(dataset_json_path, family_build, dependencies)
+        elif not (family_build := build_cache.get(dataset_json_path)):
+            # The cached fragment could not be read, so compile the family here
+            if not fallback_compiler:
+                fallback_compiler = FamilyCompiler(
+                    content_dir, asset_loader, bibtex_cache
+                )
+            family_build, dependencies = fallback_compiler.compile(dataset_json_path)
+            build_cache.put(dataset_json_path, family_build, dependencies)
+
+        assets.update(family_build.assets)
+        yield family_build
+
+    asset_loader.remove_unused_assets(assets)
+
+    build_cache.save()
+
+
+class FamilyCompiler:
+    """Compiles families into a shared document tree, so that documents
+    like classes are only loaded once. Used by builds, and by ``LiveBuild``
+    to keep the tree between updates.
+
+    Attributes:
+        doctree: The shared document tree
+        asset_loader: Copies local assets to the build directory
+        bibtex_cache: Persistent cache of parsed citations
+    """
+
+    def __init__(
+        self,
+        content_dir: Path,
+        asset_loader: AssetLoader,
+        bibtex_cache: BibtexCache | None = None,
+    ):
+        self.doctree = Doctree(content_dir)
+        self.asset_loader = asset_loader
+        self.bibtex_cache = bibtex_cache
+
+    def compile(self, dataset_json_path: Path) -> tuple[FamilyBuild, set[Path]]:
+        """Load and validate the family at ``dataset_json_path``, and copy its
+        local assets to the build directory.
+
+        Returns:
+            The compiled build of the family, and the paths of all files it
+            was compiled from
+        """
+        key = os.path.relpath(dataset_json_path, self.doctree.docpath_root)
+        with profiling.scope("compile_family", key):
+            with bibtex.use_cache(self.bibtex_cache):
+                family = validate_family(self.doctree, dataset_json_path)
+
+            with profiling.span("parameter_index"):
+                parameter_index = ParameterIndex.from_family(family)
+                family.parameter_tree = parameter_index.tree
+                family.parameter_lookup = parameter_index.lookup_table() or None
+
+            for asset in iter_assets(family):
+                asset.root = self.asset_loader.add_asset(asset)
+
+            with profiling.span("dump_family"):
+                family_build = _make_family_build(family, self.asset_loader)
+
+        return (
+            family_build,
+            {dataset_json_path} | self.doctree.get_dependencies(dataset_json_path),
+        )
+
+
+def _compile_families(
+    compiler: FamilyCompiler, dataset_json_paths: list[Path]
+) -> Iterator[tuple[FamilyBuild, set[Path]]]:
+    """Compile the families at ``dataset_json_paths`` one at a time."""
+    for dataset_json_path in dataset_json_paths:
+        yield compiler.compile(dataset_json_path)
+
+
+_worker_compiler: FamilyCompiler | None = None
+
+
+def _init_worker(
+    content_dir: Path, asset_loader: AssetLoader, bibtex_cache: BibtexCache | None
+) -> None:
+    global _worker_compiler
+    _worker_compiler = FamilyCompiler(content_dir, asset_loader, bibtex_cache)
+
+
+def _compile_family_in_worker(
+    dataset_json_path: Path,
+) -> tuple[FamilyBuild, set[Path]]:
+    return typing.cast(FamilyCompiler, _worker_compiler).compile(dataset_json_path)
+
+
+def _compile_families_parallel(
+    content_dir: Path,
+    asset_loader: AssetLoader,
+    bibtex_cache: BibtexCache | None,
+    dataset_json_paths: list[Path],
+    jobs: int,
+) -> Iterator[tuple[FamilyBuild, set[Path]]]:
+    """Compile families in a pool of ``jobs`` processes. Each process keeps its
+    own document tree, and is sent contiguous chunks of families so that
+    families in the same directory can share documents like their class.
+    Results are yielded in the same order as ``dataset_json_paths``."""
+    chunk_size = math.ceil(len(dataset_json_paths) / (jobs * 4))
+
+    with ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=_init_worker,
+        initargs=(content_dir, asset_loader, bibtex_cache),
+    ) as executor:
+        yield from executor.map(
+            _compile_family_in_worker, dataset_json_paths, chunksize=chunk_size
+        )
+
+
+def _make_family_build(family: DatasetFamily, asset_loader: AssetLoader) -> FamilyBuild:
+    """Dump a loaded family, its class and its collection to JSON."""
+    class_ = typing.cast(DatasetClass, family.class_)
+    collection = typing.cast(DatasetCollection | None, family.collection)
+
+    assets = {str(asset.root) for asset in iter_assets(family)}
+    asset_variants = {
+        url: asset_loader.asset_variants[url]
+        for url in sorted(assets)
+        if url in asset_loader.asset_variants
+    }
+    for variants in asset_variants.values():
+        assets.update(variant.url for variant in variants)
+
+    staged_assets = [
+        (asset_loader.asset_dir / name).relative_to(asset_loader.build_dir).as_posix()
+        for url in sorted(assets)
+        if (name := asset_loader.asset_name(url))
+    ]
+
+    return FamilyBuild(
+        slug=family.slug,
+        family=family.model_dump(mode="json", by_alias=True),
+        dataset_class=DocumentBuild(
+            slug=class_.slug,
+            source=str(class_.document_context.path),
+            content=class_.model_dump(mode="json", by_alias=True),
+        ),
+        dataset_collection=(
+            DocumentBuild(
+                slug=collection.slug,
+                source=str(collection.document_context.path),
+                content=collection.model_dump(mode="json", by_alias=True),
             )
+            if collection
+            else None
+        ),
+        tags=list(family.meta.tags),
+        assets=sorted(assets),
+        asset_variants=asset_variants,
+        staged_assets=staged_assets,
+    )
+
+
+class _FamilyBuildMerger:
+    """Checks compiled families for conflicts, and collects the content
+    they share."""
 
-        for tag in family.meta.tags:
-            tagset.add(tag)
+    def __init__(self):
+        self.slugs: set[str] = set()
+        self.dataset_classes: dict[str, DocumentBuild] = {}
+        self.dataset_collections: dict[str, DocumentBuild] = {}
+        self.tags: set[str] = set()
+        self.assets: set[str] = set()
+        self.asset_variants: dict[str, list[AssetVariant]] = {}
+
+    def add(self, family_build: FamilyBuild) -> None:
+        """Add a compiled family.
+
+        Raises:
+            RuntimeError: If a family with the same slug was already added, or if
+                the family's class or collection slug is defined by a different
+                document than in a previous family
+        """
+        if family_build.slug in self.slugs:
+            raise RuntimeError(
+                f"DatasetFamily with slug '{family_build.slug}' already exists"
+            )
 
-        class_ = typing.cast(DatasetClass, family.class_)
-        if not (existing_type := dataset_classes.get(class_.slug)):
-            dataset_classes[class_.slug] = class_
-        elif existing_type.document_context.os_path != class_.document_context.os_path:
+        class_ = family_build.dataset_class
+        if not (existing_type := self.dataset_classes.get(class_.slug)):
+            self.dataset_classes[class_.slug] = class_
+        elif existing_type.source != class_.source:
             raise RuntimeError(
-                f"Duplicate 'DatasetClass' definition on family '{family.slug}'"
+                f"Duplicate 'DatasetClass' definition on family '{family_build.slug}'"
             )
 
-        collection = typing.cast(DatasetCollection | None, family.collection)
-        if collection:
-            existing = existing = dataset_collections.get(collection.slug)
+        if collection := family_build.dataset_collection:
+            existing = self.dataset_collections.get(collection.slug)
             if not existing:
-                dataset_collections[collection.slug] = collection
-            elif (
-                existing.document_context.os_path != collection.document_context.os_path
-            ):
+                self.dataset_collections[collection.slug] = collection
+            elif existing.source != collection.source:
                 raise RuntimeError(
-                    f"Duplicate 'DatasetCollection' definition on family '{family.slug}'"
+                    "Duplicate 'DatasetCollection' definition on family "
+                    f"'{family_build.slug}'"
                 )
 
-        family.parameter_tree = build_parameter_tree(family)
-        dataset_families[family.slug] = family
-
-    asset_loader = AssetLoader(build_dir, asset_destination_url_prefix)
-    for asset in doctree.get_objects(Asset):
-        asset.root = asset_loader.add_asset(asset)
-
-    build = DatasetBuild(
-        assets=doctree.get_objects(Asset),
-        dataset_classes=dataset_classes,
-        dataset_families=dataset_families,
-        dataset_collections=dataset_collections,
-        tags=sorted(tagset),
-    ).model_dump(
-        mode="json",
-        by_alias=True,
-    )
+        self.slugs.add(family_build.slug)
+        self.tags.update(family_build.tags)
+        self.assets.update(family_build.assets)
+        self.asset_variants.update(family_build.asset_variants)
+
+    def shared_content(self) -> dict[str, Any]:
+        """Return the members of 'datasets-build.json' other than the families.
+        'assetVariants' is only included if there are image variants."""
+        content: dict[str, Any] = {
+            "assets": sorted(self.assets),
+            "datasetClasses": {
+                slug: class_.content for slug, class_ in self.dataset_classes.items()
+            },
+            "datasetCollections": {
+                slug: collection.content
+                for slug, collection in self.dataset_collections.items()
+            },
+            "tags": sorted(self.tags),
+        }
+        if self.asset_variants:
+            content["assetVariants"] = {
+                url: [
+                    variant.model_dump(mode="json", by_alias=True)
+                    for variant in variants
+                ]
+                for url, variants in sorted(self.asset_variants.items())
+            }
+
+        return content
+
+
+def _make_index(
+    family_entries: dict[str, dict[str, str]],
+    shared: dict[str, Any],
+    make_entry: Callable[[str, str, Any], dict[str, str]],
+) -> dict[str, Any]:
+    """Return the index of a build, with ``family_entries`` and an entry made by
+    ``make_entry(kind, slug, content)`` for each class and collection in
+    ``shared``, the content returned by ``_FamilyBuildMerger.shared_content()``."""
+    shared = dict(shared)
+
+    return {
+        "datasetFamilies": family_entries,
+        "datasetClasses": {
+            slug: make_entry("classes", slug, content)
+            for slug, content in shared.pop("datasetClasses").items()
+        },
+        "datasetCollections": {
+            slug: make_entry("collections", slug, content)
+            for slug, content in shared.pop("datasetCollections").items()
+        },
+        **shared,
+    }
+
+
+def _write_shard(
+    output_dir: Path, kind: str, slug: str, content: Any, indent: int | None
+) -> dict[str, str]:
+    """Write ``content`` to 'output_dir/kind/slug.json', and return its
+    entry in the index."""
+    data = _dump_json(content, indent).encode("utf-8")
+    path = f"{kind}/{slug}.json"
+
+    (output_dir / kind).mkdir(parents=True, exist_ok=True)
+    (output_dir / path).write_bytes(data)
+
+    return {"path": path, **_index_entry(data)}
+
+
+def _index_entry(data: bytes) -> dict[str, str]:
+    return {"sha256": hashlib.sha256(data).hexdigest()}
+
+
+def _write_file_atomic(path: Path, text: str) -> None:
+    tmp_path = path.with_name(f"{path.name}.tmp")
+    try:
+        tmp_path.write_text(text, encoding="utf-8")
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    os.replace(tmp_path, path)
+
+
+def _dump_json(value: Any, indent: int | None) -> str:
+    separators = (",", ":") if indent is None else None
+
+    return json.dumps(value, indent=indent, separators=separators) + "\n"
+
 
-    build["assets"].sort()
+def _open_text(path: Path, compress: bool) -> typing.TextIO:
+    if compress:
+        return typing.cast(typing.TextIO, gzip.open(path, "wt", encoding="utf-8"))
 
-    return build
+    return open(path, "w", encoding="utf-8")
@@ -1,28 +1,119 @@
-from dsets.schemas import Dataset, DatasetFamily, DatasetParameterNode
+import copy
+import json
+from collections.abc import Iterator, Mapping
+from dataclasses import dataclass
 
+from dsets.schemas import Dataset, DatasetFamily, DatasetParameterNode, DatasetTable
 
-def build_parameter_tree(family: DatasetFamily):
-    partial = family.parameter_tree
-    if partial is None:
-        partial = DatasetParameterNode(next={})
+ParameterValues = tuple[str | None, ...]
 
-    if not family.class_.parameter_list:
-        return partial
 
-    parameter_names = [parameter.name for parameter in family.class_.parameter_list]
+@dataclass(frozen=True)
+class ParameterIndex:
+    """Index of the datasets of a family by their parameter values.
 
-    for dataset in family.data:
-        _build_parameter_tree_dataset(parameter_names, dataset, partial)
+    The tree has a level for each parameter of the family's class, in order.
+    Every node has a 'default', which is the value given by the family's
+    'parameterTree', or otherwise the value of the first dataset under the node.
 
-    return partial
+    Attributes:
+        parameter_names: Names of the parameters, in order
+        tree: Tree of parameter values
+        lookup: Data URL of each dataset, by its parameter values
+    """
 
+    parameter_names: tuple[str, ...]
+    tree: DatasetParameterNode
+    lookup: dict[ParameterValues, str | None]
 
-def _build_parameter_tree_dataset(
-    parameter_names: list[str], dataset: Dataset, root: DatasetParameterNode
-):
-    curr = root
-    values = [dataset.parameters[name] for name in parameter_names]
+    @classmethod
+    def from_family(cls, family: DatasetFamily) -> "ParameterIndex":
+        """Build the index of ``family``, in a single pass over its datasets.
+        Nodes in the family's 'parameterTree' are kept, along with their defaults.
+
+        Raises:
+            ValueError: If a dataset does not define a parameter that is not
+                optional, if two datasets have the same parameters, or if a default
+                in the 'parameterTree' is not a value of any dataset
+        """
+        tree = copy.deepcopy(family.parameter_tree) or DatasetParameterNode(next={})
+        parameter_list = family.class_.parameter_list
+        if not parameter_list:
+            return cls((), tree, {})
+
+        parameter_names = tuple(parameter.name for parameter in parameter_list)
+        required = [
+            parameter.name for parameter in parameter_list if not parameter.optional
+        ]
+
+        lookup: dict[ParameterValues, str | None] = {}
+        for i, (data_url, parameters) in enumerate(_iter_rows(family.data)):
+            if missing := [name for name in required if name not in parameters]:
+                raise ValueError(
+                    f"Dataset {i} of family '{family.slug}' is missing parameters: "
+                    f"{missing}"
+                )
+
+            values = tuple(parameters.get(name) for name in parameter_names)
+            if values in lookup:
+                raise ValueError(
+                    f"Dataset {i} of family '{family.slug}' has the same parameters "
+                    f"as a previous dataset: {dict(zip(parameter_names, values))}"
+                )
+
+            lookup[values] = data_url
+            _add_values(tree, values)
+
+        _set_defaults(family.slug, tree)
+
+        return cls(parameter_names, tree, lookup)
+
+    def resolve(self, parameters: Mapping[str, str | None]) -> str | None:
+        """Return the data URL of the dataset with ``parameters``. Parameters
+        that are not given are set to their default.
+
+        Raises:
+            KeyError: If there is no dataset with the parameters
+        """
+        values: list[str | None] = []
+        node: DatasetParameterNode | None = self.tree
+        for name in self.parameter_names:
+            if name in parameters:
+                value = parameters[name]
+            elif node is not None:
+                value = node.get("default")
+            else:
+                raise KeyError(name)
+
+            values.append(value)
+            node = node["next"].get(value) if node is not None else None
 
+        return self.lookup[tuple(values)]
+
+    def lookup_table(self) -> dict[str, str | None]:
+        """Return the lookup table as JSON, keyed by the JSON array of
+        parameter values, e.g '["H2","STO-3G","0.5"]'. Keys are encoded the same
+        way as ``JSON.stringify()``."""
+        return {
+            json.dumps(list(values), ensure_ascii=False, separators=(",", ":")): url
+            for values, url in self.lookup.items()
+        }
+
+
+def _iter_rows(
+    data: list[Dataset] | DatasetTable,
+) -> Iterator[tuple[str | None, dict[str, str | None]]]:
+    """Yield the data URL and parameters of each dataset in ``data``."""
+    if isinstance(data, DatasetTable):
+        yield from data.iter_rows()
+    else:
+        for dataset in data:
+            data_url = str(dataset.data_url) if dataset.data_url else None
+            yield data_url, dataset.parameters
+
+
+def _add_values(root: DatasetParameterNode, values: ParameterValues) -> None:
+    curr = root
     for value in values[:-1]:
         if (next := curr["next"].get(value)) is None:
             next = DatasetParameterNode(next={})
@@ -31,3 +122,20 @@ def _build_parameter_tree_dataset(
         curr = next
 
     curr["next"][values[-1]] = None
+
+
+def _set_defaults(slug: str, node: DatasetParameterNode) -> None:
+    if not node["next"]:
+        return
+
+    if "default" not in node:
+        node["default"] = next(iter(node["next"]))
+    elif node["default"] not in node["next"]:
+        raise ValueError(
+            f"Default parameter '{node['default']}' of family '{slug}' does not "
+            "match any dataset"
+        )
+
+    for child in node["next"].values():
+        if child is not None:
+            _set_defaults(slug, child)
@@ -0,0 +1,199 @@
+import gzip
+import hashlib
+import html
+import importlib.util
+import json
+import threading
+from collections.abc import Iterable
+from pathlib import Path
+
+from aiohttp import web
+
+from .build_cache import FamilyBuild
+from .watch import LiveBuild, RebuildSummary
+
+if importlib.util.find_spec("brotli"):
+    import brotli
+else:
+    brotli = None
+
+
+class PreviewServer:
+    """Serves a ``LiveBuild`` over HTTP, for previewing the build locally.
+
+    Routes:
+        '/': HTML index of all families
+        '/datasets-build.json': The full build
+        '/families/{slug}.json': A single family
+        '/assets/{name}': Assets in the build directory
+
+    JSON responses are held in memory, and have an ETag derived from their
+    content, so unchanged responses are not sent again. They are compressed
+    with gzip, or brotli if it is installed, when the client accepts it.
+    Families are only serialized and compressed again when they are rebuilt.
+
+    If 'datasets-build.json' cannot be written, the last build that was
+    written is served. If none was, '/datasets-build.json' responds with a 503
+    and the errors of the build.
+
+    Attributes:
+        live_build: The build to serve
+    """
+
+    def __init__(self, live_build: LiveBuild, summary: RebuildSummary | None = None):
+        self.live_build = live_build
+        self._lock = threading.Lock()
+        self._payloads: dict[str, _Payload] = {}
+        self._family_payloads: dict[str, tuple[FamilyBuild, _Payload]] = {}
+        self._errors: dict[Path, Exception] = summary.errors if summary else {}
+
+        self.refresh()
+
+    def update(self, changed_paths: Iterable[Path]) -> RebuildSummary:
+        """Update the build for changes to the files at ``changed_paths``, and
+        serve the result."""
+        with self._lock:
+            summary = self.live_build.update(changed_paths)
+            if summary.written or summary.errors:
+                self._errors = summary.errors
+            if summary.written:
+                self.refresh()
+
+        return summary
+
+    def refresh(self) -> None:
+        """Serve the current state of the build."""
+        family_payloads = {}
+        for family_build in self.live_build.family_builds:
+            cached = self._family_payloads.get(family_build.slug)
+            if cached and cached[0] is family_build:
+                family_payloads[family_build.slug] = cached
+            else:
+                family_payloads[family_build.slug] = (
+                    family_build,
+                    _Payload.json(family_build.family),
+                )
+
+        payloads = {"/": _Payload(_render_index(family_payloads), "text/html")}
+        try:
+            payloads["/datasets-build.json"] = _Payload(
+                self.live_build.build_file.read_bytes(), "application/json"
+            )
+        except FileNotFoundError:
+            if build_payload := self._payloads.get("/datasets-build.json"):
+                payloads["/datasets-build.json"] = build_payload
+
+        for slug, (_, payload) in family_payloads.items():
+            payloads[f"/families/{slug}.json"] = payload
+
+        # Replace both at once, so requests never see a partial update
+        self._family_payloads, self._payloads = family_payloads, payloads
+
+    def make_app(self) -> web.Application:
+        """Create the ``aiohttp`` application."""
+        app = web.Application()
+        app.router.add_get("/", self._handle_payload)
+        app.router.add_get("/datasets-build.json", self._handle_payload)
+        app.router.add_get("/families/{slug}.json", self._handle_payload)
+        app.router.add_static("/assets/", self.live_build.build_dir / "assets")
+
+        return app
+
+    async def _handle_payload(self, request: web.Request) -> web.StreamResponse:
+        if not (payload := self._payloads.get(request.path)):
+            if request.path == "/datasets-build.json":
+                raise web.HTTPServiceUnavailable(text=self._render_errors())
+
+            raise web.HTTPNotFound()
+
+        headers = {
+            "ETag": payload.etag,
+            "Cache-Control": "no-cache",
+            "Vary": "Accept-Encoding",
+        }
+        if payload.etag in _parse_if_none_match(request.headers.get("If-None-Match")):
+            return web.Response(status=304, headers=headers)
+
+        body = payload.body
+        if encoding := _choose_encoding(request.headers.get("Accept-Encoding", "")):
+            body = payload.encoded(encoding)
+            headers["Content-Encoding"] = encoding
+
+        return web.Response(
+            body=body, content_type=payload.content_type, headers=headers
+        )
+
+    def _render_errors(self) -> str:
+        errors = "\n".join(f"{path}: {exc}" for path, exc in self._errors.items())
+
+        return f"The build has not been written.\n{errors}\n"
+
+
+class _Payload:
+    """A response body, with its ETag and compressed encodings."""
+
+    def __init__(self, body: bytes, content_type: str):
+        self.body = body
+        self.content_type = content_type
+        # Weak, since the same ETag is used for every encoding
+        self.etag = f'W/"{hashlib.sha1(body).hexdigest()}"'
+        self._encoded: dict[str, bytes] = {}
+
+    @classmethod
+    def json(cls, value: object) -> "_Payload":
+        body = json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+        return cls(body, "application/json")
+
+    def encoded(self, encoding: str) -> bytes:
+        """Return the body compressed with ``encoding``, which must be 'br'
+        or 'gzip'."""
+        if (encoded := self._encoded.get(encoding)) is None:
+            if encoding == "br":
+                encoded = brotli.compress(self.body)
+            else:
+                encoded = gzip.compress(self.body, compresslevel=6, mtime=0)
+
+            self._encoded[encoding] = encoded
+
+        return encoded
+
+
+def _choose_encoding(accept_encoding: str) -> str | None:
+    """Return the preferred encoding accepted by the client, if any."""
+    accepted = set()
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        if params.strip().replace(" ", "") in ("q=0", "q=0.0", "q=0.00", "q=0.000"):
+            continue
+
+        accepted.add(coding.strip().lower())
+
+    if brotli and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+
+    return None
+
+
+def _parse_if_none_match(if_none_match: str | None) -> set[str]:
+    if not if_none_match:
+        return set()
+
+    return {etag.strip() for etag in if_none_match.split(",")}
+
+
+def _render_index(family_payloads: dict[str, tuple[FamilyBuild, _Payload]]) -> bytes:
+    rows = "\n".join(
+        f'<li><a href="/families/{html.escape(slug)}.json">{html.escape(slug)}</a>'
+        f" ({len(payload.body) / 1024:.1f} KiB)</li>"
+        for slug, (_, payload) in family_payloads.items()
+    )
+
+    return (
+        "<!doctype html>\n<title>Datasets build preview</title>\n"
+        "<h1>Datasets build preview</h1>\n"
+        '<p><a href="/datasets-build.json">datasets-build.json</a>'
+        f" ({len(family_payloads)} families)</p>\n<ul>\n{rows}\n</ul>\n"
+    ).encode("utf-8")
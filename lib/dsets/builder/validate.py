@@ -0,0 +1,63 @@
+from collections.abc import Iterable
+from pathlib import Path
+
+from dsets.lib.doctree import Doctree, iter_assets, scan_dependencies
+from dsets.schemas import DatasetFamily
+
+
+def validate_family(doctree: Doctree, dataset_json_path: Path) -> DatasetFamily:
+    """Load and validate the family at ``dataset_json_path``, resolving all
+    references, and check that its local assets exist. Local assets are
+    recorded as dependencies of the documents that use them.
+
+    Args:
+        doctree: Document tree containing the family
+        dataset_json_path: Path to the family's 'dataset.json'
+
+    Returns:
+        The loaded family
+
+    Raises:
+        pydantic.ValidationError: If the family or a referenced document is invalid
+        FileNotFoundError: If a referenced document or local asset does not exist
+    """
+    family = DatasetFamily.from_os_path(doctree, dataset_json_path, resolve_refs=True)
+
+    for asset in iter_assets(family):
+        if not asset.is_local:
+            continue
+
+        os_path = asset.os_path
+        doctree.add_dependency(asset.document_context.os_path, os_path)
+        if not os_path.is_file():
+            raise FileNotFoundError(f"Asset file does not exist: '{os_path}'")
+
+    return family
+
+
+def find_affected_families(
+    content_dir: Path, changed_paths: Iterable[Path]
+) -> list[Path]:
+    """Return the paths of all 'dataset.json' files in ``content_dir`` that are
+    affected by changes to the files at ``changed_paths``. Dependencies are found
+    with ``scan_dependencies()``, so no documents are validated.
+
+    Args:
+        content_dir: The content directory
+        changed_paths: Paths of added, modified or deleted files
+
+    Returns:
+        Paths of affected families
+    """
+    doctree = Doctree(content_dir)
+    changed_paths = [Path(path).absolute().resolve() for path in changed_paths]
+    dataset_json_paths = list(content_dir.rglob("**/dataset.json"))
+
+    scan_dependencies(doctree, dataset_json_paths, asset_paths=changed_paths)
+    affected = doctree.get_affected(changed_paths)
+
+    return [
+        dataset_json_path
+        for dataset_json_path in dataset_json_paths
+        if dataset_json_path.absolute().resolve() in affected
+    ]
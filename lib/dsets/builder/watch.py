@@ -0,0 +1,173 @@
+import os
+import time
+from collections.abc import Iterable
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from dsets.lib.bibtex import BibtexCache
+from dsets.lib.file_hash import DigestCache
+
+from .assets import AssetLoader
+from .build_cache import BuildCache, FamilyBuild
+from .datasets_build import FamilyCompiler, write_dataset_build
+
+
+@dataclass(frozen=True)
+class RebuildSummary:
+    """Summary of an update to a ``LiveBuild``.
+
+    Attributes:
+        compiled: Number of families that were compiled
+        removed: Number of families that were removed
+        errors: Errors raised while compiling each family, or writing the build
+        written: Whether 'datasets-build.json' was rewritten
+        seconds: Duration of the update
+    """
+
+    compiled: int
+    removed: int
+    errors: dict[Path, Exception] = field(default_factory=dict)
+    written: bool = False
+    seconds: float = 0.0
+
+
+class LiveBuild:
+    """A build of the content directory that is kept in memory, and updated
+    when files change. Only families affected by a change are compiled again,
+    using a document tree that is kept between updates, so referenced documents
+    that have not changed are not reloaded.
+
+    If a family fails to compile, its last good build is kept, and it is
+    compiled again on every update until it succeeds.
+
+    Attributes:
+        build_dir: The build directory
+        content_dir: The content directory
+        build_file: Path to 'datasets-build.json'
+    """
+
+    def __init__(
+        self,
+        build_dir: Path,
+        content_dir: Path,
+        asset_destination_url_prefix: str,
+        *,
+        digest_cache: DigestCache | None = None,
+        asset_store_dir: Path | None = None,
+        bibtex_cache: BibtexCache | None = None,
+    ):
+        self.build_dir = build_dir
+        self.content_dir = content_dir
+        self.build_file = build_dir / "datasets-build.json"
+
+        build_dir.mkdir(parents=True, exist_ok=True)
+        self._build_cache = BuildCache(
+            build_dir, content_dir, asset_destination_url_prefix, digest_cache
+        )
+        self._compiler = FamilyCompiler(
+            content_dir,
+            AssetLoader(
+                build_dir, asset_destination_url_prefix, digest_cache, asset_store_dir
+            ),
+            bibtex_cache,
+        )
+        self._family_builds: dict[Path, FamilyBuild] = {}
+        self._failed: set[Path] = set()
+
+    @property
+    def family_builds(self) -> list[FamilyBuild]:
+        """The latest build of each family, in the order they are written."""
+        return list(self._family_builds.values())
+
+    def build(self) -> RebuildSummary:
+        """Compile every family, and write 'datasets-build.json'."""
+        dataset_json_paths = self._find_families()
+
+        return self._update(dataset_json_paths, dataset_json_paths)
+
+    def update(self, changed_paths: Iterable[Path]) -> RebuildSummary:
+        """Compile the families affected by changes to the files at
+        ``changed_paths``, and rewrite 'datasets-build.json' if any
+        families changed.
+
+        Args:
+            changed_paths: Paths of added, modified or deleted files
+        """
+        changed_paths = [_normalize_path(path) for path in changed_paths]
+
+        affected = self._compiler.doctree.invalidate(changed_paths)
+        self._compiler.asset_loader.invalidate(changed_paths)
+        self._build_cache.invalidate(changed_paths)
+
+        dataset_json_paths = self._find_families()
+        stale = [
+            path
+            for path in dataset_json_paths
+            if path in affected
+            or path in self._failed
+            or path not in self._family_builds
+        ]
+
+        return self._update(dataset_json_paths, stale)
+
+    def _update(
+        self, dataset_json_paths: list[Path], stale: list[Path]
+    ) -> RebuildSummary:
+        start = time.perf_counter()
+
+        removed = self._family_builds.keys() - set(dataset_json_paths)
+        for path in removed:
+            del self._family_builds[path]
+            self._build_cache.remove(path)
+            self._failed.discard(path)
+
+        errors: dict[Path, Exception] = {}
+        for path in stale:
+            try:
+                family_build, dependencies = self._compiler.compile(path)
+            except Exception as exc:
+                # Any error in one family is reported, and must not end the watch
+                errors[path] = exc
+                self._failed.add(path)
+                continue
+
+            self._failed.discard(path)
+            self._family_builds[path] = family_build
+            self._build_cache.put(path, family_build, dependencies)
+
+        self._family_builds = {
+            path: self._family_builds[path]
+            for path in dataset_json_paths
+            if path in self._family_builds
+        }
+
+        written = False
+        if len(errors) < len(stale) or removed:
+            family_builds = self.family_builds
+            try:
+                write_dataset_build(self.build_file, family_builds)
+                written = True
+            except RuntimeError as exc:
+                errors[self.build_file] = exc
+
+            self._compiler.asset_loader.remove_unused_assets(
+                asset for family_build in family_builds for asset in family_build.assets
+            )
+            self._build_cache.save()
+
+        return RebuildSummary(
+            compiled=len(stale) - len(errors.keys() - {self.build_file}),
+            removed=len(removed),
+            errors=errors,
+            written=written,
+            seconds=time.perf_counter() - start,
+        )
+
+    def _find_families(self) -> list[Path]:
+        return [
+            _normalize_path(path) for path in self.content_dir.rglob("**/dataset.json")
+        ]
+
+
+def _normalize_path(os_path: Path) -> Path:
+    return Path(os.path.normpath(Path(os_path).absolute()))
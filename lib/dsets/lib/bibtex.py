@@ -1,5 +1,18 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from collections.abc import Iterator
+from contextlib import contextmanager
+from contextvars import ContextVar
 from datetime import date
 from inspect import cleandoc
+from typing import ClassVar
+
+import bibtexparser
+from pydantic import BaseModel, ConfigDict
+
+from dsets.lib import profiling
+from dsets.lib.sqlite_cache import SQLiteCache
 
 TEMPLATE = cleandoc(
     """
@@ -28,3 +41,149 @@ def generate_bibtex(
         year=year,
         publication_url=publication_url,
     )
+
+
+class BibtexEntry(BaseModel):
+    """An entry in a Bibtex string, e.g '@misc{...}'.
+
+    Attributes:
+        key: Citation key of the entry
+        entry_type: Type of the entry, e.g 'article'
+        fields: Fields of the entry, in the order they were defined
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    key: str
+    entry_type: str
+    fields: dict[str, str]
+
+    @property
+    def authors(self) -> list[str]:
+        """Names in the 'author' field."""
+        if not (authors := self.fields.get("author")):
+            return []
+
+        return [name.strip() for name in authors.split(" and ")]
+
+
+class ParsedBibtex(BaseModel):
+    """Result of parsing a Bibtex string.
+
+    Attributes:
+        entries: Entries that were parsed
+        failed_blocks: Source text of the blocks that could not be parsed
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    entries: tuple[BibtexEntry, ...] = ()
+    failed_blocks: tuple[str, ...] = ()
+
+
+def parse_bibtex(text: str) -> ParsedBibtex:
+    """Parse a Bibtex string. Results are cached in memory by the SHA1 of
+    ``text``, and in the cache set by ``use_cache()``, if any, so a string is
+    normally parsed once.
+
+    >>> parse_bibtex("@misc{key, author={A and B}}").entries[0].authors
+    ['A', 'B']
+    """
+    digest = hashlib.sha1(text.encode("utf-8")).hexdigest()
+    with _parsed_lock:
+        if (parsed := _parsed.get(digest)) is not None:
+            _parsed.move_to_end(digest)
+            return parsed
+
+    parsed = _parse_bibtex_digest(digest, text)
+    with _parsed_lock:
+        _parsed[digest] = parsed
+        if len(_parsed) > _PARSED_MAXSIZE:
+            _parsed.popitem(last=False)
+
+    return parsed
+
+
+# Parsed strings, most recently used last. Keyed by digest only, so the
+# strings themselves are not kept in memory
+_PARSED_MAXSIZE = 4096
+_parsed: OrderedDict[str, ParsedBibtex] = OrderedDict()
+_parsed_lock = threading.Lock()
+
+
+def _parse_bibtex_digest(digest: str, text: str) -> ParsedBibtex:
+    cache = _cache.get()
+    if cache and (parsed := cache.get(digest)):
+        profiling.count("bibtex_cache_hits")
+        return parsed
+
+    profiling.count("bibtex_parses")
+    with profiling.span("bibtex_parse"):
+        library = bibtexparser.parse_string(text)
+        parsed = ParsedBibtex(
+            entries=tuple(
+                BibtexEntry(
+                    key=entry.key,
+                    entry_type=entry.entry_type,
+                    fields={field.key: str(field.value) for field in entry.fields},
+                )
+                for entry in library.entries
+            ),
+            failed_blocks=tuple(block.raw for block in library.failed_blocks),
+        )
+
+    if cache:
+        cache.put(digest, parsed)
+
+    return parsed
+
+
+class BibtexCache(SQLiteCache):
+    """Persistent cache of parsed Bibtex strings, stored in an SQLite
+    database. Results are keyed by the SHA1 of the string and the version
+    of the parser.
+
+    The cache can be shared by several threads and processes.
+
+    Attributes:
+        path: Path to the database file
+    """
+
+    schema: ClassVar[str] = (
+        "CREATE TABLE IF NOT EXISTS bibtex (digest TEXT,"
+        " parser_version TEXT, parsed TEXT,"
+        " PRIMARY KEY (digest, parser_version))"
+    )
+
+    def get(self, digest: str) -> ParsedBibtex | None:
+        """Return the parsed Bibtex string with SHA1 ``digest``, if it is cached."""
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT parsed FROM bibtex WHERE digest = ? AND parser_version = ?",
+                (digest, bibtexparser.__version__),
+            ).fetchone()
+
+        return ParsedBibtex.model_validate_json(row[0]) if row else None
+
+    def put(self, digest: str, parsed: ParsedBibtex) -> None:
+        """Cache ``parsed``, the result of parsing the string with SHA1 ``digest``."""
+        with self._transaction() as connection:
+            connection.execute(
+                "INSERT OR REPLACE INTO bibtex (digest, parser_version, parsed)"
+                " VALUES (?, ?, ?)",
+                (digest, bibtexparser.__version__, parsed.model_dump_json()),
+            )
+
+
+_cache: ContextVar[BibtexCache | None] = ContextVar("bibtex_cache", default=None)
+
+
+@contextmanager
+def use_cache(cache: BibtexCache | None) -> Iterator[None]:
+    """Use ``cache`` as the persistent layer of ``parse_bibtex()`` within
+    this context."""
+    token = _cache.set(cache)
+    try:
+        yield
+    finally:
+        _cache.reset(token)
@@ -1,36 +1,414 @@
+import gzip
+import hashlib
+import io
 import json
+import shutil
+import time
+import typing
+from dataclasses import dataclass
 from pathlib import Path
+from typing import Any
 
 import requests
-import requests.exceptions
 from requests_auth_aws_sigv4 import AWSSigV4
 
+from dsets.lib.retry import call_with_retries
+
+DeployManifest = dict[str, dict[str, Any] | list[Any]]
+"""Entries of a build, by section. Documents, like families, are represented by
+their SHA-256 from the build index, and other entries, like assets, as they are
+in the index. See ``make_deploy_manifest()``."""
+
+DOCUMENT_SECTIONS = ("datasetFamilies", "datasetClasses", "datasetCollections")
+"""Sections of the build index whose entries are documents."""
+
+REQUEST_TIMEOUT = 300
+"""Timeout in seconds for connecting to the admin API, and for each read of its
+response."""
+
+_RETRY_ON = (requests.ConnectionError, requests.Timeout, requests.HTTPError)
+_RETRY_STATUS_CODES = frozenset({500, 502, 503, 504})
+
+
+@dataclass(frozen=True)
+class DeployResult:
+    """Summary of a deploy.
+
+    Attributes:
+        delta: Whether only the changes since the last deploy were sent
+        changed: Number of entries that were added or changed. Zero if the
+            build was deployed without an index
+        deleted: Number of entries that were deleted
+        request_bytes: Size of the gzipped request body
+        body_bytes: Size of the request body before compression
+        seconds: Duration of the request, including retries
+    """
+
+    delta: bool
+    changed: int
+    deleted: int
+    request_bytes: int
+    body_bytes: int
+    seconds: float
+
+    @property
+    def compression_ratio(self) -> float:
+        """Ratio of the uncompressed size of the body to the size sent."""
+        return self.body_bytes / self.request_bytes if self.request_bytes else 1.0
+
 
 def deploy_datasets_build(
-    datasets_admin_api_url: str, build_path: Path, commit_sha: str
-) -> None:
+    datasets_admin_api_url: str,
+    build_path: Path,
+    commit_sha: str,
+    *,
+    index_path: Path | None = None,
+    manifest_path: Path | None = None,
+    delta: bool = False,
+) -> DeployResult:
     """Deploy datasets build to new datasets service using the admin endpoint.
 
+    The full build is sent as it is on disk, rather than parsed and serialized
+    again. Request bodies are gzipped, and requests that fail with a connection
+    error, a timeout or a 500, 502, 503 or 504 status are retried.
+
+    If ``index_path`` and ``manifest_path`` are set, the manifest of the
+    deployed build is made from its index, and saved to ``manifest_path``. If
+    ``delta`` is also set, a later deploy to the same URL only sends the entries
+    that changed since, and the keys of deleted entries, with a 'PATCH'
+    request. This requires an admin API that applies deltas to the build whose
+    manifest has the SHA-256 given as 'baseManifestSha256'. If the delta fails
+    with any error status, the full build is deployed instead.
+
     Args:
         datasets_admin_api_url: URL of the datasets admin API
-        build_path: Path to datasets-build.json
-        tags: Extra tags for the build
+        build_path: Path to datasets-build.json, which may be gzipped if its
+            name ends with '.gz', or to the directory of a sharded build. The
+            full body of a sharded build is assembled from its documents, and
+            deltas only read the documents that changed.
+        commit_sha: Commit the build was created from
+        index_path: Path to the index written with the build. Defaults to
+            'index.json' in the directory of a sharded build
+        manifest_path: Path to the manifest of the last deploy
+        delta: If True, only deploy the changes since the last deploy
+
+    Returns:
+        Summary of the deploy
 
     Raises:
-        requests.exceptions.RequestException: If the request returns a non-200 status code
+        ValueError: If the request returns a non-200 status code
+        requests.RequestException: If the request failed after retries
     """
-    auth = AWSSigV4(
+    session = requests.Session()
+    session.auth = AWSSigV4(
         "execute-api",
     )
 
-    with open(build_path, "r") as f:
-        build = json.load(f)
+    if index_path is None and build_path.is_dir():
+        index_path = build_path / "index.json"
+
+    manifest = base_manifest = None
+    if index_path and manifest_path:
+        manifest = make_deploy_manifest(_load_json(index_path))
+        if delta:
+            base_manifest = _load_deploy_manifest(manifest_path, datasets_admin_api_url)
+
+    result = None
+    if manifest is not None and base_manifest is not None:
+        result = _deploy_delta(
+            session,
+            datasets_admin_api_url,
+            build_path,
+            commit_sha,
+            base_manifest,
+            manifest,
+        )
+
+    if result is None:
+        body, body_bytes = _gzip_build_envelope(build_path, commit_sha)
+        resp, seconds = _send(session, "PUT", f"{datasets_admin_api_url}/build", body)
+        _check_response(resp)
+        result = DeployResult(
+            delta=False,
+            changed=sum(len(entries) for entries in (manifest or {}).values()),
+            deleted=0,
+            request_bytes=len(body),
+            body_bytes=body_bytes,
+            seconds=seconds,
+        )
+
+    if manifest_path and manifest is not None:
+        _save_deploy_manifest(manifest_path, datasets_admin_api_url, manifest)
+
+    return result
+
+
+def make_deploy_manifest(index: dict[str, Any]) -> DeployManifest:
+    """Return the manifest of the build with ``index``, as written by
+    ``write_dataset_build()`` or ``write_sharded_build()``. Documents are
+    represented by their SHA-256 from the index, and other sections, like
+    'assets' and 'assetVariants', are copied from the index.
+    """
+    return {
+        section: (
+            {key: entry["sha256"] for key, entry in entries.items()}
+            if section in DOCUMENT_SECTIONS
+            else entries
+        )
+        for section, entries in index.items()
+    }
+
+
+def diff_deploy_manifests(
+    base: DeployManifest, manifest: DeployManifest
+) -> dict[str, tuple[list[str], list[str]]]:
+    """Compare two manifests.
+
+    Returns:
+        The keys of added or changed entries, and of deleted entries, for each
+        section with changes. Entries of list sections are their own keys.
+    """
+    changes = {}
+    for section in base.keys() | manifest.keys():
+        base_entries = _keyed_entries(base.get(section, {}))
+        entries = _keyed_entries(manifest.get(section, {}))
+
+        changed = sorted(
+            key for key, value in entries.items() if base_entries.get(key) != value
+        )
+        deleted = sorted(base_entries.keys() - entries.keys())
+        if changed or deleted:
+            changes[section] = (changed, deleted)
+
+    return changes
+
+
+def _deploy_delta(
+    session: requests.Session,
+    datasets_admin_api_url: str,
+    build_path: Path,
+    commit_sha: str,
+    base_manifest: DeployManifest,
+    manifest: DeployManifest,
+) -> DeployResult | None:
+    """Deploy the changes between ``base_manifest`` and ``manifest``. Returns
+    None if the admin API responded to the delta with an error status."""
+    diff = diff_deploy_manifests(base_manifest, manifest)
+    documents = _read_documents(
+        build_path,
+        {
+            section: changed
+            for section, (changed, _) in diff.items()
+            if section in DOCUMENT_SECTIONS
+        },
+    )
+
+    changes: dict[str, bytes] = {}
+    changed_count = deleted_count = 0
+    for section, (changed, deleted) in diff.items():
+        entries = manifest.get(section, [])
+        if section in DOCUMENT_SECTIONS:
+            put = _encode_object(documents[section])
+        elif isinstance(entries, dict):
+            put = _encode_json({key: entries[key] for key in changed})
+        else:
+            put = _encode_json(changed)
+
+        changes[section] = _encode_object({"put": put, "delete": _encode_json(deleted)})
+        changed_count += len(changed)
+        deleted_count += len(deleted)
+
+    data = _encode_object(
+        {
+            "commitSha": _encode_json(commit_sha),
+            "baseManifestSha256": _encode_json(_manifest_sha256(base_manifest)),
+            "manifestSha256": _encode_json(_manifest_sha256(manifest)),
+            "changes": _encode_object(changes),
+        }
+    )
+    body = gzip.compress(data, compresslevel=6, mtime=0)
+    try:
+        resp, seconds = _send(session, "PATCH", f"{datasets_admin_api_url}/build", body)
+    except requests.HTTPError:
+        return None
+
+    if resp.status_code >= 400:
+        return None
+
+    _check_response(resp)
+
+    return DeployResult(
+        delta=True,
+        changed=changed_count,
+        deleted=deleted_count,
+        request_bytes=len(body),
+        body_bytes=len(data),
+        seconds=seconds,
+    )
+
+
+def _load_deploy_manifest(
+    manifest_path: Path, datasets_admin_api_url: str
+) -> DeployManifest | None:
+    """Load the manifest of the last deploy to ``datasets_admin_api_url``, if
+    there is one."""
+    try:
+        with open(manifest_path, "r", encoding="utf-8") as f:
+            saved = json.load(f)
+    except (OSError, ValueError):
+        return None
 
-    resp = requests.put(
-        f"{datasets_admin_api_url}/build",
-        json={"commitSha": commit_sha, "build": build},
-        auth=auth,
+    if saved.get("url") != datasets_admin_api_url:
+        return None
+
+    return saved.get("manifest")
+
+
+def _save_deploy_manifest(
+    manifest_path: Path, datasets_admin_api_url: str, manifest: DeployManifest
+) -> None:
+    manifest_path.parent.mkdir(parents=True, exist_ok=True)
+    with open(manifest_path, "w", encoding="utf-8") as f:
+        json.dump({"url": datasets_admin_api_url, "manifest": manifest}, f)
+
+
+def _gzip_build_envelope(build_path: Path, commit_sha: str) -> tuple[bytes, int]:
+    """Return the gzipped body of a full deploy, and its uncompressed size. The
+    build is copied from ``build_path`` in blocks, so only the compressed body
+    is held in memory. It is not streamed to the request, since SigV4 signs
+    the hash of the whole body."""
+    buffer = io.BytesIO()
+    with gzip.GzipFile(fileobj=buffer, mode="wb", compresslevel=6, mtime=0) as f:
+        f.write(b'{"commitSha":' + _encode_json(commit_sha) + b',"build":')
+        if build_path.is_dir():
+            _copy_sharded_build(build_path, f)
+        else:
+            with _open_binary(build_path) as build:
+                shutil.copyfileobj(build, f)
+        f.write(b"}")
+
+        body_bytes = f.tell()
+
+    return buffer.getvalue(), body_bytes
+
+
+def _copy_sharded_build(build_dir: Path, f: typing.BinaryIO) -> None:
+    """Write the build in ``build_dir`` to ``f`` as a single JSON object, copying
+    each document from its file."""
+    index = _load_json(build_dir / "index.json")
+
+    f.write(b"{")
+    for i, (section, entries) in enumerate(index.items()):
+        f.write((b"," if i else b"") + _encode_json(section) + b":")
+        if section not in DOCUMENT_SECTIONS:
+            f.write(_encode_json(entries))
+            continue
+
+        f.write(b"{")
+        for j, (key, entry) in enumerate(entries.items()):
+            f.write((b"," if j else b"") + _encode_json(key) + b":")
+            with open(build_dir / entry["path"], "rb") as document:
+                shutil.copyfileobj(document, f)
+        f.write(b"}")
+    f.write(b"}")
+
+
+def _read_documents(
+    build_path: Path, keys: dict[str, list[str]]
+) -> dict[str, dict[str, bytes]]:
+    """Return the JSON encoding of the documents with ``keys`` in each section
+    of the build. The documents of a sharded build are read from their files.
+    Otherwise, the build is only loaded if there are any."""
+    if build_path.is_dir():
+        index = _load_json(build_path / "index.json")
+
+        return {
+            section: {
+                key: (build_path / index[section][key]["path"]).read_bytes()
+                for key in section_keys
+            }
+            for section, section_keys in keys.items()
+        }
+
+    if not any(keys.values()):
+        return {section: {} for section in keys}
+
+    build = _load_json(build_path)
+
+    return {
+        section: {key: _encode_json(build[section][key]) for key in section_keys}
+        for section, section_keys in keys.items()
+    }
+
+
+def _keyed_entries(entries: dict[str, Any] | list[Any]) -> dict[str, Any]:
+    if isinstance(entries, dict):
+        return entries
+
+    return {str(value): value for value in entries}
+
+
+def _send(
+    session: requests.Session, method: str, url: str, body: bytes
+) -> tuple[requests.Response, float]:
+    """Send a gzipped JSON ``body``, retrying connection errors, timeouts and
+    500, 502, 503 and 504 responses. Returns the response, and the duration of
+    the request."""
+    start = time.perf_counter()
+    resp = call_with_retries(_request, _RETRY_ON, session, method, url, body)
+
+    return resp, time.perf_counter() - start
+
+
+def _request(
+    session: requests.Session, method: str, url: str, body: bytes
+) -> requests.Response:
+    resp = session.request(
+        method,
+        url,
+        data=body,
+        headers={"Content-Type": "application/json", "Content-Encoding": "gzip"},
+        timeout=REQUEST_TIMEOUT,
     )
+    if resp.status_code in _RETRY_STATUS_CODES:
+        resp.raise_for_status()
+
+    return resp
+
+
+def _check_response(resp: requests.Response) -> None:
     if resp.status_code != 200:
         raise ValueError(resp.content)
-    resp.raise_for_status()
+
+
+def _manifest_sha256(manifest: DeployManifest) -> str:
+    """SHA-256 of the canonical JSON encoding of ``manifest``."""
+    data = json.dumps(manifest, sort_keys=True, separators=(",", ":"))
+
+    return hashlib.sha256(data.encode("utf-8")).hexdigest()
+
+
+def _load_json(path: Path) -> Any:
+    with _open_binary(path) as f:
+        return json.load(f)
+
+
+def _open_binary(path: Path) -> typing.BinaryIO:
+    """Open ``path`` for reading, decompressing it if its name ends with '.gz'."""
+    if path.suffix == ".gz":
+        return typing.cast(typing.BinaryIO, gzip.open(path, "rb"))
+
+    return open(path, "rb")
+
+
+def _encode_json(value: Any) -> bytes:
+    return json.dumps(value, separators=(",", ":")).encode("utf-8")
+
+
+def _encode_object(members: dict[str, bytes]) -> bytes:
+    """Encode a JSON object from the JSON encoding of each member."""
+    return (
+        b"{"
+        + b",".join(_encode_json(key) + b":" + value for key, value in members.items())
+        + b"}"
+    )
@@ -1,7 +1,8 @@
-from .asset import Asset
+from .asset import Asset, iter_assets
 from .doctree import DocPath, Doctree, get_doctree_context
 from .document import Document
-from .reference import Ref, Reference
+from .reference import LazyRef, Ref, Reference
+from .scan import scan_dependencies
 
 __all__ = [
     "Asset",
@@ -9,6 +10,9 @@ __all__ = [
     "Doctree",
     "DocPath",
     "Document",
+    "LazyRef",
     "Ref",
     "get_doctree_context",
+    "iter_assets",
+    "scan_dependencies",
 ]
@@ -1,7 +1,8 @@
+from collections.abc import Iterator
 from pathlib import Path
 from typing import Annotated, Any
 
-from pydantic import Field, HttpUrl, RootModel
+from pydantic import BaseModel, Field, HttpUrl, RootModel
 
 from .doctree import DocPath, DoctreeObj, set_document_context
 
@@ -28,3 +29,19 @@ class Asset(RootModel, DoctreeObj):
 
     def __hash__(self) -> int:
         return hash(self.root)
+
+
+def iter_assets(obj: Any) -> Iterator[Asset]:
+    """Yield all assets contained in ``obj``, including in nested models
+    and collections."""
+    if isinstance(obj, Asset):
+        yield obj
+    elif isinstance(obj, BaseModel):
+        for field_name in type(obj).model_fields:
+            yield from iter_assets(getattr(obj, field_name))
+    elif isinstance(obj, dict):
+        for value in obj.values():
+            yield from iter_assets(value)
+    elif isinstance(obj, (list, tuple, set)):
+        for value in obj:
+            yield from iter_assets(value)
@@ -1,9 +1,24 @@
-from collections import defaultdict
-from collections.abc import Sequence
+import itertools
+import os
+import typing
+import weakref
+from collections import OrderedDict, defaultdict
+from collections.abc import Iterable, Sequence
 from dataclasses import dataclass
 from functools import cached_property
 from pathlib import Path, PurePosixPath
-from typing import Any, Hashable, NewType, Self, TypedDict, TypeGuard, TypeVar
+from typing import (
+    Any,
+    Hashable,
+    Literal,
+    NewType,
+    Self,
+    TypedDict,
+    TypeGuard,
+    TypeVar,
+)
+
+from dsets.lib import profiling
 
 from .object import DoctreeObj
 
@@ -13,38 +28,178 @@ DocPath = PurePosixPath
 DocPathRelative = NewType("DocPathRelative", DocPath)
 DocPathAbsolute = NewType("DocPathAbsolute", DocPath)
 
+"""How document refs are resolved when a document is loaded. If True, refs are
+resolved immediately. If 'lazy', each ref is resolved the first time it is used.
+If False, refs are left unresolved."""
+ResolveRefs = bool | Literal["lazy"]
+
 
 def docpath_is_absolute(path: DocPath) -> TypeGuard[DocPathAbsolute]:
     return path.is_absolute()
 
 
 class Doctree:
+    """A tree of documents under ``docpath_root``, which tracks the references
+    between them.
+
+    Resolved documents are kept in an object cache, so that documents referenced
+    more than once are only loaded once. The cache holds at most
+    ``max_cached_objects``, evicting the least recently used, and entries for
+    changed files can be removed with ``invalidate()``.
+
+    Objects of ``tracked_types`` that are validated in the tree are registered,
+    without keeping them alive, and can be listed with ``get_objects()``. Other
+    objects are not registered, since models like ``Dataset`` are validated
+    thousands of times per build.
+
+    Attributes:
+        docpath_root: Path to the root of the tree
+        max_cached_objects: Maximum number of objects in the object cache,
+            or None for no limit
+        tracked_types: Types of objects that are registered
+    """
+
     docpath_root: Path
 
-    def __init__(self, docpath_root: Path | str) -> None:
+    def __init__(
+        self,
+        docpath_root: Path | str,
+        max_cached_objects: int | None = 4096,
+        tracked_types: Iterable[type[DoctreeObj]] = (),
+    ) -> None:
         self.docpath_root = Path(docpath_root).absolute().resolve()
-
-        self._object_cache: dict[tuple[Path, type | Hashable], Any] = {}
-        self._objects: dict[type[DoctreeObj], list[DoctreeObj]] = defaultdict(list)
+        self.max_cached_objects = max_cached_objects
+        self.tracked_types = frozenset(tracked_types)
+
+        self._object_cache: OrderedDict[
+            tuple[Path, type | Hashable, ResolveRefs], Any
+        ] = OrderedDict()
+        self._objects: dict[
+            type[DoctreeObj], weakref.WeakValueDictionary[int, DoctreeObj]
+        ] = defaultdict(weakref.WeakValueDictionary)
+        self._object_ids = itertools.count()
+        self._dependencies: dict[Path, set[Path]] = defaultdict(set)
+        self._dependents: dict[Path, set[Path]] = defaultdict(set)
 
     def get_os_path(self, docpath: DocPathAbsolute) -> Path:
         return self.docpath_root / docpath.relative_to("/")
 
     def get_objects(self, type_: type[DoctreeObjT]) -> Sequence[DoctreeObjT]:
-        return self._objects.get(type_, [])
+        """Return the live objects of ``type_`` validated in this tree, in the
+        order they were validated.
+
+        Raises:
+            ValueError: If ``type_`` is not one of ``tracked_types``
+        """
+        if type_ not in self.tracked_types:
+            raise ValueError(f"Objects of type '{type_.__name__}' are not tracked")
+
+        if not (objects := self._objects.get(type_)):
+            return []
+
+        return typing.cast(list[DoctreeObjT], list(objects.values()))
+
+    def register_object(self, obj: DoctreeObj) -> None:
+        """Register ``obj`` as part of this tree, if its type is one of
+        ``tracked_types``. Objects are weakly referenced, so they can be garbage
+        collected once they are no longer used."""
+        if type(obj) in self.tracked_types:
+            self._objects[type(obj)][next(self._object_ids)] = obj
+
+    def add_dependency(self, os_path: Path, dependency: Path) -> None:
+        """Record that the document at ``os_path`` references the document
+        or asset at ``dependency``."""
+        os_path, dependency = _normalize_path(os_path), _normalize_path(dependency)
+
+        self._dependencies[os_path].add(dependency)
+        self._dependents[dependency].add(os_path)
+
+    def get_dependencies(self, os_path: Path) -> set[Path]:
+        """Return the paths of all files that the document at ``os_path``
+        references, directly or through other documents."""
+        return _graph_closure(self._dependencies, [_normalize_path(os_path)])
+
+    def get_dependents(self, os_path: Path) -> set[Path]:
+        """Return the paths of all documents that reference the file at
+        ``os_path``, directly or through other documents."""
+        return _graph_closure(self._dependents, [_normalize_path(os_path)])
+
+    def get_affected(self, os_paths: Iterable[Path]) -> set[Path]:
+        """Return the paths of all documents that are affected by changes to
+        the files at ``os_paths``, including the files themselves."""
+        os_paths = {_normalize_path(os_path) for os_path in os_paths}
+
+        return os_paths | _graph_closure(self._dependents, os_paths)
 
     def object_cache_get(
-        self, os_path: Path, resolve_type: type | Hashable
+        self,
+        os_path: Path,
+        resolve_type: type | Hashable,
+        resolve_refs: ResolveRefs = True,
     ) -> Any | None:
-        return self._object_cache.get((os_path, resolve_type))
+        """Return the cached object for the document at ``os_path``, resolved
+        as ``resolve_type`` with ``resolve_refs``, and mark it as recently used.
+        Objects loaded with lazy refs are never returned for eager loads."""
+        key = (_normalize_path(os_path), resolve_type, resolve_refs)
+        if (data := self._object_cache.get(key)) is not None:
+            self._object_cache.move_to_end(key)
+            profiling.count("object_cache_hits")
+        else:
+            profiling.count("object_cache_misses")
+
+        return data
 
     def object_cache_update(
-        self, os_path: Path, resolve_type: type | Hashable, data: Any
+        self,
+        os_path: Path,
+        resolve_type: type | Hashable,
+        data: Any,
+        resolve_refs: ResolveRefs = True,
     ):
-        if (os_path, resolve_type) in self._object_cache:
-            raise RuntimeError(f"Duplicate cache key: {repr((os_path, resolve_type))}")
+        """Cache ``data``, the document at ``os_path`` resolved as
+        ``resolve_type`` with ``resolve_refs``, replacing any existing entry. If
+        the cache is full, the least recently used object is evicted."""
+        key = (_normalize_path(os_path), resolve_type, resolve_refs)
+        self._object_cache[key] = data
+        self._object_cache.move_to_end(key)
+
+        if self.max_cached_objects is not None:
+            while len(self._object_cache) > self.max_cached_objects:
+                self._object_cache.popitem(last=False)
+
+    def invalidate(self, os_paths: Iterable[Path]) -> set[Path]:
+        """Remove cached objects for the files at ``os_paths``, and for all
+        documents that reference them, since those contain the resolved files.
+
+        Returns:
+            The paths of all documents that were affected
+        """
+        affected = self.get_affected(os_paths)
+        for key in [key for key in self._object_cache if key[0] in affected]:
+            del self._object_cache[key]
+
+        return affected
+
+
+def _normalize_path(os_path: Path) -> Path:
+    return Path(os.path.normpath(Path(os_path).absolute()))
+
+
+def _graph_closure(graph: dict[Path, set[Path]], start: Iterable[Path]) -> set[Path]:
+    """Return all nodes reachable from the nodes in ``start``, not including
+    the start nodes unless they are part of a cycle."""
+    visited: set[Path] = set()
+    stack = [node for start_node in start for node in graph.get(start_node, ())]
+
+    while stack:
+        node = stack.pop()
+        if node in visited:
+            continue
+
+        visited.add(node)
+        stack.extend(graph.get(node, ()))
 
-        self._object_cache[(os_path, resolve_type)] = data
+    return visited
 
 
 @dataclass
@@ -108,11 +263,11 @@ class DoctreeValidationContext(TypedDict):
     """Pydantic context for document tree validation."""
 
     document_context: DoctreeContext
-    resolve_refs: bool
+    resolve_refs: ResolveRefs
 
 
 def make_doctree_context(
-    document_context: DoctreeContext, resolve_refs: bool
+    document_context: DoctreeContext, resolve_refs: ResolveRefs
 ) -> dict[str, Any]:
     """Create a Pydantic context for reference validation and resolution."""
     return {
@@ -140,7 +295,7 @@ def set_document_context(
 ) -> DoctreeContext | None:
     if ctx := get_doctree_context(pydantic_context):
         obj._document_context = ctx["document_context"]
-        ctx["document_context"].doctree._objects[type(obj)].append(obj)
+        ctx["document_context"].doctree.register_object(obj)
 
         return ctx["document_context"]
 
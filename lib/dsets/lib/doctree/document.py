@@ -3,17 +3,19 @@ from collections.abc import Mapping
 from pathlib import Path
 from typing import Self
 
-import jsonref
 from pydantic import BaseModel
 
+from dsets.lib import profiling
+
 from .doctree import (
     Doctree,
     DoctreeContext,
     DoctreeObj,
+    ResolveRefs,
     make_doctree_context,
     set_document_context,
 )
-from .reference import Reference
+from .reference import Reference, read_document
 
 
 class Document(BaseModel, DoctreeObj):
@@ -104,21 +106,23 @@ class Document(BaseModel, DoctreeObj):
         cls: type[Self],
         doctree: Doctree,
         path: Path | str,
-        resolve_refs: bool = False,
+        resolve_refs: ResolveRefs = False,
     ) -> Self:
         """Validate a document from a document tree.
 
         Args:
             doctree: Document tree context
             path: Real path to the document
-            resolve_refs: Whether document refs should be resolved.
+            resolve_refs: Whether document refs should be resolved. If 'lazy',
+                ref fields are set to a ``LazyRef``, which loads the referenced
+                document the first time it is used.
 
         Returns: Model instance
         """
         document_ctx = DoctreeContext.from_os_path(doctree, path)
 
-        with open(path, "r", encoding="utf-8") as f:
-            data = jsonref.load(f, proxies=False)
+        data = read_document(path)
+        with profiling.span("validate"):
             ret = typing.cast(
                 Self,
                 cls.model_validate(
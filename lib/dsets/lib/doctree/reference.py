@@ -1,4 +1,7 @@
+import json
+import os
 import warnings
+from pathlib import Path
 from typing import Annotated, Any, Generic, TypeVar, Union
 
 import jsonref
@@ -7,19 +10,24 @@ from pydantic import (
     ConfigDict,
     Discriminator,
     Field,
+    SerializerFunctionWrapHandler,
     Tag,
-    TypeAdapter,
     ValidationInfo,
     ValidatorFunctionWrapHandler,
+    WrapSerializer,
     WrapValidator,
 )
 from typing_extensions import TypeAliasType
 
+from dsets.lib import profiling
+from dsets.lib.pydantic_util import get_type_adapter
+
 from .doctree import (
     DocPathAbsolute,
     DocPathRelative,
     DoctreeContext,
     DoctreeObj,
+    ResolveRefs,
     get_doctree_context,
     make_doctree_context,
     set_document_context,
@@ -73,21 +81,122 @@ class Reference(BaseModel, DoctreeObj, Generic[ResolveType]):
         return super().model_post_init(__context)
 
 
+class LazyRef(Generic[ResolveType]):
+    """Proxy for a document reference that is resolved the first time it
+    is used, e.g when one of its attributes is accessed. The resolved document
+    is loaded through the document tree's object cache, so it is shared with
+    other refs to the same document.
+
+    Used for `Ref` fields of documents loaded with ``resolve_refs='lazy'``.
+    """
+
+    __slots__ = ("_reference", "_field_name", "_resolved")
+
+    def __init__(
+        self, reference: Reference[ResolveType], field_name: str | None = None
+    ):
+        self._reference = reference
+        self._field_name = field_name
+        self._resolved: Any = _UNRESOLVED
+
+    @property
+    def reference(self) -> Reference[ResolveType]:
+        """The unresolved reference."""
+        return self._reference
+
+    @property
+    def is_resolved(self) -> bool:
+        """Whether the reference has been resolved."""
+        return self._resolved is not _UNRESOLVED
+
+    def resolve(self) -> ResolveType:
+        """Resolve the reference, if it has not been resolved already. Refs in
+        the referenced document are also resolved lazily.
+
+        Returns:
+            ResolveType: Resolved reference
+        """
+        if self._resolved is _UNRESOLVED:
+            self._resolved = _resolve_reference(
+                self._reference, field_name=self._field_name, resolve_refs="lazy"
+            )
+
+        return self._resolved
+
+    def __getattr__(self, name: str) -> Any:
+        # Avoid resolving for protocols like copy and pickle
+        if name.startswith("__"):
+            raise AttributeError(name)
+
+        return getattr(self.resolve(), name)
+
+    def __repr__(self) -> str:
+        if self.is_resolved:
+            return repr(self._resolved)
+
+        return f"LazyRef(path={repr(str(self._reference.path))})"
+
+    def __str__(self) -> str:
+        return str(self.resolve())
+
+    def __eq__(self, other: object) -> bool:
+        if isinstance(other, LazyRef):
+            other = other.resolve()
+
+        return self.resolve() == other
+
+    def __hash__(self) -> int:
+        return hash(self.resolve())
+
+    def __bool__(self) -> bool:
+        return bool(self.resolve())
+
+    def __len__(self) -> int:
+        return len(self.resolve())
+
+    def __iter__(self):
+        return iter(self.resolve())
+
+    def __contains__(self, item: Any) -> bool:
+        return item in self.resolve()
+
+    def __getitem__(self, key: Any) -> Any:
+        return self.resolve()[key]
+
+
+_UNRESOLVED = object()
+
+
 def _reference_validator(
     val: Any, handler: ValidatorFunctionWrapHandler, info: ValidationInfo
 ):
+    if isinstance(val, LazyRef):
+        return val
+
     ref: Reference = handler(val)
 
     ctx = get_doctree_context(info.context)
     if ctx is None:
         return ref
 
+    if ctx["resolve_refs"] == "lazy":
+        return LazyRef(ref, field_name=info.field_name)
+
     if ctx["resolve_refs"]:
         return _resolve_reference(ref, field_name=info.field_name)
 
     return ref
 
 
+def _lazy_ref_serializer(val: Any, handler: SerializerFunctionWrapHandler) -> Any:
+    """Serialize lazy refs as their resolved value, so that they are dumped the
+    same as refs that were resolved when the document was loaded."""
+    if isinstance(val, LazyRef):
+        return handler(val.resolve())
+
+    return handler(val)
+
+
 def _reference_discriminator(v: Any) -> str:
     """Pydantic discriminator for determining whether a reference field
     is a reference or a value.
@@ -95,7 +204,7 @@ def _reference_discriminator(v: Any) -> str:
     See:
     https://docs.pydantic.dev/latest/concepts/unions/#discriminated-unions-with-callable-discriminator
     """
-    if isinstance(v, Reference):
+    if isinstance(v, (Reference, LazyRef)):
         return "ref"
 
     try:
@@ -122,6 +231,7 @@ Ref = TypeAliasType(
             Annotated[ResolveType, Tag("value")],
         ],
         Discriminator(_reference_discriminator),
+        WrapSerializer(_lazy_ref_serializer),
     ],
     type_params=(ResolveType,),
 )
@@ -130,12 +240,14 @@ Ref = TypeAliasType(
 def _resolve_reference(
     ref: Reference[ResolveType],
     field_name: str | None = None,
+    resolve_refs: ResolveRefs = True,
 ) -> Any:
     """Resolve a document reference.
 
     Args:
         ref: The document reference
         field_name: Name of the field the document reference is assigned to.
+        resolve_refs: How refs in the referenced document are resolved
     """
     try:
         resolve_type = ref.resolve_type()
@@ -152,23 +264,40 @@ def _resolve_reference(
 
     docpath = referencing_ctx.resolve_reference_path(ref.path)
     os_path = doctree.get_os_path(docpath)
+    doctree.add_dependency(referencing_ctx.os_path, os_path)
 
-    if existing := doctree.object_cache_get(os_path, resolve_type):
+    if existing := doctree.object_cache_get(os_path, resolve_type, resolve_refs):
         return existing
 
-    with open(os_path, "r", encoding="utf-8") as f:
-        if os_path.suffix == ".json":
-            data = jsonref.load(f, proxies=False)
-        else:
-            data = f.read()
+    with profiling.scope("resolve_reference", str(docpath)):
+        data = read_document(os_path, text=os_path.suffix != ".json")
 
-    resolved = TypeAdapter(resolve_type).validate_python(
-        data,
-        context=make_doctree_context(
-            DoctreeContext.from_os_path(doctree, os_path), resolve_refs=True
-        ),
-    )
+        with profiling.span("validate"):
+            resolved = get_type_adapter(resolve_type).validate_python(
+                data,
+                context=make_doctree_context(
+                    DoctreeContext.from_os_path(doctree, os_path),
+                    resolve_refs=resolve_refs,
+                ),
+            )
 
-    doctree.object_cache_update(os_path, resolve_type, resolved)
+    doctree.object_cache_update(os_path, resolve_type, resolved, resolve_refs)
 
     return resolved
+
+
+def read_document(os_path: Path | str, text: bool = False) -> Any:
+    """Read the document at ``os_path`` as JSON, with JSON references replaced
+    by their referent data, or as a string if ``text`` is set."""
+    with open(os_path, "r", encoding="utf-8") as f:
+        profiling.count("files_read")
+        profiling.count("bytes_read", os.fstat(f.fileno()).st_size)
+        if text:
+            with profiling.span("read_text"):
+                return f.read()
+
+        with profiling.span("json_load"):
+            data = json.load(f)
+
+    with profiling.span("jsonref"):
+        return jsonref.replace_refs(data, proxies=False)
@@ -0,0 +1,73 @@
+import json
+from collections.abc import Collection, Iterable, Iterator
+from pathlib import Path
+from typing import Any
+
+from .doctree import DocPath, Doctree, DoctreeContext, _normalize_path
+
+
+def scan_dependencies(
+    doctree: Doctree, os_paths: Iterable[Path], asset_paths: Collection[Path] = ()
+) -> None:
+    """Record the dependencies of the documents at ``os_paths`` in the dependency
+    graph of ``doctree``, without validating them. This is much faster than loading
+    the documents, but only finds dependencies that can be identified from the raw
+    JSON.
+
+    '$path' references are followed recursively into referenced JSON documents.
+    Assets are plain strings, so a string is only recorded as an asset dependency
+    if it resolves to one of ``asset_paths``.
+
+    Args:
+        doctree: Document tree
+        os_paths: Paths to JSON documents in the tree
+        asset_paths: Paths of assets to look for
+    """
+    asset_paths = {_normalize_path(asset_path) for asset_path in asset_paths}
+    asset_names = {asset_path.name for asset_path in asset_paths}
+    scanned: set[Path] = set()
+    pending = [_normalize_path(os_path) for os_path in os_paths]
+
+    while pending:
+        document_path = pending.pop()
+        if document_path in scanned:
+            continue
+
+        scanned.add(document_path)
+        try:
+            with open(document_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            continue
+
+        context = DoctreeContext.from_os_path(doctree, document_path)
+        for docpath, is_ref in _iter_docpaths(data, asset_names):
+            dependency = _normalize_path(
+                doctree.get_os_path(context.resolve_reference_path(docpath))
+            )
+            if not is_ref and dependency not in asset_paths:
+                continue
+
+            doctree.add_dependency(context.os_path, dependency)
+            if is_ref and dependency.suffix == ".json":
+                pending.append(dependency)
+
+
+def _iter_docpaths(
+    data: Any, asset_names: Collection[str]
+) -> Iterator[tuple[DocPath, bool]]:
+    """Yield the docpath of every '$path' reference in ``data``, and of every
+    string whose file name is in ``asset_names``. The second element of each
+    tuple is ``True`` if the docpath is a reference."""
+    if isinstance(data, dict):
+        if data.keys() == {"$path"}:
+            yield DocPath(data["$path"]), True
+            return
+
+        for value in data.values():
+            yield from _iter_docpaths(value, asset_names)
+    elif isinstance(data, list):
+        for value in data:
+            yield from _iter_docpaths(value, asset_names)
+    elif isinstance(data, str) and data.rsplit("/", 1)[-1] in asset_names:
+        yield DocPath(data), False
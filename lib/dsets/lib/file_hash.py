@@ -1,6 +1,80 @@
 import hashlib
-from collections.abc import Callable
+import os
+import time
+from collections.abc import Callable, Iterable
 from pathlib import Path
+from typing import ClassVar
+
+from dsets.lib import profiling
+from dsets.lib.sqlite_cache import SQLiteCache
+
+
+def file_digests(
+    path: Path,
+    algorithms: Iterable[str],
+    *,
+    chunk_size: int = 4194304,
+    progress_cb: Callable[[int], None] | None = None,
+    cache: "DigestCache | None" = None,
+) -> dict[str, bytes]:
+    """Compute several digests of the file at `path` in a single pass. The
+    file is read into one reusable buffer, which is passed to every hash
+    without copying.
+
+    >>> file_digests(path, ["sha1", "sha256"])
+    {'sha1': b'...', 'sha256': b'...'}
+
+    Args:
+        path: Path to file
+        algorithms: Names of hash algorithms supported by ``hashlib.new()``
+        chunk_size: Number of bytes to read at a time. Defaults to 4MB
+        progress_cb: Callable that accepts the number of bytes
+            read in each iteration
+        cache: Cache of digests. If every digest is cached, the file is not read
+            and ``progress_cb`` is called once with the size of the file
+
+    Returns:
+        dict: Digest of the file for each algorithm
+    """
+    algorithms = list(algorithms)
+    digests: dict[str, bytes] = {}
+
+    with open(path, mode="rb", buffering=0) as f:
+        stat = os.fstat(f.fileno())
+        if cache:
+            for algorithm in algorithms:
+                if (digest := cache.get(stat, algorithm)) is not None:
+                    digests[algorithm] = digest
+
+            if len(digests) == len(algorithms):
+                profiling.count("digest_cache_hits")
+                if progress_cb:
+                    progress_cb(stat.st_size)
+
+                return digests
+
+        hashes = {
+            algorithm: hashlib.new(algorithm)
+            for algorithm in algorithms
+            if algorithm not in digests
+        }
+        profiling.count("files_hashed")
+        profiling.count("bytes_hashed", stat.st_size)
+        buffer = memoryview(bytearray(chunk_size))
+        while size := f.readinto(buffer):
+            chunk = buffer[:size]
+            for hash_ in hashes.values():
+                hash_.update(chunk)
+
+            if progress_cb:
+                progress_cb(size)
+
+    computed = {algorithm: hash_.digest() for algorithm, hash_ in hashes.items()}
+    # Only cache the digests if the file was not modified while it was read
+    if cache and _file_version(os.stat(path)) == _file_version(stat):
+        cache.put(stat, computed)
+
+    return digests | computed
 
 
 def file_sha1_hash(
@@ -8,6 +82,7 @@ def file_sha1_hash(
     *,
     chunk_size: int = 4194304,
     progress_cb: Callable[[int], None] | None = None,
+    cache: "DigestCache | None" = None,
 ) -> bytes:
     """Compute SHA1 hash of file at `path`.
 
@@ -16,15 +91,80 @@ def file_sha1_hash(
         chunk_size: Number of bytes to read at a time. Defaults to 4MB
         progress_cb: Callable that accepts the number of bytes
             read in each iteration
+        cache: Cache of digests
 
     Returns:
         bytes: SHA1 hash of file
     """
-    with open(path, mode="rb") as f:
-        digest = hashlib.sha1()
-        while chunk := f.read(chunk_size):
-            digest.update(chunk)
-            if progress_cb:
-                progress_cb(len(chunk))
+    digests = file_digests(
+        path, ["sha1"], chunk_size=chunk_size, progress_cb=progress_cb, cache=cache
+    )
+
+    return digests["sha1"]
+
+
+class DigestCache(SQLiteCache):
+    """Persistent cache of file digests, stored in an SQLite database.
+
+    Digests are keyed by the device and inode of the file, and are only
+    returned if the file's size and modification time are unchanged. Files
+    modified less than ``racy_seconds`` ago are not cached, since a second
+    write within the resolution of the modification time would go unnoticed.
+
+    The cache can be shared by several threads and processes.
+
+    Attributes:
+        path: Path to the database file
+        racy_seconds: Minimum age of a file's modification time for its
+            digests to be cached
+    """
+
+    racy_seconds: ClassVar[float] = 2.0
+    schema: ClassVar[str] = (
+        "CREATE TABLE IF NOT EXISTS digests (device INTEGER, inode INTEGER,"
+        " algorithm TEXT, size INTEGER, mtime_ns INTEGER, digest BLOB,"
+        " PRIMARY KEY (device, inode, algorithm))"
+    )
+
+    def get(self, stat: os.stat_result, algorithm: str) -> bytes | None:
+        """Return the cached ``algorithm`` digest of the file with ``stat``, if
+        it has one."""
+        with self._transaction() as connection:
+            row = connection.execute(
+                "SELECT digest FROM digests WHERE device = ? AND inode = ?"
+                " AND algorithm = ? AND size = ? AND mtime_ns = ?",
+                (*_stat_key(stat), algorithm, stat.st_size, stat.st_mtime_ns),
+            ).fetchone()
+
+        return row[0] if row else None
+
+    def put(self, stat: os.stat_result, digests: dict[str, bytes]) -> None:
+        """Cache ``digests`` of the file with ``stat``, keyed by algorithm."""
+        if time.time_ns() - stat.st_mtime_ns < self.racy_seconds * 1e9:
+            return
+
+        with self._transaction() as connection:
+            connection.executemany(
+                "INSERT OR REPLACE INTO digests"
+                " (device, inode, algorithm, size, mtime_ns, digest)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                [
+                    (
+                        *_stat_key(stat),
+                        algorithm,
+                        stat.st_size,
+                        stat.st_mtime_ns,
+                        digest,
+                    )
+                    for algorithm, digest in digests.items()
+                ],
+            )
+
+
+def _file_version(stat: os.stat_result) -> tuple[int, int, int, int]:
+    return stat.st_dev, stat.st_ino, stat.st_size, stat.st_mtime_ns
+
 
-        return digest.digest()
+def _stat_key(stat: os.stat_result) -> tuple[int, int]:
+    # SQLite integers are signed 64-bit
+    return stat.st_dev & 0x7FFFFFFFFFFFFFFF, stat.st_ino & 0x7FFFFFFFFFFFFFFF
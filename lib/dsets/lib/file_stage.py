@@ -0,0 +1,70 @@
+import os
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+if sys.platform == "linux":
+    import fcntl
+
+    # ioctl request number of FICLONE, from <linux/fs.h>
+    _FICLONE = 0x40049409
+else:
+    fcntl = None
+
+
+def stage_file(src: Path, dest: Path, *, link: bool = False) -> None:
+    """Create ``dest`` with the same contents as ``src``, with as little I/O
+    as the filesystem allows.
+
+    If ``link`` is True, ``dest`` is created as a hard link to ``src``. Hard
+    links share their contents, so this should only be used if neither
+    file will be modified. Otherwise, or if the hard link fails (e.g the files
+    are on different devices), ``dest`` is a copy-on-write clone of ``src``
+    on filesystems that support it (e.g Btrfs, XFS), or a full copy.
+
+    Copies are written to a temporary file first, so that concurrent builds
+    never see a partially written file.
+
+    Args:
+        src: Path to the source file
+        dest: Path to the new file. If it already exists, it is replaced,
+            unless ``dest`` is hard linked
+    """
+    if link:
+        try:
+            os.link(src, dest)
+            return
+        except FileExistsError:
+            if os.path.samefile(src, dest):
+                return
+        except OSError:
+            pass
+
+    fd, tmp_path = tempfile.mkstemp(dir=dest.parent, prefix=f".{dest.name}.")
+    try:
+        with open(src, "rb") as src_f, os.fdopen(fd, "wb") as tmp_f:
+            cloned = _reflink(src_f, tmp_f)
+
+        if not cloned:
+            shutil.copyfile(src, tmp_path)
+
+        shutil.copymode(src, tmp_path)
+        os.replace(tmp_path, dest)
+    except BaseException:
+        Path(tmp_path).unlink(missing_ok=True)
+        raise
+
+
+def _reflink(src_f, dest_f) -> bool:
+    """Clone the contents of ``src_f`` into ``dest_f``. Returns False if cloning
+    is not supported."""
+    if fcntl is None:
+        return False
+
+    try:
+        fcntl.ioctl(dest_f.fileno(), _FICLONE, src_f.fileno())
+    except OSError:
+        return False
+
+    return True
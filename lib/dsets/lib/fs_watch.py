@@ -0,0 +1,284 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+import typing
+from collections.abc import Iterator
+from logging import getLogger
+from pathlib import Path
+
+logger = getLogger(__name__)
+
+
+def watch(
+    root: Path,
+    *,
+    debounce: float = 0.1,
+    poll: bool = False,
+    poll_interval: float = 0.5,
+) -> Iterator[set[Path]]:
+    """Watch the directory tree at ``root`` for changes, yielding the paths of
+    files that were created, modified, moved or deleted.
+
+    Changes are debounced: once a file changes, changes are collected until
+    none have been seen for ``debounce`` seconds, and are then yielded together.
+    This way, a burst of saves produces a single set of changes.
+
+    Uses inotify on Linux, and otherwise falls back to polling the tree.
+    Watching starts when this function is called, rather than when iteration
+    starts, so that no changes are missed.
+
+    Args:
+        root: Directory to watch
+        debounce: Number of seconds without changes before changes are yielded
+        poll: If True, always poll the tree
+        poll_interval: Number of seconds between polls
+
+    Yields:
+        Absolute paths of changed files
+    """
+    source: _InotifySource | _PollingSource
+    if poll or not _inotify_available():
+        source = _PollingSource(root, poll_interval)
+    else:
+        source = _InotifySource(root)
+
+    return _watch(source, debounce)
+
+
+def _watch(
+    source: "_InotifySource | _PollingSource", debounce: float
+) -> Iterator[set[Path]]:
+    with source:
+        while True:
+            changed = source.read(timeout=None)
+            while more := source.read(timeout=debounce):
+                changed |= more
+
+            if changed:
+                yield changed
+
+
+class _PollingSource:
+    """Finds changes by comparing the size and modification time of every file
+    under ``root`` between scans."""
+
+    def __init__(self, root: Path, interval: float):
+        self.root = Path(root).absolute()
+        self.interval = interval
+        self._snapshot = self._scan()
+
+    def read(self, timeout: float | None) -> set[Path]:
+        """Wait for changes, for at most ``timeout`` seconds, or indefinitely if
+        ``timeout`` is None."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            delay = self.interval
+            if deadline is not None:
+                delay = max(0.0, min(delay, deadline - time.monotonic()))
+
+            time.sleep(delay)
+            snapshot = self._scan()
+            changed = {
+                path
+                for path in snapshot.keys() | self._snapshot.keys()
+                if snapshot.get(path) != self._snapshot.get(path)
+            }
+            self._snapshot = snapshot
+
+            if changed or (deadline is not None and time.monotonic() >= deadline):
+                return changed
+
+    def _scan(self) -> dict[Path, tuple[int, int]]:
+        snapshot = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                path = Path(dirpath, filename)
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+
+                snapshot[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return snapshot
+
+    def __enter__(self) -> "_PollingSource":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        pass
+
+
+# Constants from <sys/inotify.h>
+_IN_MODIFY = 0x2
+_IN_ATTRIB = 0x4
+_IN_CLOSE_WRITE = 0x8
+_IN_MOVED_FROM = 0x40
+_IN_MOVED_TO = 0x80
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+_IN_Q_OVERFLOW = 0x4000
+_IN_IGNORED = 0x8000
+_IN_ISDIR = 0x40000000
+_IN_NONBLOCK = os.O_NONBLOCK
+_IN_CLOEXEC = os.O_CLOEXEC
+
+_WATCH_MASK = (
+    _IN_MODIFY
+    | _IN_ATTRIB
+    | _IN_CLOSE_WRITE
+    | _IN_MOVED_FROM
+    | _IN_MOVED_TO
+    | _IN_CREATE
+    | _IN_DELETE
+)
+_EVENT_HEADER = struct.Struct("iIII")
+
+
+def _load_libc() -> ctypes.CDLL | None:
+    if not sys.platform.startswith("linux"):
+        return None
+
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+    except OSError:
+        return None
+
+    if not all(
+        hasattr(libc, name)
+        for name in ("inotify_init1", "inotify_add_watch", "inotify_rm_watch")
+    ):
+        return None
+
+    libc.inotify_add_watch.argtypes = (ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32)
+    return libc
+
+
+_libc = _load_libc()
+
+
+def _inotify_available() -> bool:
+    return _libc is not None
+
+
+class _InotifySource:
+    """Finds changes with inotify. inotify does not watch subdirectories, so
+    every directory under ``root`` is watched, including new ones.
+
+    inotify only reports the directory itself when a directory is moved away or
+    deleted, so the files in the tree are tracked to report those under it."""
+
+    def __init__(self, root: Path):
+        self.root = Path(root).absolute()
+        self._libc = typing.cast(ctypes.CDLL, _libc)
+        self._fd = self._libc.inotify_init1(_IN_NONBLOCK | _IN_CLOEXEC)
+        if self._fd < 0:
+            errno = ctypes.get_errno()
+            raise OSError(errno, os.strerror(errno))
+
+        self._dirs: dict[int, Path] = {}
+        self._files: set[Path] = set()
+        self._add_tree(self.root)
+
+    def read(self, timeout: float | None) -> set[Path]:
+        """Wait for changes, for at most ``timeout`` seconds, or indefinitely if
+        ``timeout`` is None."""
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+
+        changed: set[Path] = set()
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except BlockingIOError:
+                break
+
+            changed |= self._parse_events(data)
+
+        return changed
+
+    def _parse_events(self, data: bytes) -> set[Path]:
+        changed: set[Path] = set()
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, name_len = _EVENT_HEADER.unpack_from(data, offset)
+            offset += _EVENT_HEADER.size
+            name = data[offset : offset + name_len].rstrip(b"\0")
+            offset += name_len
+
+            if mask & _IN_Q_OVERFLOW:
+                # Events were lost, so treat every file as changed
+                logger.warning("inotify queue overflowed, rescanning: %s", self.root)
+                changed |= {path for path in self.root.rglob("*") if path.is_file()}
+                continue
+
+            if mask & _IN_IGNORED:
+                self._dirs.pop(wd, None)
+                continue
+
+            if (directory := self._dirs.get(wd)) is None or not name:
+                continue
+
+            path = directory / os.fsdecode(name)
+            if mask & _IN_ISDIR and mask & (_IN_CREATE | _IN_MOVED_TO):
+                # Files may have been added before the directory was watched
+                changed |= self._add_tree(path)
+            elif mask & _IN_ISDIR and mask & (_IN_DELETE | _IN_MOVED_FROM):
+                changed |= self._remove_tree(path)
+            else:
+                if mask & (_IN_CREATE | _IN_MOVED_TO):
+                    self._files.add(path)
+                elif mask & (_IN_DELETE | _IN_MOVED_FROM):
+                    self._files.discard(path)
+
+                changed.add(path)
+
+        return changed
+
+    def _add_tree(self, root: Path) -> set[Path]:
+        """Watch ``root`` and every directory under it. Returns the paths of
+        the files in the tree."""
+        files = set()
+        for dirpath, _, filenames in os.walk(root):
+            wd = self._libc.inotify_add_watch(
+                self._fd, os.fsencode(dirpath), _WATCH_MASK
+            )
+            if wd < 0:
+                logger.warning("Could not watch directory: %s", dirpath)
+                continue
+
+            self._dirs[wd] = Path(dirpath)
+            files.update(Path(dirpath, filename) for filename in filenames)
+
+        self._files |= files
+
+        return files
+
+    def _remove_tree(self, root: Path) -> set[Path]:
+        """Stop watching ``root`` and every directory under it, after it was
+        moved away or deleted. Returns the paths of the files that were in
+        the tree."""
+        for wd, directory in list(self._dirs.items()):
+            if directory.is_relative_to(root):
+                # Fails if the directory was deleted, which removes its watch
+                self._libc.inotify_rm_watch(self._fd, wd)
+                del self._dirs[wd]
+
+        files = {path for path in self._files if path.is_relative_to(root)}
+        self._files -= files
+
+        return files
+
+    def close(self) -> None:
+        os.close(self._fd)
+
+    def __enter__(self) -> "_InotifySource":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
@@ -0,0 +1,48 @@
+import os
+from pathlib import Path
+
+from dulwich import porcelain
+from dulwich.diff_tree import tree_changes
+from dulwich.graph import find_merge_base
+from dulwich.index import get_unstaged_changes
+from dulwich.objectspec import parse_commit
+from dulwich.repo import Repo
+
+
+def changed_paths(repo: Repo, base_ref: str) -> set[Path]:
+    """Return the paths of all files that differ between ``base_ref`` and the
+    working tree of ``repo``.
+
+    Committed changes are relative to the merge base of ``base_ref`` and HEAD,
+    like ``git diff base_ref...``. Staged, unstaged and untracked (but not
+    ignored) files are also included.
+
+    Args:
+        repo: dulwich ``Repo``
+        base_ref: Branch, tag or commit SHA to compare against
+
+    Returns:
+        Absolute paths of added, modified and deleted files
+    """
+    root = Path(repo.path).absolute()
+    head = repo[repo.head()]
+    base = parse_commit(repo, base_ref)
+    if merge_base := find_merge_base(repo, [base.id, head.id]):
+        base = repo[merge_base[0]]
+
+    paths: set[bytes | str] = set()
+    for change in tree_changes(repo.object_store, base.tree, head.tree):
+        paths.update(
+            entry.path for entry in (change.old, change.new) if entry.path is not None
+        )
+
+    for staged_paths in porcelain.get_tree_changes(repo).values():
+        paths.update(staged_paths)
+
+    index = repo.open_index()
+    paths.update(get_unstaged_changes(index, repo.path))
+    paths.update(
+        porcelain.get_untracked_paths(repo.path, repo.path, index, exclude_ignored=True)
+    )
+
+    return {root / os.fsdecode(path) for path in paths}
@@ -1,10 +1,17 @@
-from collections.abc import Callable
+import io
+import os
+import threading
+from collections.abc import Callable, Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from typing import BinaryIO, TypedDict
 
 import gql
 import requests
+import requests.adapters
 
 from dsets.lib.graphql import queries
+from dsets.lib.retry import call_with_retries
+from dsets.lib.upload_journal import UploadJournal
 
 
 class APIError(RuntimeError):
@@ -71,6 +78,11 @@ def upload_file(
     size: int,
     checksum_sha256: bytes,
     callback: Callable[[int], None] | None = None,
+    *,
+    max_workers: int = 4,
+    attempts: int = 3,
+    session: requests.Session | None = None,
+    journal: UploadJournal | None = None,
 ) -> File:
     """Upload a file to the datasets service.
 
@@ -81,23 +93,58 @@ def upload_file(
         size: Total number of bytes to be read from ``stream``
         checksum_sha256: SHA256 sum of data in ``stream``
         callback: Progress callback, accepts a number of bytes uploaded
+        max_workers: Maximum number of parts uploaded concurrently
+        attempts: Maximum number of attempts for each part
+        session: Session used to upload parts. If not provided, a new session
+            is created with a connection pool of size ``max_workers``
+        journal: Journal used to record uploaded parts. If the journal has
+            an entry for the same file, and the service still has a pending
+            upload for ``name``, the upload is resumed and parts recorded in the
+            journal are not uploaded again
 
     Returns:
         File: information on uploaded file
 
     Raises:
         APIErrror: An API error occurs
+        requests.RequestException: A part could not be uploaded after
+            ``attempts`` attempts
     """
-    _create_file_upload(client, name, size, checksum_sha256)
-
-    while (upload := _get_file_upload(client, name)) is not None:
-        for part in upload["uploadParts"]:
-            start, end = int(part["bytesStart"]), int(part["bytesEnd"])
-            stream.seek(start)
-
-            requests.put(part["url"], data=stream.read(end - start)).raise_for_status()
-            if callback:
-                callback(end - start)
+    if journal and journal.resumable and _get_file_upload(client, name) is not None:
+        if callback:
+            callback(sum(end - start for start, end in journal.uploaded_parts))
+    else:
+        _create_file_upload(client, name, size, checksum_sha256)
+        if journal:
+            journal.start()
+
+    owns_session = session is None
+    session = session or _make_session(max_workers)
+    try:
+        while (upload := _get_file_upload(client, name)) is not None:
+            parts = upload["uploadParts"]
+            if journal:
+                uploaded = journal.uploaded_parts
+                # If every part is in the journal, the service did not receive
+                # some of them and they must be uploaded again
+                parts = [
+                    part for part in parts if _part_range(part) not in uploaded
+                ] or parts
+
+            for part in iter_upload_parts(
+                session, stream, parts, max_workers=max_workers, attempts=attempts
+            ):
+                start, end = _part_range(part)
+                if journal and (start, end) not in journal.uploaded_parts:
+                    journal.add_part(start, end)
+                if callback:
+                    callback(end - start)
+    finally:
+        if owns_session:
+            session.close()
+
+    if journal:
+        journal.remove()
 
     if not (file := get_file(client, name)):
         raise APIError(
@@ -111,6 +158,136 @@ def upload_file(
     return file
 
 
+def iter_upload_parts(
+    session: requests.Session,
+    stream: BinaryIO,
+    parts: Iterable[FileUploadPart],
+    *,
+    max_workers: int = 4,
+    attempts: int = 3,
+) -> Iterator[FileUploadPart]:
+    """Upload ``parts`` of ``stream`` concurrently, yielding each part once it
+    has been uploaded. Parts are yielded in the order they complete.
+
+    Each part is streamed from ``stream`` as it is sent, so at most a few
+    blocks of each part are held in memory. If ``stream`` is backed by a file,
+    parts are read with ``os.pread()`` and do not share a file position.
+
+    Args:
+        session: Session used to send requests
+        stream: Stream of file data to upload
+        parts: Parts to upload
+        max_workers: Maximum number of parts uploaded concurrently
+        attempts: Maximum number of attempts for each part
+
+    Raises:
+        requests.RequestException: A part could not be uploaded after
+            ``attempts`` attempts
+    """
+    read_at = _make_read_at(stream)
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = {
+            executor.submit(
+                call_with_retries,
+                _put_part,
+                _PART_RETRY_ON,
+                session,
+                read_at,
+                part,
+                attempts=attempts,
+            ): part
+            for part in parts
+        }
+
+        try:
+            for future in as_completed(futures):
+                future.result()
+                yield futures[future]
+        finally:
+            for future in futures:
+                future.cancel()
+
+
+def _part_range(part: FileUploadPart) -> tuple[int, int]:
+    return int(part["bytesStart"]), int(part["bytesEnd"])
+
+
+_PART_RETRY_ON = (requests.ConnectionError, requests.Timeout, requests.HTTPError)
+
+
+class _PartReader:
+    """Streams the bytes from ``start`` to ``end`` of a file as a request body.
+    ``requests`` sends the length as the 'Content-Length' header, and
+    reads the body in blocks."""
+
+    def __init__(self, read_at: Callable[[int, int], bytes], start: int, end: int):
+        self._read_at = read_at
+        self._position = start
+        self._end = end
+
+    def __len__(self) -> int:
+        return self._end - self._position
+
+    def __iter__(self) -> Iterator[bytes]:
+        while chunk := self.read(io.DEFAULT_BUFFER_SIZE):
+            yield chunk
+
+    def read(self, size: int = -1) -> bytes:
+        if size < 0 or size > len(self):
+            size = len(self)
+
+        data = self._read_at(self._position, size)
+        self._position += len(data)
+
+        return data
+
+
+def _put_part(
+    session: requests.Session,
+    read_at: Callable[[int, int], bytes],
+    part: FileUploadPart,
+) -> None:
+    """Upload a single part to its presigned URL."""
+    start, end = _part_range(part)
+
+    session.put(part["url"], data=_PartReader(read_at, start, end)).raise_for_status()
+
+
+def _make_read_at(stream: BinaryIO) -> Callable[[int, int], bytes]:
+    """Return a function that reads a number of bytes at an offset of ``stream``,
+    and which is safe to call from multiple threads."""
+    try:
+        fd = stream.fileno()
+    except (AttributeError, OSError):
+        fd = None
+
+    if fd is not None and hasattr(os, "pread"):
+        return lambda offset, size: os.pread(fd, size, offset)
+
+    lock = threading.Lock()
+
+    def read_at(offset: int, size: int) -> bytes:
+        with lock:
+            stream.seek(offset)
+            return stream.read(size)
+
+    return read_at
+
+
+def _make_session(pool_size: int) -> requests.Session:
+    """Return a session whose connection pool can serve ``pool_size``
+    concurrent requests."""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(
+        pool_connections=pool_size, pool_maxsize=pool_size
+    )
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+
+    return session
+
+
 def get_file(client: gql.Client, name: str) -> File | None:
     """Return file information owned by the calling user."""
     resp = client.execute(queries.FILE_GET, {"name": name}, parse_result=True)
@@ -0,0 +1,100 @@
+import json
+import shutil
+from types import TracebackType
+from typing import Any, Self, TextIO
+
+
+class JSONObjectWriter:
+    """Writes a JSON object to a text stream one member at a time, so that the
+    whole object never needs to be held in memory. The output is identical to
+    ``json.dump()`` of the complete object with the same ``indent``.
+
+    If ``indent`` is None, the output is compact, with no whitespace.
+
+    Example:
+
+        with JSONObjectWriter(f, indent=2) as root:
+            root.write("a", 1)
+            with root.object("b") as b:
+                b.write("c", [1, 2])
+
+        # Writes {"a": 1, "b": {"c": [1, 2]}}
+
+    An object can also be written to another stream, e.g a temporary file, with
+    the ``level`` it will have in the output, and added later with ``copy()``.
+
+    Attributes:
+        f: Text stream to write to
+        indent: Indentation level, or None for compact output
+        level: Nesting level of the object in the output
+    """
+
+    def __init__(self, f: TextIO, indent: int | None = None, *, level: int = 0):
+        self.f = f
+        self.indent = indent
+        self.level = level
+        self._count = 0
+
+        if indent is None:
+            self._item_separator, self._key_separator = ",", ":"
+        else:
+            self._item_separator, self._key_separator = ",", ": "
+
+    def write(self, key: str, value: Any) -> None:
+        """Write member ``key`` with JSON-able ``value``."""
+        self._write_key(key)
+
+        encoded = json.dumps(
+            value,
+            indent=self.indent,
+            separators=(self._item_separator, self._key_separator),
+        )
+        if self.indent is not None:
+            encoded = encoded.replace("\n", self._newline(self.level + 1))
+
+        self.f.write(encoded)
+
+    def object(self, key: str) -> "JSONObjectWriter":
+        """Start member ``key`` as a nested object. Use the returned writer
+        as a context manager to write its members."""
+        self._write_key(key)
+
+        return JSONObjectWriter(self.f, self.indent, level=self.level + 1)
+
+    def copy(self, key: str, src: TextIO) -> None:
+        """Write member ``key`` with a value read from ``src``, which must
+        already be encoded with the same ``indent``, at ``level + 1``."""
+        self._write_key(key)
+        shutil.copyfileobj(src, self.f)
+
+    def __enter__(self) -> Self:
+        self.f.write("{")
+
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        tb: TracebackType | None,
+    ) -> None:
+        if exc_type is not None:
+            return
+
+        if self._count and self.indent is not None:
+            self.f.write(self._newline(self.level))
+
+        self.f.write("}")
+
+    def _write_key(self, key: str) -> None:
+        if self._count:
+            self.f.write(self._item_separator)
+
+        if self.indent is not None:
+            self.f.write(self._newline(self.level + 1))
+
+        self.f.write(json.dumps(key) + self._key_separator)
+        self._count += 1
+
+    def _newline(self, level: int) -> str:
+        return "\n" + " " * ((self.indent or 0) * level)
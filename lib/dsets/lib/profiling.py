@@ -0,0 +1,225 @@
+import json
+import os
+import threading
+import time
+from collections import Counter
+from collections.abc import Iterator
+from contextlib import AbstractContextManager, contextmanager, nullcontext
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+
+@dataclass
+class PhaseStats:
+    """Timings of a phase.
+
+    Attributes:
+        count: Number of times the phase ran
+        seconds: Total time spent in the phase, including nested phases
+        self_seconds: Time spent in the phase, excluding nested phases
+    """
+
+    count: int = 0
+    seconds: float = 0.0
+    self_seconds: float = 0.0
+
+
+@dataclass
+class ScopeStats:
+    """Time spent in a scope, like the compilation of a family, and the
+    counts made within it.
+
+    Attributes:
+        seconds: Total time spent in the scope
+        counters: Counts made within the scope, including nested scopes
+    """
+
+    seconds: float = 0.0
+    counters: Counter[str] = field(default_factory=Counter)
+
+
+class Profiler:
+    """Collects the timings of build phases and counts of events, like
+    files read or cache hits, while it is in use (see ``use_profiler()``).
+
+    Phases are timed by ``span()``, and may be nested. Scopes are phases whose
+    time and counts are also reported per key, e.g the compilation of each
+    family.
+
+    The profiler is not thread-safe. It is only used by the thread that
+    entered ``use_profiler()``.
+
+    Attributes:
+        trace: Whether each span is kept as a trace event, for ``write_trace()``
+        phases: Timings of each phase, by name
+        counters: Total of each count
+        scopes: Stats of each scope, by name and key
+        trace_events: Chrome trace events of each span, if ``trace`` is set
+    """
+
+    def __init__(self, trace: bool = False):
+        self.trace = trace
+        self.phases: dict[str, PhaseStats] = {}
+        self.counters: Counter[str] = Counter()
+        self.scopes: dict[str, dict[str, ScopeStats]] = {}
+        self.trace_events: list[dict[str, Any]] = []
+
+        self._start = time.perf_counter()
+        self._child_seconds: list[float] = []
+        self._scope_stack: list[ScopeStats] = []
+
+    @contextmanager
+    def span(self, name: str, **args: Any) -> Iterator[None]:
+        """Time the phase ``name`` within this context. ``args`` are added to
+        the trace event."""
+        self._child_seconds.append(0.0)
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            child_seconds = self._child_seconds.pop()
+            if self._child_seconds:
+                self._child_seconds[-1] += seconds
+
+            if (phase := self.phases.get(name)) is None:
+                phase = self.phases[name] = PhaseStats()
+
+            phase.count += 1
+            phase.seconds += seconds
+            phase.self_seconds += seconds - child_seconds
+
+            if self.trace:
+                self.trace_events.append(
+                    {
+                        "name": name,
+                        "ph": "X",
+                        "ts": (start - self._start) * 1e6,
+                        "dur": seconds * 1e6,
+                        "pid": os.getpid(),
+                        "tid": threading.get_ident(),
+                        "args": args,
+                    }
+                )
+
+    @contextmanager
+    def scope(self, name: str, key: str) -> Iterator[None]:
+        """Time the phase ``name`` within this context, and report its time
+        and the counts made within it under ``key``."""
+        scopes = self.scopes.setdefault(name, {})
+        if (stats := scopes.get(key)) is None:
+            stats = scopes[key] = ScopeStats()
+
+        self._scope_stack.append(stats)
+        start = time.perf_counter()
+        try:
+            with self.span(name, key=key):
+                yield
+        finally:
+            stats.seconds += time.perf_counter() - start
+            self._scope_stack.pop()
+
+    def count(self, name: str, value: int = 1) -> None:
+        """Add ``value`` to the count ``name``, and to the count in each
+        enclosing scope."""
+        self.counters[name] += value
+        for stats in self._scope_stack:
+            stats.counters[name] += value
+
+    def report(self) -> dict[str, Any]:
+        """Return the profile as a JSON-serializable dict. Phases are sorted by
+        their self time, longest first.
+
+        Example:
+
+            {
+                "seconds": 12.5,
+                "phases": {
+                    "validate": {"count": 3120, "seconds": 9.1, "self_seconds": 6.2},
+                    ...
+                },
+                "counters": {"files_read": 3120, "object_cache_hits": 1080, ...},
+                "scopes": {
+                    "compile_family": {
+                        "qchem/h2/dataset.json": {"seconds": 0.2, "counters": {...}},
+                        ...
+                    }
+                }
+            }
+        """
+        phases = sorted(
+            self.phases.items(), key=lambda item: item[1].self_seconds, reverse=True
+        )
+
+        return {
+            "seconds": time.perf_counter() - self._start,
+            "phases": {
+                name: {
+                    "count": phase.count,
+                    "seconds": phase.seconds,
+                    "self_seconds": phase.self_seconds,
+                }
+                for name, phase in phases
+            },
+            "counters": dict(sorted(self.counters.items())),
+            "scopes": {
+                name: {
+                    key: {
+                        "seconds": stats.seconds,
+                        "counters": dict(sorted(stats.counters.items())),
+                    }
+                    for key, stats in scopes.items()
+                }
+                for name, scopes in self.scopes.items()
+            },
+        }
+
+    def write_report(self, path: Path) -> None:
+        """Write the result of ``report()`` to ``path``."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.report(), f, indent=2)
+
+    def write_trace(self, path: Path) -> None:
+        """Write the trace events to ``path``, in the Chrome trace event format
+        read by 'chrome://tracing' and Perfetto."""
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": self.trace_events}, f)
+
+
+_profiler: ContextVar[Profiler | None] = ContextVar("profiler", default=None)
+
+
+@contextmanager
+def use_profiler(profiler: Profiler | None) -> Iterator[None]:
+    """Record the spans and counts made within this context to ``profiler``."""
+    token = _profiler.set(profiler)
+    try:
+        yield
+    finally:
+        _profiler.reset(token)
+
+
+def span(name: str, **args: Any) -> AbstractContextManager[None]:
+    """Time the phase ``name`` within this context, if a profiler is in use.
+    See ``Profiler.span()``."""
+    if (profiler := _profiler.get()) is None:
+        return nullcontext()
+
+    return profiler.span(name, **args)
+
+
+def scope(name: str, key: str) -> AbstractContextManager[None]:
+    """Time the scope ``name`` within this context, if a profiler is in use.
+    See ``Profiler.scope()``."""
+    if (profiler := _profiler.get()) is None:
+        return nullcontext()
+
+    return profiler.scope(name, key)
+
+
+def count(name: str, value: int = 1) -> None:
+    """Add ``value`` to the count ``name``, if a profiler is in use."""
+    if (profiler := _profiler.get()) is not None:
+        profiler.count(name, value)
@@ -1,5 +1,10 @@
+import threading
+from typing import Any
+
 import pydantic.alias_generators
-from pydantic import ConfigDict
+from pydantic import ConfigDict, TypeAdapter
+
+from dsets.lib import profiling
 
 
 class CamelCaseMixin:
@@ -9,3 +14,65 @@ class CamelCaseMixin:
     model_config = ConfigDict(
         alias_generator=pydantic.alias_generators.to_camel, populate_by_name=True
     )
+
+
+class TypeAdapterRegistry:
+    """Cache of ``TypeAdapter`` instances, keyed by type. Building the core
+    schema of an adapter is much slower than validating with it, so adapters
+    for the same type should be reused.
+
+    Parametrized generics like ``Reference[DatasetClass]`` and ``Ref[str]``
+    compare equal to each other, so they share an adapter. Types that cannot
+    be hashed, e.g ``Annotated`` types with unhashable metadata, get a new
+    adapter every time.
+
+    Attributes:
+        builds: Number of adapters that have been built
+        hits: Number of times a cached adapter was returned
+    """
+
+    def __init__(self):
+        self.builds = 0
+        self.hits = 0
+        self._adapters: dict[tuple[Any, str], TypeAdapter] = {}
+        self._lock = threading.Lock()
+
+    def get(self, type_: Any) -> TypeAdapter:
+        """Return an adapter for ``type_``, building it if it is not cached."""
+        # Some types compare equal but validate differently, e.g
+        # 'Union[int, str]' and 'Union[str, int]', so the repr is part of the key
+        try:
+            key = (type_, repr(type_))
+            adapter = self._adapters.get(key)
+        except TypeError:
+            return self._build(type_)
+
+        if adapter is not None:
+            self.hits += 1
+            profiling.count("type_adapter_hits")
+            return adapter
+
+        adapter = self._build(type_)
+        with self._lock:
+            return self._adapters.setdefault(key, adapter)
+
+    def clear(self) -> None:
+        """Remove all cached adapters, and reset the counters."""
+        with self._lock:
+            self._adapters.clear()
+            self.builds = self.hits = 0
+
+    def _build(self, type_: Any) -> TypeAdapter:
+        self.builds += 1
+        profiling.count("type_adapter_builds")
+        with profiling.span("type_adapter_build"):
+            return TypeAdapter(type_)
+
+
+type_adapters = TypeAdapterRegistry()
+
+
+def get_type_adapter(type_: Any) -> TypeAdapter:
+    """Return a cached ``TypeAdapter`` for ``type_``. See
+    ``TypeAdapterRegistry``."""
+    return type_adapters.get(type_)
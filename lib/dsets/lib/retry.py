@@ -0,0 +1,52 @@
+import time
+from collections.abc import Callable
+from logging import getLogger
+from typing import ParamSpec, TypeVar
+
+logger = getLogger(__name__)
+
+P = ParamSpec("P")
+T = TypeVar("T")
+
+
+def call_with_retries(
+    func: Callable[P, T],
+    retry_on: tuple[type[BaseException], ...],
+    *args: P.args,
+    attempts: int = 3,
+    backoff: float = 0.5,
+    **kwargs: P.kwargs,
+) -> T:
+    """Call ``func(*args, **kwargs)``, retrying if it raises one of ``retry_on``.
+    The delay between attempts doubles each time, starting at ``backoff`` seconds.
+
+    Args:
+        func: Function to call
+        retry_on: Exception types that should be retried
+        attempts: Maximum number of calls
+        backoff: Delay in seconds before the first retry
+
+    Returns:
+        The return value of ``func``
+
+    Raises:
+        The exception raised by the last attempt, if all attempts fail
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return func(*args, **kwargs)
+        except retry_on as exc:
+            if attempt == attempts:
+                raise
+
+            delay = backoff * 2 ** (attempt - 1)
+            logger.warning(
+                "Retrying after error: func=%s, attempt=%d, delay=%.1fs, error=%s",
+                getattr(func, "__name__", func),
+                attempt,
+                delay,
+                exc,
+            )
+            time.sleep(delay)
+
+    raise AssertionError("unreachable")
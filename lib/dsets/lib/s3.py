@@ -3,7 +3,7 @@ from collections.abc import Callable
 from pathlib import Path, PurePosixPath
 from typing import ClassVar
 
-from .file_hash import file_sha1_hash
+from .file_hash import DigestCache, file_sha1_hash
 from .time import urlsafe_isoformat, utcnow
 
 if typing.TYPE_CHECKING:
@@ -28,6 +28,20 @@ def object_exists(s3_client: S3Client, bucket: str, key: S3Path) -> bool:
     return True
 
 
+def list_keys(s3_client: S3Client, bucket: str, prefix: S3Path) -> set[S3Path]:
+    """Return the keys of all objects under ``prefix`` in ``bucket``. Keys
+    are listed 1000 at a time, which is much faster than checking whether
+    individual objects exist."""
+    key_prefix = "" if prefix == S3Path() else f"{prefix}/"
+    paginator = s3_client.get_paginator("list_objects_v2")
+
+    return {
+        S3Path(obj["Key"])
+        for page in paginator.paginate(Bucket=bucket, Prefix=key_prefix)
+        for obj in page.get("Contents", ())
+    }
+
+
 class S3DatasetRepo:
     """Class for managing the S3 dataset repo and the git
     mirror.
@@ -39,6 +53,7 @@ class S3DatasetRepo:
         s3_bucket: Name of S3 bucket
         s3_prefix: Prefix of the data repo in the
             S3 bucket
+        digest_cache: Cache used when hashing files to upload
     """
 
     hashfile_key_prefix: ClassVar[S3Path] = S3Path("_by_hash")
@@ -49,11 +64,13 @@ class S3DatasetRepo:
         s3_client: S3Client,
         s3_bucket: str,
         s3_prefix: S3Path | None = None,
+        digest_cache: DigestCache | None = None,
     ):
         self.local_mirror = local_mirror
         self.s3_client = s3_client
         self.s3_bucket = s3_bucket
         self.s3_prefix = s3_prefix or S3Path()
+        self.digest_cache = digest_cache
 
     def get_obj_with_hash(self, file_sha1: bytes) -> S3Path | None:
         """Returns the S3 key for an object in the S3 repo with the given hash,
@@ -99,7 +116,9 @@ class S3DatasetRepo:
         Returns:
             S3 key of the newly uploaded file
         """
-        file_sha1 = file_sha1_hash(path, progress_cb=hash_progress_cb)
+        file_sha1 = file_sha1_hash(
+            path, progress_cb=hash_progress_cb, cache=self.digest_cache
+        )
 
         if existing_key := self.get_obj_with_hash(file_sha1):
             raise FileExistsError(
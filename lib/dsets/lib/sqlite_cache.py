@@ -0,0 +1,57 @@
+import os
+import sqlite3
+import threading
+from collections.abc import Iterator
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, ClassVar
+
+
+class SQLiteCache:
+    """Base class for persistent caches stored in an SQLite database.
+
+    The database is opened on first use, in WAL mode, and its table is created
+    from ``schema`` if it does not exist. The cache can be shared by several
+    threads and processes, and pickled to be sent to a worker process.
+
+    Attributes:
+        path: Path to the database file
+        schema: 'CREATE TABLE IF NOT EXISTS' statement for the cache's table
+    """
+
+    schema: ClassVar[str]
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._connection: sqlite3.Connection | None = None
+        self._pid = os.getpid()
+
+    @contextmanager
+    def _transaction(self) -> Iterator[sqlite3.Connection]:
+        """Hold the cache's lock, and yield its connection within a transaction
+        that is committed when the context exits."""
+        with self._lock, self._connect() as connection:
+            yield connection
+
+    def _connect(self) -> sqlite3.Connection:
+        # Connections cannot be used by a forked process
+        if self._pid != os.getpid():
+            self._connection, self._pid = None, os.getpid()
+
+        if self._connection is None:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            connection = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            with connection:
+                connection.execute("PRAGMA journal_mode = WAL")
+                connection.execute(self.schema)
+
+            self._connection = connection
+
+        return self._connection
+
+    def __getstate__(self) -> dict[str, Any]:
+        return {"path": self.path}
+
+    def __setstate__(self, state: dict[str, Any]) -> None:
+        self.__init__(state["path"])
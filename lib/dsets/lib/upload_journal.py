@@ -0,0 +1,114 @@
+import os
+from logging import getLogger
+from pathlib import Path
+
+from pydantic import BaseModel, RootModel, ValidationError
+
+logger = getLogger(__name__)
+
+
+class UploadJournalEntry(BaseModel):
+    """Journal entry for an in-progress file upload.
+
+    Attributes:
+        path: Absolute path of the uploaded file
+        size: Size of the file in bytes
+        checksum_sha256: SHA256 sum of the file, in hex format
+        parts: Byte ranges, as ``(start, end)``, of the parts that have
+            been uploaded
+    """
+
+    path: str
+    size: int
+    checksum_sha256: str
+    parts: list[tuple[int, int]] = []
+
+
+class UploadJournalFile(RootModel[dict[str, UploadJournalEntry]]):
+    """Model for the upload journal file. Entries are keyed by the name of
+    the upload."""
+
+    root: dict[str, UploadJournalEntry] = {}
+
+
+class UploadJournal:
+    """Records the parts of a file upload that have completed, so that an
+    interrupted upload can be resumed. The journal file can hold entries for
+    several uploads, and is rewritten every time a part completes.
+
+    An upload can only be resumed if the journal has an entry for the same
+    file, with the same size and checksum.
+
+    Attributes:
+        journal_path: Path to the journal file
+        name: Name of the upload
+        resumable: True if the journal had an entry for this upload when
+            it was opened
+    """
+
+    def __init__(
+        self,
+        journal_path: Path,
+        name: str,
+        os_path: Path,
+        size: int,
+        checksum_sha256: bytes,
+    ):
+        self.journal_path = journal_path
+        self.name = name
+
+        self._entry = UploadJournalEntry(
+            path=str(Path(os_path).absolute()),
+            size=size,
+            checksum_sha256=checksum_sha256.hex(),
+        )
+
+        existing = self._load().root.get(name)
+        self.resumable = existing is not None and (
+            existing.path,
+            existing.size,
+            existing.checksum_sha256,
+        ) == (self._entry.path, self._entry.size, self._entry.checksum_sha256)
+
+        if existing is not None and self.resumable:
+            self._entry.parts = existing.parts
+
+    @property
+    def uploaded_parts(self) -> set[tuple[int, int]]:
+        """Byte ranges of the parts that have been uploaded."""
+        return set(self._entry.parts)
+
+    def add_part(self, start: int, end: int) -> None:
+        """Record that the part from ``start`` to ``end`` has been uploaded."""
+        self._entry.parts.append((start, end))
+        self._save(self._entry)
+
+    def start(self) -> None:
+        """Record a new upload, discarding any uploaded parts."""
+        self._entry.parts = []
+        self.resumable = False
+        self._save(self._entry)
+
+    def remove(self) -> None:
+        """Remove the entry for this upload from the journal."""
+        self._save(None)
+
+    def _load(self) -> UploadJournalFile:
+        try:
+            return UploadJournalFile.model_validate_json(self.journal_path.read_bytes())
+        except FileNotFoundError:
+            return UploadJournalFile()
+        except ValidationError:
+            logger.warning("Ignoring invalid upload journal: %s", self.journal_path)
+            return UploadJournalFile()
+
+    def _save(self, entry: UploadJournalEntry | None) -> None:
+        journal = self._load()
+        if entry is None:
+            journal.root.pop(self.name, None)
+        else:
+            journal.root[self.name] = entry
+
+        tmp_path = self.journal_path.with_name(f"{self.journal_path.name}.tmp")
+        tmp_path.write_text(journal.model_dump_json(indent=2), encoding="utf-8")
+        os.replace(tmp_path, self.journal_path)
@@ -1,5 +1,5 @@
 from .author import Author
-from .dataset import Dataset
+from .dataset import Dataset, DatasetTable
 from .dataset_class import DatasetAttribute, DatasetClass, DatasetParameter
 from .dataset_collection import DatasetCollection
 from .dataset_family import (
@@ -20,4 +20,5 @@ __all__ = [
     "DatasetFamily",
     "DatasetFamilyMeta",
     "DatasetFeature",
+    "DatasetTable",
 ]
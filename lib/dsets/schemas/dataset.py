@@ -1,9 +1,17 @@
-from typing import Any
+from collections.abc import Iterator
+from typing import Any, Self
 
-from pydantic import HttpUrl
+from pydantic import (
+    BaseModel,
+    HttpUrl,
+    SerializationInfo,
+    field_validator,
+    model_serializer,
+    model_validator,
+)
 
 from dsets.lib.doctree import Document
-from dsets.lib.pydantic_util import CamelCaseMixin
+from dsets.lib.pydantic_util import CamelCaseMixin, get_type_adapter
 
 from .fields import PythonIdentifier
 
@@ -14,3 +22,120 @@ class Dataset(Document, CamelCaseMixin):
     data_url: HttpUrl | None = None
     parameters: dict[PythonIdentifier, str | None] = {}
     extra: dict[str, Any] = {}
+
+
+class DatasetTable(BaseModel, CamelCaseMixin):
+    """Columnar form of a family's datasets, with a column for the data URL and
+    for each parameter. Each column is validated as a whole, and datasets are
+    stored as entries of the columns rather than as ``Dataset`` instances, so
+    large families are faster to load and use less memory.
+
+    Serializes to the same list of rows as ``list[Dataset]``, or to its columns
+    if the serialization context has 'columnar' set, e.g to write the family back
+    to its file:
+
+        family.model_dump_json(by_alias=True, context={"columnar": True})
+
+    Example:
+
+        {
+            "dataUrl": [
+                "https://.../h2_sto-3g_0.5.h5",
+                "https://.../h2_sto-3g_0.7.h5"
+            ],
+            "parameters": {
+                "molname": ["H2", "H2"],
+                "basis": ["STO-3G", "STO-3G"],
+                "bondlength": ["0.5", "0.7"]
+            }
+        }
+
+    Attributes:
+        data_url: Data URL of each dataset
+        parameters: Value of each parameter for each dataset, or None if the
+            parameter is not defined for the dataset
+        extra: Extra data for each dataset
+    """
+
+    data_url: list[str | None]
+    parameters: dict[PythonIdentifier, list[str | None]] = {}
+    extra: list[dict[str, Any]] | None = None
+
+    def __len__(self) -> int:
+        return len(self.data_url)
+
+    def iter_rows(self) -> Iterator[tuple[str | None, dict[str, str | None]]]:
+        """Yield the data URL and parameters of each dataset. Parameters that
+        are not defined for a dataset are omitted."""
+        columns = self.parameters.items()
+        for i, data_url in enumerate(self.data_url):
+            yield (
+                data_url,
+                {name: values[i] for name, values in columns if values[i] is not None},
+            )
+
+    def append(self, dataset: Dataset) -> None:
+        """Add ``dataset`` as the last row of the table. A column is added for
+        each parameter that the table does not have, with None for the
+        existing datasets."""
+        length = len(self)
+        for name in dataset.parameters.keys() - self.parameters.keys():
+            self.parameters[name] = [None] * length
+
+        for name, values in self.parameters.items():
+            values.append(dataset.parameters.get(name))
+
+        if dataset.extra and self.extra is None:
+            self.extra = [{} for _ in range(length)]
+
+        if self.extra is not None:
+            self.extra.append(dataset.extra)
+
+        self.data_url.append(str(dataset.data_url) if dataset.data_url else None)
+
+    @field_validator("data_url", mode="after")
+    @classmethod
+    def _validate_data_url(cls, data_url: list[str | None]) -> list[str | None]:
+        urls = get_type_adapter(list[HttpUrl | None]).validate_python(data_url)
+
+        return [None if url is None else str(url) for url in urls]
+
+    @model_validator(mode="after")
+    def _validate_lengths(self: Self) -> Self:
+        lengths = {name: len(values) for name, values in self.parameters.items()}
+        if self.extra is not None:
+            lengths["extra"] = len(self.extra)
+
+        if mismatched := {
+            name: length for name, length in lengths.items() if length != len(self)
+        }:
+            raise ValueError(
+                f"Columns must have the same length as 'dataUrl' ({len(self)}): "
+                f"{mismatched}"
+            )
+
+        return self
+
+    @model_serializer(mode="plain")
+    def _serialize_rows(
+        self, info: SerializationInfo
+    ) -> list[dict[str, Any]] | dict[str, Any]:
+        data_url_key = "dataUrl" if info.by_alias else "data_url"
+        if info.context and info.context.get("columnar"):
+            columns: dict[str, Any] = {
+                data_url_key: self.data_url,
+                "parameters": self.parameters,
+            }
+            if self.extra is not None:
+                columns["extra"] = self.extra
+
+            return columns
+
+        return [
+            {
+                data_url_key: data_url,
+                "parameters": parameters,
+                "extra": {} if self.extra is None else self.extra[i],
+            }
+            for i, (data_url, parameters) in enumerate(self.iter_rows())
+        ]
@@ -8,7 +8,7 @@ from dsets.lib.doctree import Asset, Document, Ref
 from dsets.lib.pydantic_util import CamelCaseMixin
 
 from .author import Author
-from .dataset import Dataset
+from .dataset import Dataset, DatasetTable
 from .dataset_class import DatasetClass
 from .dataset_collection import DatasetCollection
 from .fields import BibtexStr, Slug
@@ -88,19 +88,25 @@ class DatasetFamily(Document, CamelCaseMixin):
         class_: `DatasetClass` for this family, or a reference
             to a document containing one
         download_name: First parameter for download form
-        data: `Datasets` belonging to this family
+        data: `Datasets` belonging to this family, or a `DatasetTable`
+            of them
         features: Data features for this family
         meta: Extended metadata
+        parameter_tree: Tree of the parameter values of ``data``, with
+            the default value of each parameter. Filled in by the builder
+        parameter_lookup: Data URL of each dataset, keyed by the JSON array
+            of its parameter values. Set by the builder
     """
 
     slug: Slug
 
     class_: Annotated[Ref[DatasetClass], Field(alias="class")]
     collection: Ref[DatasetCollection] | None = None
-    data: list[Dataset] = []
+    data: list[Dataset] | DatasetTable = []
     download_name: str
     features: list[DatasetFeature] = []
     meta: Ref[DatasetFamilyMeta]
     parameter_tree: DatasetParameterNode | None = None
+    parameter_lookup: dict[str, str | None] | None = None
 
     extra: dict[str, Any] = {}
@@ -1,10 +1,12 @@
 import keyword
 from typing import Annotated, Any, TypeVar
 
-import bibtexparser
-from pydantic import AfterValidator, Field, TypeAdapter, ValidationError
+from pydantic import AfterValidator, Field, ValidationError
 from typing_extensions import TypeAliasType
 
+from dsets.lib.bibtex import parse_bibtex
+from dsets.lib.pydantic_util import get_type_adapter
+
 
 def _python_identifier_validator(val: str) -> str:
     """Validator for ``PythonIdentifier``. Raises a ``ValueError`` if
@@ -27,12 +29,14 @@ def _bibtex_str_validator(val: str) -> str:
     """Validator for ``BibtexStr``. The BibTex parser is very permissive,
     and will parse almost any string as an "implicit comment block". This validator
     checks that at least one 'entry' (@article, @misc) is defined.
+
+    Parsing results are cached, see ``dsets.lib.bibtex.parse_bibtex()``.
     """
-    parsed = bibtexparser.parse_string(val)
+    parsed = parse_bibtex(val)
 
     if parsed.failed_blocks:
         raise ValueError(
-            f"Failed to parse Bibtex citation blocks: {repr(parsed.failed_blocks)}"
+            f"Failed to parse Bibtex citation blocks: {list(parsed.failed_blocks)}"
         )
     if not parsed.entries:
         raise ValueError("Bibtex citation has no entries")
@@ -55,7 +59,7 @@ T = TypeVar("T")
 
 def validate(field_type_: Any, val: T, *, err: bool = True) -> T | None:
     try:
-        return TypeAdapter(field_type_).validate_python(val)
+        return get_type_adapter(field_type_).validate_python(val)
     except ValidationError as exc:
         if err:
             raise exc
@@ -6,6 +6,8 @@ import boto3
 from dulwich.repo import Repo
 from pydantic_settings import BaseSettings
 
+from .lib.bibtex import BibtexCache
+from .lib.file_hash import DigestCache
 from .lib.s3 import S3Client, S3Path
 
 
@@ -42,6 +44,11 @@ class CLIContext:
     def auth_path(self):
         return self.repo_root / ".auth.json"
 
+    @property
+    def upload_journal_path(self) -> Path:
+        """Path to the journal of in-progress file uploads."""
+        return self.repo_root / ".upload-journal.json"
+
     @property
     def repo_root(self) -> Path:
         """Path to repository root, relative to the
@@ -64,6 +71,21 @@ class CLIContext:
     def build_dir(self) -> Path:
         return self.repo_root / "_build"
 
+    @property
+    def cache_dir(self) -> Path:
+        """Path to the directory of caches that persist between builds."""
+        return self.repo_root / ".dsets-cache"
+
+    @cached_property
+    def digest_cache(self) -> DigestCache:
+        """Cache of file digests."""
+        return DigestCache(self.cache_dir / "digests.sqlite")
+
+    @cached_property
+    def bibtex_cache(self) -> BibtexCache:
+        """Cache of parsed citations."""
+        return BibtexCache(self.cache_dir / "bibtex.sqlite")
+
     @cached_property
     def repo(self) -> Repo:
         """dulwich ``Repo`` object for the pennylane-datasets
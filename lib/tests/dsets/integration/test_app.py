@@ -0,0 +1,43 @@
+import json
+import shutil
+from datetime import date
+from unittest.mock import patch
+
+from dsets.app import app
+from dsets.schemas import DatasetTable
+from dulwich.repo import Repo
+from typer.testing import CliRunner
+
+
+def test_add_columnar(test_support_dir, tmp_path, monkeypatch):
+    """Test that 'dsets add' appends a dataset to a family whose data is a
+    ``DatasetTable``, and writes the family back in columnar form."""
+    Repo.init(str(tmp_path))
+    class_dir = tmp_path / "content" / "foo"
+    shutil.copytree(test_support_dir / "content" / "foo", class_dir / "bar")
+    (class_dir / "_meta").mkdir()
+    shutil.move(class_dir / "bar" / "class.json", class_dir / "_meta" / "class.json")
+
+    family_doc = class_dir / "bar" / "dataset.json"
+    family = json.loads(family_doc.read_text("utf-8"))
+    family["class"] = {"$path": "../_meta/class.json"}
+    family["data"] = {
+        "dataUrl": ["https://datasets.cloud.pennylane.ai/datasets/h5/foo/thing.h5"],
+        "parameters": {"number": ["2"]},
+    }
+    family_doc.write_text(json.dumps(family), encoding="utf-8")
+    monkeypatch.chdir(tmp_path)
+
+    with patch("pennylane.data.Dataset.open"):
+        result = CliRunner().invoke(app, ["add", "bar.h5"], input="foo\nbar\n3\n")
+
+    assert result.exit_code == 0, result.output
+    data = json.loads(family_doc.read_text("utf-8"))["data"]
+    assert data == {
+        "dataUrl": [family["data"]["dataUrl"][0], None],
+        "parameters": {"number": ["2", "3"]},
+    }
+    assert len(DatasetTable.model_validate(data)) == 2
+    meta = json.loads((class_dir / "bar" / "meta.json").read_text("utf-8"))
+    assert meta["dateOfLastModification"] == date.today().isoformat()
+    assert meta["citation"] == {"$path": "citation.txt"}
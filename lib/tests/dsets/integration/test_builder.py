@@ -1,6 +1,26 @@
+import asyncio
+import gzip
+import hashlib
 import json
+import os
+import shutil
+from unittest.mock import patch
 
-from dsets.builder import compile_dataset_build
+import pytest
+from aiohttp.test_utils import TestClient, TestServer
+from dsets.builder import (
+    AssetOptimizer,
+    LiveBuild,
+    compile_dataset_build,
+    iter_family_builds,
+    write_dataset_build,
+    write_sharded_build,
+)
+from dsets.builder.build_cache import BuildCache
+from dsets.builder.preview import PreviewServer
+from dsets.lib import profiling
+from dsets.lib.file_hash import DigestCache
+from dsets.schemas import DatasetFamily
 
 
 def test_compile_dataset_build(test_support_dir, tmp_path):
@@ -16,3 +36,661 @@ def test_compile_dataset_build(test_support_dir, tmp_path):
         expected_build = json.load(f)
 
     assert build == expected_build
+
+
+@pytest.fixture
+def content_dir(test_support_dir, tmp_path):
+    """Writable copy of the test content directory."""
+    return shutil.copytree(test_support_dir / "content", tmp_path / "content")
+
+
+def test_compile_dataset_build_incremental(test_support_dir, content_dir, tmp_path):
+    """Test that an incremental build reuses families that have not changed
+    and produces the same output as a full build."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    build_dir = tmp_path / "_build"
+
+    compile_dataset_build(build_dir, content_dir, asset_url_prefix)
+
+    with patch.object(
+        DatasetFamily, "from_os_path", side_effect=DatasetFamily.from_os_path
+    ) as from_os_path:
+        build = compile_dataset_build(
+            build_dir, content_dir, asset_url_prefix, incremental=True
+        )
+
+    with open(test_support_dir / "datasets-build.json", "r", encoding="utf-8") as f:
+        expected_build = json.load(f)
+
+    assert from_os_path.call_count == 0
+    assert build == expected_build
+
+
+@pytest.mark.parametrize(
+    "changed_file", ["foo/dataset.json", "foo/class.json", "foo/citation.txt"]
+)
+def test_compile_dataset_build_incremental_changed(content_dir, tmp_path, changed_file):
+    """Test that an incremental build recompiles a family if any file it
+    depends on has changed."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    build_dir = tmp_path / "_build"
+
+    compile_dataset_build(build_dir, content_dir, asset_url_prefix)
+
+    with open(content_dir / changed_file, "a", encoding="utf-8") as f:
+        f.write("\n")
+
+    with patch.object(
+        DatasetFamily, "from_os_path", side_effect=DatasetFamily.from_os_path
+    ) as from_os_path:
+        compile_dataset_build(
+            build_dir, content_dir, asset_url_prefix, incremental=True
+        )
+
+    assert from_os_path.call_count == 1
+
+
+def test_compile_dataset_build_incremental_changed_asset(content_dir, tmp_path):
+    """Test that an incremental build picks up changes to a local asset, and
+    removes the old asset from the build directory."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    build_dir = tmp_path / "_build"
+
+    before = compile_dataset_build(build_dir, content_dir, asset_url_prefix)
+
+    with open(content_dir / "images" / "thumbnail.png", "ab") as f:
+        f.write(b"\0")
+
+    after = compile_dataset_build(
+        build_dir, content_dir, asset_url_prefix, incremental=True
+    )
+
+    assert before["assets"] != after["assets"]
+    assert sorted(
+        f"{asset_url_prefix}/{path.name}" for path in (build_dir / "assets").iterdir()
+    ) == [url for url in after["assets"] if url.startswith(asset_url_prefix)]
+
+
+def test_compile_dataset_build_incremental_missing_assets(content_dir, tmp_path):
+    """Test that an incremental build recompiles families whose assets were
+    deleted from the build directory, so they are copied again."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    build_dir = tmp_path / "_build"
+
+    before = compile_dataset_build(build_dir, content_dir, asset_url_prefix)
+    shutil.rmtree(build_dir / "assets")
+
+    after = compile_dataset_build(
+        build_dir, content_dir, asset_url_prefix, incremental=True
+    )
+
+    assert after == before
+    assert sorted(
+        f"{asset_url_prefix}/{path.name}" for path in (build_dir / "assets").iterdir()
+    ) == [url for url in after["assets"] if url.startswith(asset_url_prefix)]
+
+
+def test_iter_family_builds_incremental_lazy(content_dir, tmp_path):
+    """Test that an incremental build loads each cached family only when it
+    is yielded."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    build_dir = tmp_path / "_build"
+    _add_family(content_dir, "baz")
+
+    compile_dataset_build(build_dir, content_dir, asset_url_prefix)
+
+    with patch.object(
+        BuildCache, "get", autospec=True, side_effect=BuildCache.get
+    ) as get:
+        family_builds = iter_family_builds(
+            build_dir, content_dir, asset_url_prefix, incremental=True
+        )
+        next(family_builds)
+
+        assert get.call_count == 1
+
+        assert len(list(family_builds)) == 1
+        assert get.call_count == 2
+
+
+def test_compile_dataset_build_incremental_invalid_fragment(
+    test_support_dir, content_dir, tmp_path
+):
+    """Test that an incremental build recompiles a family whose cached
+    build cannot be read."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    build_dir = tmp_path / "_build"
+
+    compile_dataset_build(build_dir, content_dir, asset_url_prefix)
+    for fragment in (build_dir / "cache").iterdir():
+        fragment.write_text("{}", encoding="utf-8")
+
+    build = compile_dataset_build(
+        build_dir, content_dir, asset_url_prefix, incremental=True
+    )
+
+    with open(test_support_dir / "datasets-build.json", "r", encoding="utf-8") as f:
+        expected_build = json.load(f)
+
+    assert build == expected_build
+
+
+def _add_family(content_dir, slug: str, shared_class: bool = True):
+    """Add a copy of the 'foo' family to the content directory with
+    the given slug. If ``shared_class`` is True, the copy will reference
+    the class and collection of the original."""
+    family_dir = shutil.copytree(content_dir / "foo", content_dir / slug)
+    with open(family_dir / "dataset.json", "r", encoding="utf-8") as f:
+        family = json.load(f)
+
+    family["slug"] = slug
+    if shared_class:
+        family["class"] = {"$path": "/foo/class.json"}
+        family["collection"] = {"$path": "/foo/collection.json"}
+    with open(family_dir / "dataset.json", "w", encoding="utf-8") as f:
+        json.dump(family, f)
+
+    return family_dir
+
+
+def test_compile_dataset_build_jobs(content_dir, tmp_path):
+    """Test that compiling families in multiple processes produces the
+    same output as a serial build."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    for slug in ("bar-1", "bar-2", "bar-3"):
+        _add_family(content_dir, slug)
+
+    serial = compile_dataset_build(
+        tmp_path / "_build_serial", content_dir, asset_url_prefix
+    )
+    parallel = compile_dataset_build(
+        tmp_path / "_build_parallel", content_dir, asset_url_prefix, jobs=2
+    )
+
+    assert json.dumps(parallel) == json.dumps(serial)
+    assert sorted(
+        p.name for p in (tmp_path / "_build_parallel" / "assets").iterdir()
+    ) == sorted(p.name for p in (tmp_path / "_build_serial" / "assets").iterdir())
+
+
+def test_compile_dataset_build_digest_cache(content_dir, tmp_path):
+    """Test that a build with a warm digest cache does not hash any files, and
+    produces the same output, in one or more processes."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    digest_cache = DigestCache(tmp_path / "digests.sqlite")
+    for slug in ("bar-1", "bar-2"):
+        _add_family(content_dir, slug)
+
+    # Recently modified files are never cached
+    for path in content_dir.rglob("*"):
+        os.utime(path, ns=(10**18, 10**18))
+
+    compile_dataset_build(
+        tmp_path / "_build", content_dir, asset_url_prefix, digest_cache=digest_cache
+    )
+    with patch("dsets.lib.file_hash.hashlib.new") as hash_new:
+        build = compile_dataset_build(
+            tmp_path / "_build",
+            content_dir,
+            asset_url_prefix,
+            digest_cache=digest_cache,
+        )
+    parallel = compile_dataset_build(
+        tmp_path / "_build",
+        content_dir,
+        asset_url_prefix,
+        jobs=2,
+        digest_cache=digest_cache,
+    )
+
+    hash_new.assert_not_called()
+    assert parallel == build
+    assert set(build["datasetFamilies"]) == {"bar", "bar-1", "bar-2"}
+
+
+def test_compile_dataset_build_optimizer(test_support_dir, content_dir, tmp_path):
+    """Test that a build with an asset optimizer lists the variants of local
+    images under 'assetVariants', and that toggling the optimizer invalidates
+    an incremental build."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    build_dir = tmp_path / "_build"
+
+    with (
+        patch("dsets.builder.asset_variants._require_pillow"),
+        patch.object(
+            AssetOptimizer,
+            "_render",
+            autospec=True,
+            side_effect=lambda self, os_path: [(os_path.read_bytes(), 400, 200)],
+        ),
+    ):
+        optimizer = AssetOptimizer(tmp_path / "variants", widths=(400,))
+        build = compile_dataset_build(
+            build_dir, content_dir, asset_url_prefix, optimizer=optimizer
+        )
+
+    local_images = {
+        url
+        for url in build["assets"]
+        if url.startswith(asset_url_prefix) and not url.endswith(".webp")
+    }
+    variant_urls = {
+        variant["url"]
+        for variants in build["assetVariants"].values()
+        for variant in variants
+    }
+    assert set(build["assetVariants"]) == local_images
+    assert variant_urls <= set(build["assets"])
+    assert all(
+        (build_dir / "assets" / url.rsplit("/")[-1]).exists() for url in variant_urls
+    )
+
+    rebuild = compile_dataset_build(
+        build_dir, content_dir, asset_url_prefix, incremental=True
+    )
+
+    with open(test_support_dir / "datasets-build.json", "r", encoding="utf-8") as f:
+        assert rebuild == json.load(f)
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_compile_dataset_build_duplicate_slug(content_dir, tmp_path, jobs):
+    """Test that a ``RuntimeError`` is raised if two families have the same slug."""
+    _add_family(content_dir, "bar")
+
+    with pytest.raises(
+        RuntimeError, match="DatasetFamily with slug 'bar' already exists"
+    ):
+        compile_dataset_build(
+            tmp_path / "_build",
+            content_dir,
+            "https://test.datasets.com/assets",
+            jobs=jobs,
+        )
+
+
+@pytest.mark.parametrize("jobs", [1, 2])
+def test_compile_dataset_build_duplicate_class(content_dir, tmp_path, jobs):
+    """Test that a ``RuntimeError`` is raised if two documents define a class
+    with the same slug."""
+    _add_family(content_dir, "bar-1", shared_class=False)
+
+    with pytest.raises(RuntimeError, match="Duplicate 'DatasetClass' definition"):
+        compile_dataset_build(
+            tmp_path / "_build",
+            content_dir,
+            "https://test.datasets.com/assets",
+            jobs=jobs,
+        )
+
+
+@pytest.mark.parametrize("compact", [False, True])
+@pytest.mark.parametrize("compress", [False, True])
+def test_write_dataset_build(test_support_dir, tmp_path, compact, compress):
+    """Test that ``write_dataset_build`` writes the same content as
+    ``compile_dataset_build``."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    build_file = tmp_path / "datasets-build.json"
+
+    write_dataset_build(
+        build_file,
+        iter_family_builds(
+            tmp_path / "_build", test_support_dir / "content", asset_url_prefix
+        ),
+        compact=compact,
+        compress=compress,
+    )
+
+    with open(test_support_dir / "datasets-build.json", "r", encoding="utf-8") as f:
+        expected_build = json.load(f)
+
+    if compress:
+        with gzip.open(build_file, "rt", encoding="utf-8") as f:
+            build = json.load(f)
+    else:
+        with open(build_file, "r", encoding="utf-8") as f:
+            build = json.load(f)
+
+    assert build == expected_build
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_write_dataset_build_key_order(test_support_dir, tmp_path, compact):
+    """Test that ``write_dataset_build`` writes the members in the same order
+    as ``compile_dataset_build``, with 'datasetFamilies' after the classes."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    build_file = tmp_path / "datasets-build.json"
+
+    write_dataset_build(
+        build_file,
+        iter_family_builds(
+            tmp_path / "_build", test_support_dir / "content", asset_url_prefix
+        ),
+        compact=compact,
+    )
+    expected_build = compile_dataset_build(
+        tmp_path / "_build", test_support_dir / "content", asset_url_prefix
+    )
+
+    assert list(expected_build) == [
+        "assets",
+        "datasetClasses",
+        "datasetFamilies",
+        "datasetCollections",
+        "tags",
+    ]
+    if compact:
+        expected = json.dumps(expected_build, separators=(",", ":"))
+    else:
+        expected = json.dumps(expected_build, indent=2)
+
+    assert build_file.read_text(encoding="utf-8") == expected + "\n"
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_write_dataset_build_index(test_support_dir, tmp_path, compact):
+    """Test that the index written with the build has the same hashes as the
+    index of a sharded build."""
+    family_builds = list(
+        iter_family_builds(
+            tmp_path / "_build",
+            test_support_dir / "content",
+            "https://test.datasets.com/assets",
+        )
+    )
+    write_dataset_build(
+        tmp_path / "datasets-build.json",
+        family_builds,
+        compact=compact,
+        index_path=tmp_path / "datasets-build.index.json",
+    )
+    write_sharded_build(tmp_path / "datasets-build", family_builds, compact=compact)
+
+    index = json.loads((tmp_path / "datasets-build.index.json").read_bytes())
+    sharded_index = json.loads(
+        (tmp_path / "datasets-build" / "index.json").read_bytes()
+    )
+    for section in ("datasetFamilies", "datasetClasses", "datasetCollections"):
+        for entry in sharded_index[section].values():
+            del entry["path"]
+
+    assert index == sharded_index
+
+
+def test_write_dataset_build_in_build_dir(test_support_dir, tmp_path):
+    """Test that ``write_dataset_build`` can write to the build directory
+    of ``iter_family_builds``."""
+    build_dir = tmp_path / "_build"
+    build_dir.mkdir()
+    (build_dir / "stale.json").write_text("{}", encoding="utf-8")
+
+    write_dataset_build(
+        build_dir / "datasets-build.json",
+        iter_family_builds(
+            build_dir,
+            test_support_dir / "content",
+            "https://test.datasets.com/assets",
+        ),
+    )
+
+    assert (build_dir / "datasets-build.json").exists()
+    assert not (build_dir / "stale.json").exists()
+
+
+def test_write_dataset_build_error(content_dir, tmp_path):
+    """Test that ``write_dataset_build`` does not leave a partial file if the
+    build fails, and that the previous file is kept."""
+    build_file = tmp_path / "datasets-build.json"
+    build_file.write_text("{}", encoding="utf-8")
+    _add_family(content_dir, "bar")
+
+    with pytest.raises(RuntimeError, match="already exists"):
+        write_dataset_build(
+            build_file,
+            iter_family_builds(
+                tmp_path / "_build", content_dir, "https://test.datasets.com/assets"
+            ),
+        )
+
+    assert build_file.read_text(encoding="utf-8") == "{}"
+    assert list(tmp_path.glob("*.tmp")) == []
+
+
+def test_write_dataset_build_profile(test_support_dir, tmp_path):
+    """Test that the phases of a build are timed, and that the files read by
+    each family are counted, when a profiler is in use."""
+    profiler = profiling.Profiler()
+
+    with profiling.use_profiler(profiler):
+        write_dataset_build(
+            tmp_path / "datasets-build.json",
+            iter_family_builds(
+                tmp_path / "_build",
+                test_support_dir / "content",
+                "https://test.datasets.com/assets",
+            ),
+        )
+
+    report = profiler.report()
+
+    assert {"json_load", "jsonref", "validate", "asset_hash", "asset_copy"} <= set(
+        report["phases"]
+    )
+    family = report["scopes"]["compile_family"]["foo/dataset.json"]
+    assert family["counters"]["files_read"] == report["counters"]["files_read"]
+    assert family["counters"]["object_cache_misses"] > 0
+    assert "/foo/class.json" in report["scopes"]["resolve_reference"]
+
+
+@pytest.mark.parametrize("compact", [False, True])
+def test_write_sharded_build(test_support_dir, tmp_path, compact):
+    """Test that ``write_sharded_build`` writes the same content as
+    ``compile_dataset_build``, with an index of the content hash of each
+    document."""
+    output_dir = tmp_path / "datasets-build"
+
+    write_sharded_build(
+        output_dir,
+        iter_family_builds(
+            tmp_path / "_build",
+            test_support_dir / "content",
+            "https://test.datasets.com/assets",
+        ),
+        compact=compact,
+    )
+
+    with open(output_dir / "index.json", "r", encoding="utf-8") as f:
+        index = json.load(f)
+
+    build = {"assets": index["assets"], "tags": index["tags"]}
+    for key in ("datasetClasses", "datasetFamilies", "datasetCollections"):
+        build[key] = {}
+        for slug, entry in index[key].items():
+            data = (output_dir / entry["path"]).read_bytes()
+            assert hashlib.sha256(data).hexdigest() == entry["sha256"]
+            build[key][slug] = json.loads(data)
+
+    with open(test_support_dir / "datasets-build.json", "r", encoding="utf-8") as f:
+        assert build == json.load(f)
+
+
+def test_write_sharded_build_replace(content_dir, tmp_path):
+    """Test that ``write_sharded_build`` replaces the previous output, and keeps
+    it if the build fails."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    output_dir = tmp_path / "datasets-build"
+    _add_family(content_dir, "baz")
+
+    write_sharded_build(
+        output_dir,
+        iter_family_builds(tmp_path / "_build", content_dir, asset_url_prefix),
+    )
+    assert (output_dir / "families" / "baz.json").exists()
+
+    shutil.rmtree(content_dir / "baz")
+    write_sharded_build(
+        output_dir,
+        iter_family_builds(tmp_path / "_build", content_dir, asset_url_prefix),
+    )
+    assert sorted(path.name for path in (output_dir / "families").iterdir()) == [
+        "bar.json"
+    ]
+
+    _add_family(content_dir, "bar")
+    with pytest.raises(RuntimeError, match="already exists"):
+        write_sharded_build(
+            output_dir,
+            iter_family_builds(tmp_path / "_build", content_dir, asset_url_prefix),
+        )
+
+    assert (output_dir / "families" / "bar.json").exists()
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "_build",
+        "content",
+        "datasets-build",
+    ]
+
+
+def test_live_build(content_dir, tmp_path):
+    """Test that a ``LiveBuild`` only compiles the families affected by changed
+    files, and writes the same build as a full build."""
+    asset_url_prefix = "https://test.datasets.com/assets"
+    live_build = LiveBuild(tmp_path / "_build", content_dir, asset_url_prefix)
+
+    assert live_build.build().compiled == 1
+    _add_family(content_dir, "bar-1")
+    assert live_build.update([content_dir / "bar-1" / "dataset.json"]).compiled == 1
+
+    with open(content_dir / "foo" / "citation.txt", "a", encoding="utf-8") as f:
+        f.write("\n")
+    with patch.object(
+        DatasetFamily, "from_os_path", side_effect=DatasetFamily.from_os_path
+    ) as from_os_path:
+        summary = live_build.update([content_dir / "foo" / "citation.txt"])
+
+    assert (summary.compiled, summary.removed, summary.written) == (1, 0, True)
+    assert from_os_path.call_count == 1
+
+    shutil.rmtree(content_dir / "bar-1")
+    summary = live_build.update([content_dir / "bar-1" / "dataset.json"])
+    assert (summary.compiled, summary.removed) == (0, 1)
+
+    with open(live_build.build_file, "r", encoding="utf-8") as f:
+        assert json.load(f) == compile_dataset_build(
+            tmp_path / "_build_full", content_dir, asset_url_prefix
+        )
+
+
+def test_live_build_error(content_dir, tmp_path):
+    """Test that a family that fails to compile is reported, and compiled again
+    by later updates."""
+    live_build = LiveBuild(
+        tmp_path / "_build", content_dir, "https://test.datasets.com/assets"
+    )
+    live_build.build()
+    citation = content_dir / "foo" / "citation.txt"
+    text = citation.read_text("utf-8")
+
+    citation.write_text("not a citation", "utf-8")
+    summary = live_build.update([citation])
+    assert list(summary.errors) == [(content_dir / "foo" / "dataset.json").absolute()]
+    assert not summary.written
+
+    citation.write_text(text, "utf-8")
+    summary = live_build.update([])
+    assert (summary.compiled, summary.errors, summary.written) == (1, {}, True)
+
+
+def test_live_build_unexpected_error(content_dir, tmp_path):
+    """Test that an unexpected error while compiling a family is reported
+    like any other compile error."""
+    live_build = LiveBuild(
+        tmp_path / "_build", content_dir, "https://test.datasets.com/assets"
+    )
+    live_build.build()
+    dataset_json = (content_dir / "foo" / "dataset.json").absolute()
+
+    with patch.object(live_build._compiler, "compile", side_effect=KeyError("slug")):
+        summary = live_build.update([dataset_json])
+
+    assert list(summary.errors) == [dataset_json]
+    assert live_build.update([]).written
+
+
+def test_preview_server(content_dir, tmp_path):
+    """Test that a ``PreviewServer`` serves the build, families and assets, with
+    ETags and compression, and serves changes after an update."""
+    live_build = LiveBuild(
+        tmp_path / "_build", content_dir, "https://test.datasets.com/assets"
+    )
+    live_build.build()
+    server = PreviewServer(live_build)
+
+    async def requests():
+        async with TestClient(TestServer(server.make_app())) as client:
+            resp = await client.get(
+                "/datasets-build.json", headers={"Accept-Encoding": "identity"}
+            )
+            assert resp.status == 200
+            assert await resp.read() == live_build.build_file.read_bytes()
+
+            resp = await client.get(
+                "/families/bar.json", headers={"Accept-Encoding": "gzip"}
+            )
+            etag = resp.headers["ETag"]
+            assert resp.headers["Content-Encoding"] == "gzip"
+            assert json.loads(await resp.read()) == live_build.family_builds[0].family
+
+            resp = await client.get(
+                "/families/bar.json", headers={"If-None-Match": etag}
+            )
+            assert resp.status == 304
+
+            asset = next((live_build.build_dir / "assets").iterdir())
+            resp = await client.get(f"/assets/{asset.name}")
+            assert await resp.read() == asset.read_bytes()
+
+            assert (await client.get("/families/baz.json")).status == 404
+
+            _add_family(content_dir, "baz")
+            server.update([content_dir / "baz" / "dataset.json"])
+
+            assert (await client.get("/families/baz.json")).status == 200
+            assert "/families/baz.json" in await (await client.get("/")).text()
+
+            resp = await client.get(
+                "/families/bar.json", headers={"If-None-Match": etag}
+            )
+            assert resp.status == 304
+
+    asyncio.run(requests())
+
+
+def test_preview_server_build_error(content_dir, tmp_path):
+    """Test that a ``PreviewServer`` responds with the build errors if the
+    first build could not be written, and serves the build once it is fixed."""
+    family_dir = _add_family(content_dir, "bar-1")
+    with open(family_dir / "dataset.json", "r", encoding="utf-8") as f:
+        family = json.load(f)
+    family["slug"] = "bar"
+    with open(family_dir / "dataset.json", "w", encoding="utf-8") as f:
+        json.dump(family, f)
+
+    live_build = LiveBuild(
+        tmp_path / "_build", content_dir, "https://test.datasets.com/assets"
+    )
+    server = PreviewServer(live_build, live_build.build())
+
+    async def requests():
+        async with TestClient(TestServer(server.make_app())) as client:
+            resp = await client.get("/datasets-build.json")
+            assert resp.status == 503
+            assert "DatasetFamily with slug 'bar' already exists" in await resp.text()
+
+            shutil.rmtree(family_dir)
+            server.update([family_dir / "dataset.json"])
+
+            resp = await client.get("/datasets-build.json")
+            assert resp.status == 200
+
+    asyncio.run(requests())
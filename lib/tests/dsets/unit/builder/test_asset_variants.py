@@ -0,0 +1,144 @@
+import os
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from dsets.builder.asset_variants import AssetOptimizer
+from dsets.builder.assets import AssetLoader
+
+from .test_assets import MockAsset
+
+
+def _render(self, os_path: Path) -> list[tuple[bytes, int, int]]:
+    """Stand-in for ``AssetOptimizer._render()`` that does not need Pillow."""
+    return [
+        (f"{os_path.name}-{width}".encode(), width, width // 2) for width in self.widths
+    ]
+
+
+@pytest.fixture
+def optimizer(tmp_path: Path):
+    """AssetOptimizer fixture, with rendering patched out."""
+    with (
+        patch("dsets.builder.asset_variants._require_pillow"),
+        patch.object(AssetOptimizer, "_render", autospec=True, side_effect=_render),
+    ):
+        yield AssetOptimizer(tmp_path / "variants", widths=(800, 400))
+
+
+@pytest.fixture
+def image_path(tmp_path: Path) -> Path:
+    path = tmp_path / "hero.png"
+    path.write_bytes(b"not really a png")
+
+    return path
+
+
+class TestAssetOptimizer:
+    def test_get_variants(self, optimizer: AssetOptimizer, image_path: Path):
+        """Test that ``get_variants()`` writes each variant to the cache
+        directory, smallest first, under a name that includes its hash."""
+        variants = optimizer.get_variants(image_path, "abc")
+
+        assert [(v.width, v.height, v.format) for v in variants] == [
+            (400, 200, "webp"),
+            (800, 400, "webp"),
+        ]
+        for variant in variants:
+            assert variant.name.startswith("hero-")
+            assert variant.name.endswith(".webp")
+            data = (optimizer.cache_dir / variant.name).read_bytes()
+            assert variant.size_bytes == len(data)
+
+    def test_get_variants_cached(self, optimizer: AssetOptimizer, image_path: Path):
+        """Test that variants of an image are only rendered once."""
+        first = optimizer.get_variants(image_path, "abc")
+        second = optimizer.get_variants(image_path, "abc")
+
+        assert first == second
+        assert optimizer._render.call_count == 1
+
+    def test_get_variants_not_image(self, optimizer: AssetOptimizer, tmp_path: Path):
+        """Test that files that are not images have no variants."""
+        (tmp_path / "data.h5").write_bytes(b"")
+
+        assert optimizer.get_variants(tmp_path / "data.h5", "abc") == []
+        assert optimizer._render.call_count == 0
+
+    def test_settings_key(self, tmp_path: Path):
+        """Test that optimizers with different settings use different
+        cache directories."""
+        with patch("dsets.builder.asset_variants._require_pillow"):
+            a = AssetOptimizer(tmp_path, quality=80)
+            b = AssetOptimizer(tmp_path, quality=50)
+
+        assert a.cache_dir != b.cache_dir
+
+    def test_pillow_missing(self, tmp_path: Path):
+        """Test that an ``ImportError`` is raised if Pillow is not installed."""
+        with (
+            patch("importlib.util.find_spec", return_value=None),
+            pytest.raises(ImportError, match="Pillow"),
+        ):
+            AssetOptimizer(tmp_path)
+
+    def test_render(self, tmp_path: Path):
+        """Test that images are resized, without being enlarged."""
+        Image = pytest.importorskip("PIL.Image")
+        Image.new("RGB", (600, 300)).save(tmp_path / "hero.png")
+
+        variants = AssetOptimizer(tmp_path / "variants").get_variants(
+            tmp_path / "hero.png", "abc"
+        )
+
+        assert [(v.width, v.height) for v in variants] == [(400, 200), (600, 300)]
+
+    def test_render_palette_transparency(self, tmp_path: Path):
+        """Test that transparency is kept in variants of palette images."""
+        Image = pytest.importorskip("PIL.Image")
+        image = Image.new("P", (100, 100), 0)
+        image.putpalette([0, 0, 0, 255, 0, 0])
+        image.info["transparency"] = 0
+        image.save(tmp_path / "hero.png", transparency=0)
+
+        optimizer = AssetOptimizer(tmp_path / "variants", format="PNG")
+        (variant,) = optimizer.get_variants(tmp_path / "hero.png", "abc")
+
+        with Image.open(optimizer.cache_dir / variant.name) as rendered:
+            assert rendered.mode == "RGBA"
+            assert rendered.getpixel((0, 0))[3] == 0
+
+    def test_get_variants_write_error(
+        self, optimizer: AssetOptimizer, image_path: Path
+    ):
+        """Test that no temporary files are left in the cache directory if
+        a variant cannot be written."""
+        with (
+            patch("os.replace", side_effect=OSError("disk full")),
+            pytest.raises(OSError, match="disk full"),
+        ):
+            optimizer.get_variants(image_path, "abc")
+
+        assert list(optimizer.cache_dir.iterdir()) == []
+
+
+def test_asset_loader_variants(
+    optimizer: AssetOptimizer, image_path: Path, tmp_path: Path
+):
+    """Test that ``AssetLoader`` links the variants of image assets into
+    the asset directory, and records their destination URLs."""
+    build_dir = tmp_path / "_build"
+    build_dir.mkdir()
+    loader = AssetLoader(
+        build_dir, "https://test.pennylane.ai/assets", optimizer=optimizer
+    )
+
+    url = loader.add_asset(MockAsset("", True, image_path))
+
+    variants = loader.asset_variants[url]
+    assert len(variants) == 2
+    for variant in variants:
+        assert variant.url == f"https://test.pennylane.ai/assets/{variant.name}"
+        assert os.path.samefile(
+            loader.asset_dir / variant.name, optimizer.cache_dir / variant.name
+        )
@@ -1,8 +1,15 @@
+import os
+from collections.abc import Iterator
 from dataclasses import dataclass
 from pathlib import Path
+from unittest.mock import patch
 
+import boto3
+import moto
 import pytest
+from boto3.exceptions import S3UploadFailedError
 from dsets.builder.assets import AssetLoader
+from dsets.lib.s3 import S3Client, S3Path
 
 
 @pytest.fixture
@@ -25,6 +32,15 @@ def asset_loader(build_dir: Path):
     )
 
 
+@pytest.fixture
+def s3_client() -> Iterator[S3Client]:
+    with moto.mock_aws():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket="mock_bucket")
+
+        yield client
+
+
 @dataclass
 class MockAsset:
     root: str
@@ -66,9 +82,115 @@ class TestAssetLoader:
         with open(asset_loader.asset_dir / name, "r", encoding="utf-8") as f:
             assert f.read() == content
 
+    def test_add_local_asset_store(self, content_dir: Path, tmp_path: Path):
+        """Test that with an asset store, local assets are hard linked from the
+        store into the asset directory of every build."""
+        (content_dir / "my_asset.asset").write_text("abcdefghijklmop", "utf-8")
+        store_dir = tmp_path / "store"
+        asset = MockAsset("", True, content_dir / "my_asset.asset")
+        name = "my_asset-0626a7b36aa3227e844ba5d81a6fc2ab9e099204.asset"
+
+        for build_dir in (tmp_path / "build-1", tmp_path / "build-2"):
+            build_dir.mkdir()
+            AssetLoader(
+                build_dir, "https://test.pennylane.ai/assets", store_dir=store_dir
+            ).add_asset(asset)
+
+        stored = store_dir / "0626a7b36aa3227e844ba5d81a6fc2ab9e099204"
+        assert stored.read_text("utf-8") == "abcdefghijklmop"
+        assert os.path.samefile(stored, tmp_path / "build-1" / "assets" / name)
+        assert os.path.samefile(stored, tmp_path / "build-2" / "assets" / name)
+        assert not os.path.samefile(stored, content_dir / "my_asset.asset")
+
+    def test_remove_unused_assets_store(self, content_dir: Path, tmp_path: Path):
+        """Test that ``remove_unused_assets()`` deletes assets from the asset store
+        once no build uses them."""
+        store_dir = tmp_path / "store"
+        loaders = []
+        for build_dir in (tmp_path / "build-1", tmp_path / "build-2"):
+            build_dir.mkdir()
+            loaders.append(
+                AssetLoader(
+                    build_dir, "https://test.pennylane.ai/assets", store_dir=store_dir
+                )
+            )
+
+        (content_dir / "a.asset").write_text("a", "utf-8")
+        (content_dir / "b.asset").write_text("b", "utf-8")
+        url_a = loaders[0].add_asset(MockAsset("", True, content_dir / "a.asset"))
+        url_b = loaders[0].add_asset(MockAsset("", True, content_dir / "b.asset"))
+        loaders[1].add_asset(MockAsset("", True, content_dir / "b.asset"))
+
+        loaders[0].remove_unused_assets([url_a])
+        assert len(list(store_dir.iterdir())) == 2
+
+        loaders[1].remove_unused_assets([])
+        assert [path.name for path in store_dir.iterdir()] == [
+            url_a.rpartition("-")[2].removesuffix(".asset")
+        ]
+        assert url_b not in [
+            loaders[0].asset_destination_url(path.name) for path in loaders[0].assets
+        ]
+
     def test_add_remote_asset(self, asset_loader: AssetLoader):
         """Test that adding a remote asset returns the asset's url."""
         assert (
             asset_loader.add_asset(MockAsset("https://asset.com/asset", False, None))
             == "https://asset.com/asset"
         )
+
+    def test_upload_assets(self, asset_loader: AssetLoader, s3_client: S3Client):
+        """Test that ``upload_assets()`` uploads assets that do not exist in
+        the bucket, and skips assets that do."""
+        (asset_loader.asset_dir / "a-1.txt").write_text("aaaa", encoding="utf-8")
+        (asset_loader.asset_dir / "b-2.txt").write_text("bb", encoding="utf-8")
+        (asset_loader.asset_dir / "c-3.txt").write_text("cccccc", encoding="utf-8")
+        s3_client.put_object(Bucket="mock_bucket", Key="assets/b-2.txt", Body=b"bb")
+
+        summary = asset_loader.upload_assets(
+            s3_client, "mock_bucket", S3Path("assets"), max_workers=2
+        )
+
+        assert (summary.uploaded, summary.skipped) == (2, 1)
+        assert summary.bytes_uploaded == 10
+        assert {
+            obj["Key"]
+            for obj in s3_client.list_objects_v2(Bucket="mock_bucket")["Contents"]
+        } == {"assets/a-1.txt", "assets/b-2.txt", "assets/c-3.txt"}
+
+    def test_upload_assets_retry(self, asset_loader: AssetLoader, s3_client: S3Client):
+        """Test that ``upload_assets()`` retries failed uploads."""
+        (asset_loader.asset_dir / "a-1.txt").write_text("aaaa", encoding="utf-8")
+
+        with (
+            patch.object(
+                s3_client,
+                "upload_file",
+                side_effect=[S3UploadFailedError("Failed"), None],
+            ) as mock_upload_file,
+            patch("dsets.lib.retry.time.sleep"),
+        ):
+            summary = asset_loader.upload_assets(
+                s3_client, "mock_bucket", S3Path("assets")
+            )
+
+        assert summary.uploaded == 1
+        assert mock_upload_file.call_count == 2
+
+    def test_upload_assets_failed(self, asset_loader: AssetLoader, s3_client: S3Client):
+        """Test that ``upload_assets()`` raises the upload error once all
+        attempts have failed."""
+        (asset_loader.asset_dir / "a-1.txt").write_text("aaaa", encoding="utf-8")
+
+        with (
+            patch.object(
+                s3_client, "upload_file", side_effect=S3UploadFailedError("Failed")
+            ) as mock_upload_file,
+            patch("dsets.lib.retry.time.sleep"),
+            pytest.raises(S3UploadFailedError),
+        ):
+            asset_loader.upload_assets(
+                s3_client, "mock_bucket", S3Path("assets"), attempts=2
+            )
+
+        assert mock_upload_file.call_count == 2
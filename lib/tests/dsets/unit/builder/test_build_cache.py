@@ -0,0 +1,193 @@
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from dsets.builder.build_cache import (
+    BuildCache,
+    DocumentBuild,
+    FamilyBuild,
+    FileStamp,
+)
+
+
+@pytest.fixture
+def docpath_root(tmp_path: Path) -> Path:
+    root = tmp_path / "content"
+    root.mkdir()
+
+    return root
+
+
+@pytest.fixture
+def build_dir(tmp_path: Path) -> Path:
+    return tmp_path / "_build"
+
+
+@pytest.fixture
+def family_build() -> FamilyBuild:
+    return FamilyBuild(
+        slug="foo",
+        family={"slug": "foo"},
+        dataset_class=DocumentBuild(
+            slug="bar", source="/bar/class.json", content={"slug": "bar"}
+        ),
+    )
+
+
+class TestFileStamp:
+    """Tests for `FileStamp`."""
+
+    def test_matches_unchanged(self, tmp_path: Path):
+        """Test that a stamp matches a file that has not changed."""
+        path = tmp_path / "file.txt"
+        path.write_text("abcdefghijklmnop", encoding="utf-8")
+
+        assert FileStamp.from_os_path(path).matches(path)
+
+    def test_matches_touched(self, tmp_path: Path):
+        """Test that a stamp matches a file whose modification time has changed,
+        but not its contents."""
+        path = tmp_path / "file.txt"
+        path.write_text("abcdefghijklmnop", encoding="utf-8")
+        stamp = FileStamp.from_os_path(path)
+
+        os.utime(path, ns=(stamp.mtime_ns + 10**9, stamp.mtime_ns + 10**9))
+
+        assert stamp.matches(path)
+
+    @pytest.mark.parametrize("content", ["abcdefghijklmnoq", "abc"])
+    def test_matches_changed(self, tmp_path: Path, content):
+        """Test that a stamp does not match a file whose contents have changed."""
+        path = tmp_path / "file.txt"
+        path.write_text("abcdefghijklmnop", encoding="utf-8")
+        stamp = FileStamp.from_os_path(path)
+
+        path.write_text(content, encoding="utf-8")
+        os.utime(path, ns=(stamp.mtime_ns + 10**9, stamp.mtime_ns + 10**9))
+
+        assert not stamp.matches(path)
+
+    def test_matches_deleted(self, tmp_path: Path):
+        """Test that a stamp does not match a deleted file."""
+        path = tmp_path / "file.txt"
+        path.write_text("abcdefghijklmnop", encoding="utf-8")
+        stamp = FileStamp.from_os_path(path)
+
+        path.unlink()
+
+        assert not stamp.matches(path)
+
+
+class TestBuildCache:
+    """Tests for `BuildCache`."""
+
+    def test_get_unchanged(self, build_dir, docpath_root, family_build):
+        """Test that a family is returned from the cache of the next
+        build if its dependencies are unchanged."""
+        (docpath_root / "dataset.json").write_text("{}", encoding="utf-8")
+
+        cache = BuildCache(build_dir, docpath_root, "https://assets")
+        cache.put(
+            docpath_root / "dataset.json",
+            family_build,
+            [docpath_root / "dataset.json"],
+        )
+        cache.save()
+
+        cache = BuildCache(build_dir, docpath_root, "https://assets")
+
+        assert cache.get(docpath_root / "dataset.json") == family_build
+
+    def test_get_changed(self, build_dir, docpath_root, family_build):
+        """Test that a family is not returned from the cache if one of its
+        dependencies has changed."""
+        (docpath_root / "dataset.json").write_text("{}", encoding="utf-8")
+
+        cache = BuildCache(build_dir, docpath_root, "https://assets")
+        cache.put(
+            docpath_root / "dataset.json",
+            family_build,
+            [docpath_root / "dataset.json"],
+        )
+        cache.save()
+
+        (docpath_root / "dataset.json").write_text('{"a": 1}', encoding="utf-8")
+        cache = BuildCache(build_dir, docpath_root, "https://assets")
+
+        assert cache.get(docpath_root / "dataset.json") is None
+
+    def test_is_fresh_missing_fragment(self, build_dir, docpath_root, family_build):
+        """Test that a family is not fresh if its cached build was deleted."""
+        (docpath_root / "dataset.json").write_text("{}", encoding="utf-8")
+
+        cache = BuildCache(build_dir, docpath_root, "https://assets")
+        cache.put(
+            docpath_root / "dataset.json",
+            family_build,
+            [docpath_root / "dataset.json"],
+        )
+        cache.save()
+
+        cache = BuildCache(build_dir, docpath_root, "https://assets")
+        assert cache.is_fresh(docpath_root / "dataset.json")
+
+        shutil.rmtree(cache.cache_dir)
+
+        assert not cache.is_fresh(docpath_root / "dataset.json")
+
+    def test_get_missing_output(self, build_dir, docpath_root, family_build):
+        """Test that a family is not returned from the cache if an asset it
+        staged in the build directory was deleted."""
+        (docpath_root / "dataset.json").write_text("{}", encoding="utf-8")
+        (build_dir / "assets").mkdir(parents=True)
+        (build_dir / "assets" / "foo-abc.png").write_bytes(b"")
+        family_build.staged_assets = ["assets/foo-abc.png"]
+
+        cache = BuildCache(build_dir, docpath_root, "https://assets")
+        cache.put(
+            docpath_root / "dataset.json",
+            family_build,
+            [docpath_root / "dataset.json"],
+        )
+        cache.save()
+
+        (build_dir / "assets" / "foo-abc.png").unlink()
+        cache = BuildCache(build_dir, docpath_root, "https://assets")
+
+        assert cache.get(docpath_root / "dataset.json") is None
+
+    def test_get_asset_prefix_changed(self, build_dir, docpath_root, family_build):
+        """Test that cached families are discarded if the asset URL prefix
+        changes."""
+        (docpath_root / "dataset.json").write_text("{}", encoding="utf-8")
+
+        cache = BuildCache(build_dir, docpath_root, "https://assets")
+        cache.put(
+            docpath_root / "dataset.json",
+            family_build,
+            [docpath_root / "dataset.json"],
+        )
+        cache.save()
+
+        cache = BuildCache(build_dir, docpath_root, "https://other-assets")
+
+        assert cache.get(docpath_root / "dataset.json") is None
+
+    def test_save_removes_unused_fragments(self, build_dir, docpath_root, family_build):
+        """Test that ``save()`` deletes fragments for families that were not
+        part of the build."""
+        (docpath_root / "dataset.json").write_text("{}", encoding="utf-8")
+
+        cache = BuildCache(build_dir, docpath_root, "https://assets")
+        cache.put(
+            docpath_root / "dataset.json",
+            family_build,
+            [docpath_root / "dataset.json"],
+        )
+        cache.save()
+
+        cache = BuildCache(build_dir, docpath_root, "https://assets")
+        cache.save()
+
+        assert list(cache.cache_dir.iterdir()) == []
@@ -0,0 +1,148 @@
+import pytest
+from dsets.builder.parameters import ParameterIndex
+from dsets.schemas import (
+    Dataset,
+    DatasetClass,
+    DatasetFamily,
+    DatasetParameter,
+    DatasetParameterNode,
+    DatasetTable,
+)
+
+
+def _make_family(
+    datasets: list[dict[str, str | None]],
+    parameter_tree: DatasetParameterNode | None = None,
+) -> DatasetFamily:
+    """Make a family of the 'qchem' class, with a dataset for each parameter
+    dict in ``datasets``."""
+    class_ = DatasetClass(
+        slug="qchem",
+        name="Qchem",
+        parameter_list=[
+            DatasetParameter(name="molname", title="Molecule"),
+            DatasetParameter(name="basis", title="Basis"),
+            DatasetParameter(name="bondlength", title="Bond length", optional=True),
+        ],
+    )
+
+    return DatasetFamily.model_construct(
+        slug="h2",
+        class_=class_,
+        data=[
+            Dataset(
+                data_url=f"https://datasets.com/{i}.h5",
+                parameters=parameters,
+            )
+            for i, parameters in enumerate(datasets)
+        ],
+        parameter_tree=parameter_tree,
+    )
+
+
+DATASETS = [
+    {"molname": "H2", "basis": "STO-3G", "bondlength": "0.5"},
+    {"molname": "H2", "basis": "STO-3G", "bondlength": "0.7"},
+    {"molname": "H2", "basis": "6-31G", "bondlength": "0.5"},
+    {"molname": "H2", "basis": "6-31G"},
+]
+
+
+def test_parameter_index():
+    """Test that the tree and lookup table contain every dataset, and that
+    every node has a default."""
+    index = ParameterIndex.from_family(_make_family(DATASETS))
+
+    assert index.tree == {
+        "default": "H2",
+        "next": {
+            "H2": {
+                "default": "STO-3G",
+                "next": {
+                    "STO-3G": {"default": "0.5", "next": {"0.5": None, "0.7": None}},
+                    "6-31G": {"default": "0.5", "next": {"0.5": None, None: None}},
+                },
+            }
+        },
+    }
+    assert index.lookup[("H2", "6-31G", None)] == "https://datasets.com/3.h5"
+    assert index.lookup_table() == {
+        '["H2","STO-3G","0.5"]': "https://datasets.com/0.h5",
+        '["H2","STO-3G","0.7"]': "https://datasets.com/1.h5",
+        '["H2","6-31G","0.5"]': "https://datasets.com/2.h5",
+        '["H2","6-31G",null]': "https://datasets.com/3.h5",
+    }
+
+
+def test_parameter_index_table():
+    """Test that the index of a family whose data is a ``DatasetTable`` is the
+    same as for a list of datasets."""
+    family = _make_family(DATASETS)
+    table_family = _make_family([])
+    table_family.data = DatasetTable(
+        data_url=[f"https://datasets.com/{i}.h5" for i in range(len(DATASETS))],
+        parameters={
+            name: [dataset.get(name) for dataset in DATASETS]
+            for name in ("molname", "basis", "bondlength")
+        },
+    )
+
+    assert ParameterIndex.from_family(table_family) == ParameterIndex.from_family(
+        family
+    )
+
+
+def test_parameter_index_family_defaults():
+    """Test that defaults in the family's parameter tree are kept, and that the
+    family's tree is not modified."""
+    parameter_tree = DatasetParameterNode(
+        next={"H2": DatasetParameterNode(default="6-31G", next={})}
+    )
+    family = _make_family(DATASETS, parameter_tree)
+
+    index = ParameterIndex.from_family(family)
+
+    assert index.tree["next"]["H2"]["default"] == "6-31G"
+    assert family.parameter_tree == {"next": {"H2": {"default": "6-31G", "next": {}}}}
+
+
+def test_parameter_index_resolve():
+    """Test that datasets are resolved by their parameters, using defaults for
+    parameters that are not given."""
+    index = ParameterIndex.from_family(_make_family(DATASETS))
+
+    assert index.resolve({"basis": "STO-3G", "bondlength": "0.7"}) == (
+        "https://datasets.com/1.h5"
+    )
+    assert index.resolve({"basis": "6-31G"}) == "https://datasets.com/2.h5"
+    assert index.resolve({}) == "https://datasets.com/0.h5"
+
+    with pytest.raises(KeyError):
+        index.resolve({"basis": "cc-pVDZ"})
+
+
+@pytest.mark.parametrize(
+    "datasets, parameter_tree, match",
+    [
+        ([{"molname": "H2"}], None, r"missing parameters: \['basis'\]"),
+        ([DATASETS[0], DATASETS[0]], None, "same parameters"),
+        (DATASETS, {"default": "LiH", "next": {}}, "does not match any dataset"),
+    ],
+)
+def test_parameter_index_invalid(datasets, parameter_tree, match):
+    """Test that an error is raised for datasets without a required parameter,
+    datasets with the same parameters, and defaults that match no dataset."""
+    with pytest.raises(ValueError, match=match):
+        ParameterIndex.from_family(_make_family(datasets, parameter_tree))
+
+
+def test_parameter_index_no_parameters():
+    """Test that the index of a family whose class has no parameters is
+    empty."""
+    family = _make_family([{}])
+    family.class_.parameter_list = []
+
+    index = ParameterIndex.from_family(family)
+
+    assert index.tree == {"next": {}}
+    assert index.lookup == {}
@@ -0,0 +1,71 @@
+import shutil
+from pathlib import Path
+
+import pytest
+from dsets.builder.validate import find_affected_families, validate_family
+from dsets.lib.doctree import Doctree
+
+
+@pytest.fixture
+def content_dir(test_support_dir: Path, tmp_path: Path) -> Path:
+    """Copy of the test content directory, with a second family that shares
+    the first family's class."""
+    content_dir = shutil.copytree(test_support_dir / "content", tmp_path / "content")
+    (content_dir / "baz").mkdir()
+    shutil.copy(content_dir / "foo" / "meta.json", content_dir / "baz" / "meta.json")
+    (content_dir / "baz" / "dataset.json").write_text(
+        """
+        {
+            "slug": "baz",
+            "class": {"$path": "/foo/class.json"},
+            "downloadName": "baz",
+            "meta": {"$path": "/foo/meta.json"}
+        }
+        """,
+        encoding="utf-8",
+    )
+
+    return content_dir
+
+
+@pytest.mark.parametrize(
+    "changed, expected",
+    [
+        (["foo/dataset.json"], ["foo"]),
+        (["foo/numbers.md"], ["foo"]),
+        (["foo/class.json"], ["baz", "foo"]),
+        (["foo/hero_image.jpg"], ["baz", "foo"]),
+        (["images/thumbnail.png"], ["baz", "foo"]),
+        (["baz/meta.json"], []),
+        (["README.md"], []),
+    ],
+)
+def test_find_affected_families(content_dir: Path, changed, expected):
+    """Test that ``find_affected_families()`` returns the families that
+    depend on the changed files."""
+    affected = find_affected_families(
+        content_dir, [content_dir / path for path in changed]
+    )
+
+    assert sorted(path.parent.name for path in affected) == expected
+
+
+def test_validate_family_missing_asset(content_dir: Path):
+    """Test that ``validate_family()`` raises a ``FileNotFoundError`` if a
+    local asset does not exist."""
+    (content_dir / "foo" / "hero_image.jpg").unlink()
+
+    with pytest.raises(FileNotFoundError, match="Asset file does not exist"):
+        validate_family(Doctree(content_dir), content_dir / "foo" / "dataset.json")
+
+
+def test_validate_family_asset_dependencies(content_dir: Path):
+    """Test that ``validate_family()`` records local assets as dependencies
+    of the family."""
+    doctree = Doctree(content_dir)
+
+    validate_family(doctree, content_dir / "foo" / "dataset.json")
+
+    dependencies = doctree.get_dependencies(content_dir / "foo" / "dataset.json")
+    assert (content_dir / "foo" / "hero_image.jpg").resolve() in dependencies
+    assert (content_dir / "images" / "thumbnail.png").resolve() in dependencies
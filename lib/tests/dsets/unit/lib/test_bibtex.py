@@ -0,0 +1,99 @@
+import hashlib
+import pickle
+from unittest.mock import patch
+
+import bibtexparser
+import pytest
+from dsets.lib import bibtex
+from dsets.lib.bibtex import BibtexCache, parse_bibtex
+
+CITATION = """
+@misc{Doe2024foo,
+    title={Foo},
+    author={Jane Doe and John Smith},
+    year={2024}
+}
+"""
+
+
+@pytest.fixture(autouse=True)
+def clear_parse_cache():
+    bibtex._parsed.clear()
+    yield
+    bibtex._parsed.clear()
+
+
+@pytest.fixture
+def parse_string():
+    with patch(
+        "bibtexparser.parse_string", side_effect=bibtexparser.parse_string
+    ) as parse_string:
+        yield parse_string
+
+
+def test_parse_bibtex():
+    """Test that ``parse_bibtex()`` returns the entries of a Bibtex string."""
+    parsed = parse_bibtex(CITATION)
+
+    assert [(entry.key, entry.entry_type) for entry in parsed.entries] == [
+        ("Doe2024foo", "misc")
+    ]
+    assert parsed.entries[0].fields["title"] == "Foo"
+    assert parsed.entries[0].authors == ["Jane Doe", "John Smith"]
+    assert parsed.failed_blocks == ()
+
+
+def test_parse_bibtex_failed_blocks():
+    """Test that blocks that could not be parsed are returned."""
+    parsed = parse_bibtex("@misc{key, title={x}\n")
+
+    assert parsed.entries == ()
+    assert parsed.failed_blocks == ("@misc{key, title={x}\n",)
+
+
+def test_parse_bibtex_memoized(parse_string):
+    """Test that a string is only parsed once."""
+    assert parse_bibtex(CITATION) == parse_bibtex(CITATION)
+
+    assert parse_string.call_count == 1
+
+
+def test_parse_bibtex_memoized_by_digest(parse_string):
+    """Test that strings are not kept in memory by the memoized results."""
+    parse_bibtex(CITATION)
+
+    assert list(bibtex._parsed) == [hashlib.sha1(CITATION.encode("utf-8")).hexdigest()]
+
+
+def test_parse_bibtex_persistent_cache(tmp_path, parse_string):
+    """Test that results are read from the persistent cache set with
+    ``use_cache()``."""
+    cache = BibtexCache(tmp_path / "bibtex.sqlite")
+
+    with bibtex.use_cache(cache):
+        parsed = parse_bibtex(CITATION)
+
+    bibtex._parsed.clear()
+    with bibtex.use_cache(BibtexCache(tmp_path / "bibtex.sqlite")):
+        assert parse_bibtex(CITATION) == parsed
+
+    assert parse_string.call_count == 1
+
+
+def test_bibtex_cache_parser_version(tmp_path):
+    """Test that results from a different version of the parser are ignored."""
+    cache = BibtexCache(tmp_path / "bibtex.sqlite")
+    cache.put("abc", parse_bibtex(CITATION))
+
+    with patch.object(bibtexparser, "__version__", "0.0.0"):
+        assert cache.get("abc") is None
+
+    assert cache.get("abc") == parse_bibtex(CITATION)
+
+
+def test_bibtex_cache_pickle(tmp_path):
+    """Test that a cache can be pickled, e.g to be sent to a worker process."""
+    cache = BibtexCache(tmp_path / "bibtex.sqlite")
+    cache.put("abc", parse_bibtex(CITATION))
+
+    assert pickle.loads(pickle.dumps(cache)).get("abc") == parse_bibtex(CITATION)
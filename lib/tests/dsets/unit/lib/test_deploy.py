@@ -0,0 +1,385 @@
+import copy
+import gzip
+import hashlib
+import json
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+from dsets.lib import deploy
+from dsets.lib.deploy import (
+    deploy_datasets_build,
+    diff_deploy_manifests,
+    make_deploy_manifest,
+)
+
+BUILD = {
+    "assets": ["https://assets/a.png", "https://assets/b.png"],
+    "datasetClasses": {"qchem": {"slug": "qchem"}},
+    "datasetFamilies": {
+        "h2": {"slug": "h2", "description": "H2"},
+        "lih": {"slug": "lih", "description": "LiH"},
+    },
+    "datasetCollections": {},
+    "tags": ["Chemistry"],
+}
+
+
+def _make_index(build: dict[str, Any]) -> dict[str, Any]:
+    """Return the index of ``build``, as written by ``write_dataset_build()``
+    with ``compact``."""
+    return {
+        section: (
+            {
+                key: {
+                    "sha256": hashlib.sha256(
+                        (json.dumps(value, separators=(",", ":")) + "\n").encode()
+                    ).hexdigest()
+                }
+                for key, value in entries.items()
+            }
+            if section in deploy.DOCUMENT_SECTIONS
+            else entries
+        )
+        for section, entries in build.items()
+    }
+
+
+class AdminAPI(ThreadingHTTPServer):
+    """Stand-in for the datasets admin API, which applies delta deploys to the
+    last build it received. If ``delta_status`` is set, delta deploys fail with
+    that status."""
+
+    def __init__(self, delta_status: int | None = None, failures: int = 0):
+        super().__init__(("127.0.0.1", 0), _AdminAPIHandler)
+        self.delta_status = delta_status
+        self.failures = failures
+        self.build: dict[str, Any] | None = None
+        self.requests: list[tuple[str, int]] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+
+class _AdminAPIHandler(BaseHTTPRequestHandler):
+    server: AdminAPI
+
+    def do_PUT(self):
+        body = self._read_body()
+        if self.server.failures:
+            self.server.failures -= 1
+            return self._respond(503)
+
+        self.server.build = body["build"]
+        self._respond(200)
+
+    def do_PATCH(self):
+        body = self._read_body()
+        build = self.server.build
+        if self.server.delta_status:
+            return self._respond(self.server.delta_status)
+
+        if build is None or body["baseManifestSha256"] != deploy._manifest_sha256(
+            make_deploy_manifest(_make_index(build))
+        ):
+            return self._respond(409)
+
+        for section, change in body["changes"].items():
+            entries = build.setdefault(section, [])
+            if isinstance(entries, dict):
+                entries.update(change["put"])
+                for key in change["delete"]:
+                    del entries[key]
+            else:
+                build[section] = sorted(
+                    (set(entries) | set(change["put"])) - set(change["delete"])
+                )
+
+        self._respond(200)
+
+    def _read_body(self) -> dict[str, Any]:
+        data = self.rfile.read(int(self.headers["Content-Length"]))
+        self.server.requests.append((self.command, len(data)))
+        if self.headers["Content-Encoding"] == "gzip":
+            data = gzip.decompress(data)
+
+        return json.loads(data)
+
+    def _respond(self, status: int) -> None:
+        self.send_response(status)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def aws_credentials(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+
+
+@pytest.fixture
+def admin_api(request) -> Iterator[AdminAPI]:
+    server = AdminAPI(**getattr(request, "param", {}))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+def _write_build(path: Path, build: dict[str, Any]) -> Path:
+    path.write_text(json.dumps(build), encoding="utf-8")
+    _index_path(path).write_text(json.dumps(_make_index(build)), encoding="utf-8")
+
+    return path
+
+
+def _index_path(build_path: Path) -> Path:
+    return build_path.with_name("datasets-build.index.json")
+
+
+def _write_sharded_build(build_dir: Path, build: dict[str, Any]) -> Path:
+    """Write ``build`` in the layout of ``write_sharded_build()``."""
+    index = _make_index(build)
+    for section, kind in (
+        ("datasetFamilies", "families"),
+        ("datasetClasses", "classes"),
+        ("datasetCollections", "collections"),
+    ):
+        (build_dir / kind).mkdir(parents=True, exist_ok=True)
+        for key, entry in index[section].items():
+            entry["path"] = f"{kind}/{key}.json"
+            (build_dir / entry["path"]).write_text(
+                json.dumps(build[section][key], separators=(",", ":")) + "\n",
+                encoding="utf-8",
+            )
+
+    (build_dir / "index.json").write_text(json.dumps(index), encoding="utf-8")
+
+    return build_dir
+
+
+def test_deploy_stream(admin_api, tmp_path):
+    """Test that the build is sent gzipped, without being parsed."""
+    build_path = _write_build(tmp_path / "datasets-build.json", BUILD)
+
+    with patch("json.load") as json_load:
+        result = deploy_datasets_build(admin_api.url, build_path, "abc")
+
+    json_load.assert_not_called()
+    assert admin_api.build == BUILD
+    assert admin_api.requests == [("PUT", result.request_bytes)]
+    assert result.body_bytes == len(
+        b'{"commitSha":"abc","build":' + build_path.read_bytes() + b"}"
+    )
+    assert result.compression_ratio == result.body_bytes / result.request_bytes
+
+
+def test_deploy_stream_gzip(admin_api, tmp_path):
+    """Test that a gzipped build is decompressed into the request body."""
+    build_path = tmp_path / "datasets-build.json.gz"
+    build_path.write_bytes(gzip.compress(json.dumps(BUILD).encode("utf-8")))
+
+    deploy_datasets_build(admin_api.url, build_path, "abc")
+
+    assert admin_api.build == BUILD
+
+
+def test_deploy_manifest_stream(admin_api, tmp_path):
+    """Test that the manifest is made from the index, without loading the
+    build."""
+    build_path = _write_build(tmp_path / "datasets-build.json", BUILD)
+
+    with patch("dsets.lib.deploy._load_json", wraps=deploy._load_json) as load_json:
+        _deploy(admin_api, tmp_path, "abc")
+
+    assert [call.args[0] for call in load_json.call_args_list] == [
+        _index_path(build_path)
+    ]
+    assert admin_api.build == BUILD
+
+
+@pytest.mark.parametrize("admin_api", [{"failures": 2}], indirect=True)
+def test_deploy_retry(admin_api, tmp_path):
+    """Test that requests that fail with a 5xx status are retried."""
+    build_path = _write_build(tmp_path / "datasets-build.json", BUILD)
+
+    with patch("dsets.lib.retry.time.sleep"):
+        deploy_datasets_build(admin_api.url, build_path, "abc")
+
+    assert admin_api.build == BUILD
+    assert [method for method, _ in admin_api.requests] == ["PUT", "PUT", "PUT"]
+
+
+def test_diff_deploy_manifests():
+    """Test that changed, added and deleted entries are found."""
+    build = copy.deepcopy(BUILD)
+    build["datasetFamilies"]["h2"]["description"] = "Hydrogen"
+    build["datasetFamilies"]["beh2"] = {"slug": "beh2"}
+    del build["datasetFamilies"]["lih"]
+    build["assets"].remove("https://assets/b.png")
+
+    assert diff_deploy_manifests(
+        make_deploy_manifest(_make_index(BUILD)),
+        make_deploy_manifest(_make_index(build)),
+    ) == {
+        "datasetFamilies": (["beh2", "h2"], ["lih"]),
+        "assets": ([], ["https://assets/b.png"]),
+    }
+
+
+def _deploy(
+    admin_api: AdminAPI, tmp_path: Path, commit_sha: str, **kwargs: Any
+) -> deploy.DeployResult:
+    build_path = tmp_path / "datasets-build.json"
+
+    return deploy_datasets_build(
+        admin_api.url,
+        build_path,
+        commit_sha,
+        index_path=_index_path(build_path),
+        manifest_path=tmp_path / "deploy-manifest.json",
+        **kwargs,
+    )
+
+
+def test_deploy_delta(admin_api, tmp_path):
+    """Test that a deploy after the first only sends the changes, and that the
+    admin API ends up with the same build."""
+    build_path = _write_build(tmp_path / "datasets-build.json", BUILD)
+
+    result = _deploy(admin_api, tmp_path, "abc", delta=True)
+    assert not result.delta
+    assert admin_api.build == BUILD
+
+    build = copy.deepcopy(BUILD)
+    build["datasetFamilies"]["h2"]["description"] = "Hydrogen"
+    del build["datasetFamilies"]["lih"]
+    build["tags"].append("Molecules")
+    _write_build(build_path, build)
+
+    result = _deploy(admin_api, tmp_path, "def", delta=True)
+    assert (result.delta, result.changed, result.deleted) == (True, 2, 1)
+    assert admin_api.build == build
+    assert [method for method, _ in admin_api.requests] == ["PUT", "PATCH"]
+    assert admin_api.requests[1][1] == result.request_bytes
+
+
+def test_deploy_delta_fallback(admin_api, tmp_path):
+    """Test that the full build is deployed if the admin API rejects a delta
+    because its build has changed."""
+    _write_build(tmp_path / "datasets-build.json", BUILD)
+    _deploy(admin_api, tmp_path, "abc", delta=True)
+
+    admin_api.build = {}
+    result = _deploy(admin_api, tmp_path, "def", delta=True)
+
+    assert not result.delta
+    assert admin_api.build == BUILD
+    assert [method for method, _ in admin_api.requests] == ["PUT", "PATCH", "PUT"]
+
+
+@pytest.mark.parametrize(
+    "admin_api",
+    [{"delta_status": 400}, {"delta_status": 403}, {"delta_status": 404}],
+    indirect=True,
+)
+def test_deploy_delta_unsupported(admin_api, tmp_path):
+    """Test that the full build is deployed if the admin API responds to a delta
+    with an error status."""
+    _write_build(tmp_path / "datasets-build.json", BUILD)
+    _deploy(admin_api, tmp_path, "abc", delta=True)
+
+    result = _deploy(admin_api, tmp_path, "def", delta=True)
+
+    assert not result.delta
+    assert admin_api.build == BUILD
+    assert [method for method, _ in admin_api.requests] == ["PUT", "PATCH", "PUT"]
+
+
+@pytest.mark.parametrize("admin_api", [{"delta_status": 503}], indirect=True)
+def test_deploy_delta_server_error(admin_api, tmp_path):
+    """Test that the full build is deployed if a delta still fails with a 5xx
+    status after retries."""
+    _write_build(tmp_path / "datasets-build.json", BUILD)
+    _deploy(admin_api, tmp_path, "abc", delta=True)
+
+    with patch("dsets.lib.retry.time.sleep"):
+        result = _deploy(admin_api, tmp_path, "def", delta=True)
+
+    assert not result.delta
+    assert [method for method, _ in admin_api.requests] == [
+        "PUT",
+        "PATCH",
+        "PATCH",
+        "PATCH",
+        "PUT",
+    ]
+
+
+def test_deploy_other_url(admin_api, tmp_path):
+    """Test that the full build is deployed if the manifest is from a deploy to
+    a different URL."""
+    manifest_path = tmp_path / "deploy-manifest.json"
+    manifest_path.write_text(
+        json.dumps(
+            {
+                "url": "http://other",
+                "manifest": make_deploy_manifest(_make_index(BUILD)),
+            }
+        ),
+        encoding="utf-8",
+    )
+    _write_build(tmp_path / "datasets-build.json", BUILD)
+
+    result = _deploy(admin_api, tmp_path, "abc", delta=True)
+
+    assert not result.delta
+    assert [method for method, _ in admin_api.requests] == ["PUT"]
+    assert json.loads(manifest_path.read_text("utf-8"))["url"] == admin_api.url
+
+
+def test_deploy_full(admin_api, tmp_path):
+    """Test that the full build is deployed unless ``delta`` is set, and that
+    the manifest is still saved for later delta deploys."""
+    _write_build(tmp_path / "datasets-build.json", BUILD)
+    _deploy(admin_api, tmp_path, "abc")
+
+    result = _deploy(admin_api, tmp_path, "def")
+
+    assert not result.delta
+    assert [method for method, _ in admin_api.requests] == ["PUT", "PUT"]
+    assert (tmp_path / "deploy-manifest.json").exists()
+
+
+def test_deploy_sharded(admin_api, tmp_path):
+    """Test that a sharded build is deployed in full from its documents, and
+    that a delta only sends the documents that changed."""
+    build_dir = _write_sharded_build(tmp_path / "datasets-build", BUILD)
+    manifest_path = tmp_path / "deploy-manifest.json"
+
+    deploy_datasets_build(admin_api.url, build_dir, "abc", manifest_path=manifest_path)
+    assert admin_api.build == BUILD
+
+    build = copy.deepcopy(BUILD)
+    build["datasetFamilies"]["h2"]["description"] = "Hydrogen"
+    _write_sharded_build(build_dir, build)
+    (build_dir / "families" / "lih.json").write_text("not read", encoding="utf-8")
+
+    result = deploy_datasets_build(
+        admin_api.url, build_dir, "def", manifest_path=manifest_path, delta=True
+    )
+
+    assert (result.delta, result.changed, result.deleted) == (True, 1, 0)
+    assert admin_api.build == build
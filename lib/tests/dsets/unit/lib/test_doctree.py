@@ -1,13 +1,17 @@
+import gc
 import json
 from pathlib import Path
 from typing import Any
 
 import pytest
 from dsets.lib.doctree import (
+    Asset,
     Doctree,
     Document,
+    LazyRef,
     Ref,
     Reference,
+    scan_dependencies,
 )
 from pydantic import BaseModel
 
@@ -37,6 +41,12 @@ class RootModel(Document):
     maybe_null: Ref[dict[str, Any]] | None
 
 
+class AssetModel(Document):
+    """A model with an asset."""
+
+    image: Asset
+
+
 @pytest.fixture
 def docpath_root(tmpdir):
     """Document root dir."""
@@ -178,6 +188,74 @@ def test_load_from_path_no_resolve_refs(doctree: Doctree):
     }
 
 
+@pytest.mark.usefixtures("setup_test_docs")
+def test_load_from_path_lazy_refs(doctree: Doctree):
+    """Test that with ``resolve_refs='lazy'``, refs are only resolved when they
+    are used, and that the model is dumped the same as with eager resolution."""
+    root = doctree.docpath_root
+
+    model = RootModel.from_os_path(
+        doctree, root / "models" / "root_model.json", resolve_refs="lazy"
+    )
+
+    assert isinstance(model.about, LazyRef)
+    assert isinstance(model.references["full_ref"], LazyRef)
+    assert isinstance(model.user_list, LazyRef)
+    assert doctree.get_dependencies(root / "models" / "root_model.json") == set()
+
+    assert model.user_list.users == ["A. User", "Foo"]
+    assert model.about == "This is a model!"
+    assert not model.references["full_ref"].is_resolved
+    assert doctree.get_dependencies(root / "models" / "root_model.json") == {
+        root / "models" / "text" / "about.txt",
+        root / "users" / "userlist.json",
+    }
+
+    eager = RootModel.from_os_path(
+        Doctree(root), root / "models" / "root_model.json", resolve_refs=True
+    )
+    assert model.model_dump() == eager.model_dump()
+    assert model.model_dump(mode="json", by_alias=True) == eager.model_dump(
+        mode="json", by_alias=True
+    )
+
+
+@pytest.mark.usefixtures("setup_test_docs")
+def test_lazy_ref_object_cache(doctree: Doctree):
+    """Test that lazy refs to the same document share the resolved object, and
+    that refs in lazily resolved documents are also lazy."""
+    root = doctree.docpath_root
+
+    model = RootModel.from_os_path(
+        doctree, root / "models" / "root_model.json", resolve_refs="lazy"
+    )
+    full_ref = model.references["full_ref"].resolve()
+
+    assert isinstance(full_ref, ReferencedModel)
+    assert isinstance(full_ref.user_list, LazyRef)
+    assert full_ref.meta.resolve() is model.references["inline"].meta.resolve()
+
+
+@pytest.mark.usefixtures("setup_test_docs")
+def test_lazy_then_eager_object_cache(doctree: Doctree):
+    """Test that an eager load of a tree that was loaded lazily resolves every
+    ref, rather than reusing the lazily loaded documents."""
+    root = doctree.docpath_root
+
+    lazy = RootModel.from_os_path(
+        doctree, root / "models" / "root_model.json", resolve_refs="lazy"
+    )
+    lazy.references["full_ref"].resolve()
+
+    eager = RootModel.from_os_path(
+        doctree, root / "models" / "root_model.json", resolve_refs=True
+    )
+
+    assert isinstance(eager.references["full_ref"], ReferencedModel)
+    assert isinstance(eager.references["full_ref"].user_list, UserList)
+    assert not isinstance(eager.references["full_ref"].meta, LazyRef)
+
+
 def test_model_dump_reference():
     """Test that unresolved references can be serialized."""
 
@@ -190,3 +268,188 @@ def test_model_dump_reference():
         "user_list": {"$path": "/a/b/c"},
         "meta": {"$path": "x"},
     }
+
+
+@pytest.mark.usefixtures("setup_test_docs")
+def test_get_dependencies(doctree: Doctree):
+    """Test that the dependencies of a document include documents referenced
+    directly and through other documents."""
+    root = doctree.docpath_root
+
+    RootModel.from_os_path(
+        doctree, root / "models" / "root_model.json", resolve_refs=True
+    )
+
+    assert doctree.get_dependencies(root / "models" / "root_model.json") == {
+        root / "models" / "text" / "about.txt",
+        root / "models" / "referenced_model.json",
+        root / "models" / "meta.json",
+        root / "users" / "userlist.json",
+    }
+    assert doctree.get_dependencies(root / "models" / "referenced_model.json") == {
+        root / "models" / "meta.json",
+        root / "users" / "userlist.json",
+    }
+
+
+@pytest.mark.usefixtures("setup_test_docs")
+def test_get_dependents(doctree: Doctree):
+    """Test that the dependents of a document include documents that reference
+    it directly and through other documents."""
+    root = doctree.docpath_root
+
+    RootModel.from_os_path(
+        doctree, root / "models" / "root_model.json", resolve_refs=True
+    )
+
+    assert doctree.get_dependents(root / "models" / "meta.json") == {
+        root / "models" / "referenced_model.json",
+        root / "models" / "root_model.json",
+    }
+    assert doctree.get_dependents(root / "models" / "root_model.json") == set()
+
+
+@pytest.mark.usefixtures("setup_test_docs")
+def test_get_affected(doctree: Doctree):
+    """Test that ``get_affected()`` returns the changed paths and all
+    documents that depend on them."""
+    root = doctree.docpath_root
+
+    RootModel.from_os_path(
+        doctree, root / "models" / "root_model.json", resolve_refs=True
+    )
+
+    assert doctree.get_affected(
+        [root / "models" / "text" / "about.txt", root / "not_a_document.json"]
+    ) == {
+        root / "models" / "text" / "about.txt",
+        root / "models" / "root_model.json",
+        root / "not_a_document.json",
+    }
+
+
+def test_asset_os_path(doctree: Doctree):
+    """Test that the path of a local asset is resolved relative to its
+    document, without recording a dependency."""
+    with open(doctree.docpath_root / "model.json", "w") as f:
+        json.dump({"image": "images/image.png"}, f)
+
+    model = AssetModel.from_os_path(doctree, doctree.docpath_root / "model.json")
+
+    assert model.image.os_path == doctree.docpath_root / "images" / "image.png"
+    assert doctree.get_dependencies(doctree.docpath_root / "model.json") == set()
+
+
+@pytest.mark.usefixtures("setup_test_docs")
+def test_scan_dependencies(doctree: Doctree):
+    """Test that ``scan_dependencies()`` records the same reference dependencies
+    as loading the document."""
+    root = doctree.docpath_root
+
+    scan_dependencies(doctree, [root / "models" / "root_model.json"])
+
+    assert doctree.get_dependencies(root / "models" / "root_model.json") == {
+        root / "models" / "text" / "about.txt",
+        root / "models" / "referenced_model.json",
+        root / "models" / "meta.json",
+        root / "users" / "userlist.json",
+    }
+
+
+def test_scan_dependencies_asset(doctree: Doctree):
+    """Test that ``scan_dependencies()`` records strings that resolve to one of
+    ``asset_paths`` as dependencies."""
+    with open(doctree.docpath_root / "model.json", "w") as f:
+        json.dump({"image": "images/image.png", "other": "other.png"}, f)
+
+    scan_dependencies(
+        doctree,
+        [doctree.docpath_root / "model.json"],
+        asset_paths=[
+            doctree.docpath_root / "images" / "image.png",
+            doctree.docpath_root / "image.png",
+        ],
+    )
+
+    assert doctree.get_dependencies(doctree.docpath_root / "model.json") == {
+        doctree.docpath_root / "images" / "image.png"
+    }
+
+
+def test_object_cache_eviction(docpath_root: Path):
+    """Test that the object cache evicts the least recently used object once it
+    holds ``max_cached_objects``."""
+    doctree = Doctree(docpath_root, max_cached_objects=2)
+    a, b, c = (docpath_root / name for name in ("a.txt", "b.txt", "c.txt"))
+
+    doctree.object_cache_update(a, str, "a")
+    doctree.object_cache_update(b, str, "b")
+    assert doctree.object_cache_get(a, str) == "a"
+    doctree.object_cache_update(c, str, "c")
+
+    assert doctree.object_cache_get(a, str) == "a"
+    assert doctree.object_cache_get(b, str) is None
+    assert doctree.object_cache_get(c, str) == "c"
+
+
+@pytest.mark.usefixtures("setup_test_docs")
+def test_invalidate(doctree: Doctree):
+    """Test that ``invalidate()`` removes cached objects for the changed files
+    and the documents that reference them."""
+    root = doctree.docpath_root
+    model = RootModel.from_os_path(
+        doctree, root / "models" / "root_model.json", resolve_refs=True
+    )
+
+    affected = doctree.invalidate([root / "models" / "meta.json"])
+
+    assert affected == {
+        root / "models" / "meta.json",
+        root / "models" / "referenced_model.json",
+        root / "models" / "root_model.json",
+    }
+    assert (
+        doctree.object_cache_get(root / "models" / "meta.json", dict[str, Any]) is None
+    )
+    assert (
+        doctree.object_cache_get(
+            root / "models" / "referenced_model.json", ReferencedModel
+        )
+        is None
+    )
+    assert (
+        doctree.object_cache_get(root / "users" / "userlist.json", UserList)
+        is model.user_list
+    )
+
+
+@pytest.mark.usefixtures("setup_test_docs")
+def test_get_objects_weak(docpath_root: Path):
+    """Test that objects registered in the tree can be garbage collected."""
+    doctree = Doctree(docpath_root, tracked_types=[RootModel])
+    root = doctree.docpath_root
+    model = RootModel.from_os_path(
+        doctree, root / "models" / "root_model.json", resolve_refs=False
+    )
+
+    assert doctree.get_objects(RootModel) == [model]
+
+    del model
+    gc.collect()
+
+    assert doctree.get_objects(RootModel) == []
+
+
+@pytest.mark.usefixtures("setup_test_docs")
+def test_get_objects_untracked(docpath_root: Path):
+    """Test that only objects of ``tracked_types`` are registered."""
+    doctree = Doctree(docpath_root, tracked_types=[ReferencedModel])
+    root = doctree.docpath_root
+    model = RootModel.from_os_path(
+        doctree, root / "models" / "root_model.json", resolve_refs=True
+    )
+
+    assert doctree.get_objects(ReferencedModel) == list(model.references.values())
+    assert list(doctree._objects) == [ReferencedModel]
+    with pytest.raises(ValueError, match="not tracked"):
+        doctree.get_objects(RootModel)
@@ -1,7 +1,11 @@
+import hashlib
+import os
+import pickle
 from pathlib import Path
+from unittest.mock import patch
 
 import pytest
-from dsets.lib.file_hash import file_sha1_hash
+from dsets.lib.file_hash import DigestCache, file_digests, file_sha1_hash
 
 
 @pytest.mark.parametrize("chunk_size", [1, 16])
@@ -15,3 +19,96 @@ def test_file_sha1_hash(tmp_path: Path, chunk_size):
         file_sha1_hash(tmp_path / "file.txt", chunk_size=chunk_size).hex()
         == "14f3995288acd189e6e50a7af47ee7099aa682b9"
     )
+
+
+@pytest.mark.parametrize("chunk_size", [1, 5, 4096])
+def test_file_digests(tmp_path: Path, chunk_size):
+    """Test that `file_digests()` returns the same digests as `hashlib`
+    for every algorithm, and reports progress for every byte read."""
+    content = bytes(range(256)) * 4
+    (tmp_path / "file.bin").write_bytes(content)
+    progress = []
+
+    digests = file_digests(
+        tmp_path / "file.bin",
+        ["sha1", "sha256", "md5"],
+        chunk_size=chunk_size,
+        progress_cb=progress.append,
+    )
+
+    assert digests == {
+        algorithm: hashlib.new(algorithm, content).digest()
+        for algorithm in ("sha1", "sha256", "md5")
+    }
+    assert sum(progress) == len(content)
+
+
+class TestDigestCache:
+    """Tests for `DigestCache`."""
+
+    @pytest.fixture
+    def cache(self, tmp_path: Path) -> DigestCache:
+        return DigestCache(tmp_path / "cache" / "digests.sqlite")
+
+    @pytest.fixture
+    def path(self, tmp_path: Path) -> Path:
+        path = tmp_path / "file.txt"
+        path.write_bytes(b"abcdefghijklmnop")
+        _set_mtime(path, 10**18)
+
+        return path
+
+    def test_cached(self, cache: DigestCache, path: Path):
+        """Test that digests of an unchanged file are returned from the cache,
+        without reading the file."""
+        expected = file_digests(path, ["sha1", "sha256"], cache=cache)
+
+        with patch("dsets.lib.file_hash.hashlib.new") as hash_new:
+            assert file_digests(path, ["sha1", "sha256"], cache=cache) == expected
+
+        hash_new.assert_not_called()
+
+    def test_partially_cached(self, cache: DigestCache, path: Path):
+        """Test that only digests missing from the cache are computed."""
+        file_sha1_hash(path, cache=cache)
+
+        with patch(
+            "dsets.lib.file_hash.hashlib.new", side_effect=hashlib.new
+        ) as hash_new:
+            digests = file_digests(path, ["sha1", "sha256"], cache=cache)
+
+        assert digests == {
+            "sha1": hashlib.sha1(b"abcdefghijklmnop").digest(),
+            "sha256": hashlib.sha256(b"abcdefghijklmnop").digest(),
+        }
+        assert [call.args[0] for call in hash_new.call_args_list] == ["sha256"]
+
+    def test_changed(self, cache: DigestCache, path: Path):
+        """Test that a file whose modification time has changed is hashed
+        again."""
+        file_sha1_hash(path, cache=cache)
+        path.write_bytes(b"abcdefghijklmnoq")
+        _set_mtime(path, 10**18 + 1)
+
+        assert (
+            file_sha1_hash(path, cache=cache)
+            == hashlib.sha1(b"abcdefghijklmnoq").digest()
+        )
+
+    def test_recently_modified(self, cache: DigestCache, path: Path):
+        """Test that digests of a recently modified file are not cached."""
+        path.write_bytes(b"abcdefghijklmnop")
+        file_sha1_hash(path, cache=cache)
+
+        assert cache.get(path.stat(), "sha1") is None
+
+    def test_pickle(self, cache: DigestCache, path: Path):
+        """Test that a cache can be pickled after it has been used, and
+        shares entries with the original."""
+        digest = file_sha1_hash(path, cache=cache)
+
+        assert pickle.loads(pickle.dumps(cache)).get(path.stat(), "sha1") == digest
+
+
+def _set_mtime(path: Path, mtime_ns: int) -> None:
+    os.utime(path, ns=(mtime_ns, mtime_ns))
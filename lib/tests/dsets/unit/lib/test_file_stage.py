@@ -0,0 +1,68 @@
+import os
+from contextlib import nullcontext
+from pathlib import Path
+from unittest.mock import patch
+
+import pytest
+from dsets.lib.file_stage import stage_file
+
+
+@pytest.fixture
+def src(tmp_path: Path) -> Path:
+    path = tmp_path / "src.txt"
+    path.write_text("abcdefghijklmnop", encoding="utf-8")
+    path.chmod(0o640)
+
+    return path
+
+
+def test_stage_file_link(src: Path, tmp_path: Path):
+    """Test that ``stage_file(link=True)`` creates a hard link."""
+    dest = tmp_path / "dest.txt"
+
+    stage_file(src, dest, link=True)
+
+    assert os.path.samefile(src, dest)
+
+
+def test_stage_file_link_exists(src: Path, tmp_path: Path):
+    """Test that staging a hard link that already exists succeeds."""
+    dest = tmp_path / "dest.txt"
+    os.link(src, dest)
+
+    stage_file(src, dest, link=True)
+
+    assert os.path.samefile(src, dest)
+
+
+def test_stage_file_link_fallback(src: Path, tmp_path: Path):
+    """Test that the file is copied if it cannot be hard linked."""
+    dest = tmp_path / "dest.txt"
+
+    with patch("dsets.lib.file_stage.os.link", side_effect=OSError("EXDEV")):
+        stage_file(src, dest, link=True)
+
+    assert not os.path.samefile(src, dest)
+    assert dest.read_text(encoding="utf-8") == "abcdefghijklmnop"
+
+
+@pytest.mark.parametrize("reflink_supported", [True, False])
+def test_stage_file_copy(src: Path, tmp_path: Path, reflink_supported):
+    """Test that ``stage_file()`` replaces ``dest`` with a copy of ``src``,
+    with the same permissions, and leaves no temporary files behind. If
+    ``reflink_supported`` is True, the filesystem is used as it is, which
+    may or may not support reflinks."""
+    dest = tmp_path / "dest.txt"
+    dest.write_text("old", encoding="utf-8")
+
+    with (
+        nullcontext()
+        if reflink_supported
+        else patch("dsets.lib.file_stage._reflink", return_value=False)
+    ):
+        stage_file(src, dest)
+
+    assert not os.path.samefile(src, dest)
+    assert dest.read_text(encoding="utf-8") == "abcdefghijklmnop"
+    assert dest.stat().st_mode & 0o777 == 0o640
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["dest.txt", "src.txt"]
@@ -0,0 +1,100 @@
+import threading
+import time
+from pathlib import Path
+
+import pytest
+from dsets.lib import fs_watch
+
+
+@pytest.fixture(params=["inotify", "poll"])
+def source(request, tmp_path: Path):
+    """Change source fixture, for each available source."""
+    (tmp_path / "a.txt").write_text("a")
+
+    if request.param == "inotify":
+        if not fs_watch._inotify_available():
+            pytest.skip("inotify is not available")
+
+        with fs_watch._InotifySource(tmp_path) as source:
+            yield source
+    else:
+        with fs_watch._PollingSource(tmp_path, interval=0.01) as source:
+            yield source
+
+
+def test_source_read(source, tmp_path: Path):
+    """Test that modified, created and deleted files are reported, including
+    files in new directories."""
+    (tmp_path / "a.txt").write_text("aa")
+    (tmp_path / "b.txt").write_text("b")
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "c.txt").write_text("c")
+
+    assert source.read(timeout=1) == {
+        tmp_path / "a.txt",
+        tmp_path / "b.txt",
+        tmp_path / "sub" / "c.txt",
+    }
+
+    (tmp_path / "a.txt").unlink()
+    (tmp_path / "sub" / "d.txt").write_text("d")
+
+    assert source.read(timeout=1) == {tmp_path / "a.txt", tmp_path / "sub" / "d.txt"}
+
+
+@pytest.mark.parametrize("destination", ["sub2", None])
+def test_source_read_move_directory(
+    source, tmp_path_factory, tmp_path: Path, destination
+):
+    """Test that the files under a directory are reported when it is moved
+    within the tree, or moved out of it."""
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "sub" / "c.txt").write_text("c")
+    source.read(timeout=1)
+
+    if destination:
+        moved = tmp_path / destination
+        expected = {tmp_path / "sub" / "c.txt", moved / "c.txt"}
+    else:
+        moved = tmp_path_factory.mktemp("outside") / "sub"
+        expected = {tmp_path / "sub" / "c.txt"}
+
+    (tmp_path / "sub").rename(moved)
+
+    assert source.read(timeout=1) == expected
+
+    (moved / "c.txt").write_text("cc")
+
+    assert source.read(timeout=0.1) == (expected - {tmp_path / "sub" / "c.txt"})
+
+
+def test_source_read_timeout(source):
+    """Test that ``read()`` returns an empty set if nothing changes."""
+    assert source.read(timeout=0.05) == set()
+
+
+@pytest.mark.parametrize("poll", [False, True])
+def test_watch_debounce(tmp_path: Path, poll: bool):
+    """Test that a burst of changes is yielded as a single set."""
+    if not poll and not fs_watch._inotify_available():
+        pytest.skip("inotify is not available")
+
+    changes = fs_watch.watch(tmp_path, debounce=0.2, poll=poll, poll_interval=0.01)
+
+    def write_files():
+        time.sleep(0.1)
+        for name in ("a.txt", "b.txt", "c.txt"):
+            (tmp_path / name).write_text(name)
+            time.sleep(0.02)
+
+    thread = threading.Thread(target=write_files)
+    thread.start()
+    try:
+        assert next(changes) == {
+            tmp_path / "a.txt",
+            tmp_path / "b.txt",
+            tmp_path / "c.txt",
+        }
+    finally:
+        thread.join()
+        changes.close()
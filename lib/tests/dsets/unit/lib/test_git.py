@@ -0,0 +1,61 @@
+from pathlib import Path
+
+import pytest
+from dsets.lib.git import changed_paths
+from dulwich import porcelain
+from dulwich.repo import Repo
+
+
+def _commit(repo: Repo, files: dict[str, str], message: bytes) -> None:
+    for name, content in files.items():
+        path = Path(repo.path, name)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content, encoding="utf-8")
+
+    porcelain.add(repo, [str(Path(repo.path, name)) for name in files])
+    porcelain.commit(
+        repo, message, author=b"A <a@example.com>", committer=b"A <a@example.com>"
+    )
+
+
+@pytest.fixture
+def repo(tmp_path: Path) -> Repo:
+    """Repo with a 'main' branch, and one commit on top of it."""
+    repo = porcelain.init(str(tmp_path))
+    _commit(repo, {"a.txt": "a", "dir/b.txt": "b", "dir/c.txt": "c"}, b"Initial")
+    porcelain.branch_create(repo, "main")
+    _commit(repo, {"dir/b.txt": "b2"}, b"Change b")
+
+    return repo
+
+
+def test_changed_paths_committed(repo: Repo):
+    """Test that files changed in commits since the base ref are returned."""
+    assert changed_paths(repo, "main") == {Path(repo.path, "dir", "b.txt")}
+
+
+def test_changed_paths_working_tree(repo: Repo):
+    """Test that staged, unstaged and untracked files are returned."""
+    root = Path(repo.path)
+    (root / "dir" / "c.txt").write_text("c2", encoding="utf-8")
+    (root / "new.txt").write_text("new", encoding="utf-8")
+    (root / "staged.txt").write_text("staged", encoding="utf-8")
+    porcelain.add(repo, [str(root / "staged.txt")])
+
+    assert changed_paths(repo, "main") == {
+        root / "dir" / "b.txt",
+        root / "dir" / "c.txt",
+        root / "new.txt",
+        root / "staged.txt",
+    }
+
+
+def test_changed_paths_merge_base(repo: Repo):
+    """Test that commits on the base ref after the merge base are not
+    considered changes."""
+    branch = porcelain.active_branch(repo)
+    porcelain.checkout_branch(repo, "main")
+    _commit(repo, {"a.txt": "a2"}, b"Change a")
+    porcelain.checkout_branch(repo, branch)
+
+    assert changed_paths(repo, "main") == {Path(repo.path, "dir", "b.txt")}
@@ -0,0 +1,196 @@
+import io
+import threading
+from collections.abc import Iterator
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+import pytest
+from dsets.lib.graphql import files, queries
+from dsets.lib.upload_journal import UploadJournal
+
+
+class PartServer(ThreadingHTTPServer):
+    """Local stand-in for presigned part upload URLs. Stores the body of each
+    'PUT /parts/<n>' request, and fails the first ``fail_count`` requests."""
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), PartHandler)
+        self.parts: dict[int, bytes] = {}
+        self.fail_count = 0
+        self.lock = threading.Lock()
+
+    def part_url(self, number: int) -> str:
+        return f"http://127.0.0.1:{self.server_address[1]}/parts/{number}"
+
+
+class PartHandler(BaseHTTPRequestHandler):
+    server: PartServer
+
+    def do_PUT(self):
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        with self.server.lock:
+            fail = self.server.fail_count > 0
+            self.server.fail_count -= 1
+            if not fail:
+                self.server.parts[int(self.path.rsplit("/", 1)[1])] = body
+
+        self.send_response(500 if fail else 200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def part_server() -> Iterator[PartServer]:
+    server = PartServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    yield server
+
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def data_file(tmp_path: Path) -> Path:
+    path = tmp_path / "data.h5"
+    path.write_bytes(bytes(range(256)) * 1000)
+
+    return path
+
+
+def _parts(server: PartServer, size: int, part_size: int) -> list:
+    return [
+        {
+            "url": server.part_url(number),
+            "bytesStart": str(start),
+            "bytesEnd": str(min(start + part_size, size)),
+        }
+        for number, start in enumerate(range(0, size, part_size))
+    ]
+
+
+@pytest.mark.parametrize("in_memory", [False, True])
+def test_iter_upload_parts(part_server: PartServer, data_file: Path, in_memory):
+    """Test that every part is uploaded with the bytes of its range, from
+    both file and in-memory streams."""
+    data = data_file.read_bytes()
+    parts = _parts(part_server, len(data), 30_000)
+
+    with (
+        io.BytesIO(data) if in_memory else open(data_file, "rb") as f,
+        files._make_session(3) as session,
+    ):
+        uploaded = list(files.iter_upload_parts(session, f, parts, max_workers=3))
+
+    assert sorted(part["url"] for part in uploaded) == [part["url"] for part in parts]
+    assert b"".join(part_server.parts[i] for i in range(len(parts))) == data
+
+
+def test_iter_upload_parts_retry(part_server: PartServer, data_file: Path):
+    """Test that failed parts are retried."""
+    data = data_file.read_bytes()
+    parts = _parts(part_server, len(data), 100_000)
+    part_server.fail_count = 2
+
+    with (
+        open(data_file, "rb") as f,
+        files._make_session(1) as session,
+        patch("dsets.lib.retry.time.sleep"),
+    ):
+        list(files.iter_upload_parts(session, f, parts, max_workers=1))
+
+    assert b"".join(part_server.parts[i] for i in range(len(parts))) == data
+
+
+def test_iter_upload_parts_failed(part_server: PartServer, data_file: Path):
+    """Test that an error is raised if a part fails on every attempt."""
+    parts = _parts(part_server, data_file.stat().st_size, 100_000)
+    part_server.fail_count = 10
+
+    with (
+        open(data_file, "rb") as f,
+        files._make_session(1) as session,
+        patch("dsets.lib.retry.time.sleep"),
+        pytest.raises(files.requests.HTTPError),
+    ):
+        list(files.iter_upload_parts(session, f, parts, max_workers=1, attempts=2))
+
+
+def _mock_client(uploads: list, file: dict) -> MagicMock:
+    """Mock GraphQL client, which returns each of ``uploads`` in turn as
+    the pending upload."""
+
+    def execute(query, variables=None, **kwargs):
+        if query is queries.UPLOAD_CREATE:
+            return {"datasetFileUploadCreate": {}}
+        if query is queries.UPLOAD_GET:
+            return {"datasetFileUpload": uploads.pop(0)}
+        if query is queries.FILE_GET:
+            return {"datasetFile": file}
+
+        raise AssertionError(query)
+
+    return MagicMock(execute=MagicMock(side_effect=execute))
+
+
+def test_upload_file(part_server: PartServer, data_file: Path):
+    """Test that ``upload_file()`` uploads all parts returned by the API, and
+    reports the progress of each part."""
+    data = data_file.read_bytes()
+    parts = _parts(part_server, len(data), 64_000)
+    file = {"name": "data.h5", "status": "UPLOADED"}
+    client = _mock_client(
+        [
+            {"numParts": len(parts), "numUploadedParts": 0, "uploadParts": parts[:2]},
+            {"numParts": len(parts), "numUploadedParts": 2, "uploadParts": parts[2:]},
+            None,
+        ],
+        file,
+    )
+    callback = MagicMock()
+
+    with open(data_file, "rb") as f:
+        result = files.upload_file(
+            client, f, "data.h5", len(data), b"", callback=callback, max_workers=2
+        )
+
+    assert result == file
+    assert b"".join(part_server.parts[i] for i in range(len(parts))) == data
+    assert sum(call.args[0] for call in callback.call_args_list) == len(data)
+
+
+def test_upload_file_resume(part_server: PartServer, data_file: Path, tmp_path):
+    """Test that ``upload_file()`` resumes an upload recorded in the journal,
+    without creating a new upload or uploading parts again, and removes the
+    journal entry when the upload completes."""
+    data = data_file.read_bytes()
+    parts = _parts(part_server, len(data), 64_000)
+    pending = {"numParts": len(parts), "numUploadedParts": 1, "uploadParts": parts}
+    client = _mock_client([pending, pending, None], {"name": "data.h5"})
+
+    journal_path = tmp_path / ".upload-journal.json"
+    journal = UploadJournal(journal_path, "data.h5", data_file, len(data), b"\x01")
+    journal.start()
+    journal.add_part(0, 64_000)
+    journal = UploadJournal(journal_path, "data.h5", data_file, len(data), b"\x01")
+    callback = MagicMock()
+
+    with open(data_file, "rb") as f:
+        files.upload_file(
+            client, f, "data.h5", len(data), b"\x01", callback, journal=journal
+        )
+
+    assert 0 not in part_server.parts
+    assert set(part_server.parts) == set(range(1, len(parts)))
+    assert sum(call.args[0] for call in callback.call_args_list) == len(data)
+    assert queries.UPLOAD_CREATE not in [
+        call.args[0] for call in client.execute.call_args_list
+    ]
+    assert not UploadJournal(
+        journal_path, "data.h5", data_file, len(data), b"\x01"
+    ).resumable
@@ -0,0 +1,63 @@
+import io
+import json
+
+import pytest
+from dsets.lib.json_stream import JSONObjectWriter
+
+DOCUMENT = {
+    "a": 1,
+    "b": {"c": [1, {"d": "e\nf"}], "g": {}},
+    "h": {},
+    "i": [],
+}
+
+
+def _write(f: io.StringIO, indent: int | None) -> None:
+    with JSONObjectWriter(f, indent=indent) as root:
+        root.write("a", DOCUMENT["a"])
+        with root.object("b") as b:
+            for key, value in DOCUMENT["b"].items():
+                b.write(key, value)
+
+        with root.object("h"):
+            pass
+
+        root.write("i", DOCUMENT["i"])
+
+
+@pytest.mark.parametrize("indent", [2, 4])
+def test_json_object_writer_indent(indent):
+    """Test that the output matches ``json.dumps()`` with the same indent."""
+    f = io.StringIO()
+    _write(f, indent)
+
+    assert f.getvalue() == json.dumps(DOCUMENT, indent=indent)
+
+
+def test_json_object_writer_compact():
+    """Test that the output has no whitespace if ``indent`` is None."""
+    f = io.StringIO()
+    _write(f, None)
+
+    assert f.getvalue() == json.dumps(DOCUMENT, separators=(",", ":"))
+
+
+@pytest.mark.parametrize("indent", [None, 2])
+def test_json_object_writer_copy(indent):
+    """Test that an object written to another stream at ``level`` 1 can be
+    copied into the output."""
+    b = io.StringIO()
+    with JSONObjectWriter(b, indent=indent, level=1) as b_writer:
+        for key, value in DOCUMENT["b"].items():
+            b_writer.write(key, value)
+
+    b.seek(0)
+    f = io.StringIO()
+    with JSONObjectWriter(f, indent=indent) as root:
+        root.write("a", DOCUMENT["a"])
+        root.copy("b", b)
+        root.write("h", DOCUMENT["h"])
+        root.write("i", DOCUMENT["i"])
+
+    separators = (",", ":") if indent is None else None
+    assert f.getvalue() == json.dumps(DOCUMENT, indent=indent, separators=separators)
@@ -0,0 +1,77 @@
+import json
+from unittest.mock import patch
+
+from dsets.lib import profiling
+from dsets.lib.profiling import Profiler
+
+
+def test_profiler_span():
+    """Test that nested spans are timed, and that the time of a span excludes
+    the spans nested in it from its self time."""
+    with patch("dsets.lib.profiling.time.perf_counter", side_effect=[0, 1, 2, 3, 5]):
+        profiler = Profiler()
+        with profiler.span("outer"):
+            with profiler.span("inner"):
+                pass
+
+    assert profiler.phases["outer"] == profiling.PhaseStats(1, 4, 3)
+    assert profiler.phases["inner"] == profiling.PhaseStats(1, 1, 1)
+
+
+def test_profiler_scope():
+    """Test that counts are added to the totals and to each enclosing scope."""
+    profiler = Profiler()
+
+    with profiling.use_profiler(profiler):
+        profiling.count("files_read")
+        with profiling.scope("compile_family", "foo/dataset.json"):
+            profiling.count("files_read", 2)
+            with profiling.scope("resolve_reference", "/foo/class.json"):
+                profiling.count("object_cache_hits")
+
+    report = profiler.report()
+
+    assert report["counters"] == {"files_read": 3, "object_cache_hits": 1}
+    assert report["scopes"]["compile_family"]["foo/dataset.json"]["counters"] == {
+        "files_read": 2,
+        "object_cache_hits": 1,
+    }
+    assert report["scopes"]["resolve_reference"]["/foo/class.json"]["counters"] == {
+        "object_cache_hits": 1
+    }
+    assert report["phases"]["compile_family"]["count"] == 1
+
+
+def test_profiler_not_in_use():
+    """Test that spans and counts are ignored when no profiler is in use."""
+    profiler = Profiler()
+
+    with profiling.use_profiler(profiler):
+        pass
+
+    with profiling.span("validate"):
+        profiling.count("files_read")
+
+    assert profiler.phases == {}
+    assert profiler.counters == {}
+
+
+def test_profiler_write_trace(tmp_path):
+    """Test that each span is written as a complete trace event."""
+    profiler = Profiler(trace=True)
+    with profiler.scope("compile_family", "foo/dataset.json"):
+        with profiler.span("validate"):
+            pass
+
+    profiler.write_trace(tmp_path / "trace.json")
+
+    with open(tmp_path / "trace.json", "r", encoding="utf-8") as f:
+        events = json.load(f)["traceEvents"]
+
+    assert [(event["name"], event["ph"]) for event in events] == [
+        ("validate", "X"),
+        ("compile_family", "X"),
+    ]
+    assert events[1]["args"] == {"key": "foo/dataset.json"}
+    assert events[1]["ts"] <= events[0]["ts"]
+    assert events[1]["dur"] >= events[0]["dur"]
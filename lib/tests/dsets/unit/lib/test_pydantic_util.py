@@ -0,0 +1,51 @@
+from typing import Annotated, Union
+
+import pytest
+from dsets.lib.doctree import Ref, Reference
+from dsets.lib.pydantic_util import TypeAdapterRegistry
+from pydantic import BaseModel
+
+
+class Model(BaseModel):
+    x: int
+
+
+@pytest.fixture
+def registry():
+    return TypeAdapterRegistry()
+
+
+@pytest.mark.parametrize(
+    "type_", [int, Model, list[Model], Reference[Model], Ref[Model], Ref[str]]
+)
+def test_type_adapter_registry(registry, type_):
+    """Test that the registry builds one adapter per type, including
+    parametrized generics."""
+    adapter = registry.get(type_)
+
+    assert registry.get(type_) is adapter
+    assert (registry.builds, registry.hits) == (1, 1)
+
+
+def test_type_adapter_registry_union_order(registry):
+    """Test that unions with the same members in a different order do not
+    share an adapter."""
+    assert registry.get(Union[int, str]) is not registry.get(Union[str, int])
+    assert registry.builds == 2
+
+
+def test_type_adapter_registry_unhashable(registry):
+    """Test that a type that cannot be hashed gets a new adapter."""
+    type_ = Annotated[int, {"unhashable": []}]
+
+    assert registry.get(type_).validate_python(1) == 1
+    assert registry.get(type_) is not registry.get(type_)
+
+
+def test_type_adapter_registry_clear(registry):
+    """Test that ``clear()`` removes cached adapters and resets the counters."""
+    adapter = registry.get(int)
+    registry.clear()
+
+    assert (registry.builds, registry.hits) == (0, 0)
+    assert registry.get(int) is not adapter
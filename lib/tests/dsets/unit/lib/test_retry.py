@@ -0,0 +1,38 @@
+from unittest.mock import MagicMock, patch
+
+import pytest
+from dsets.lib.retry import call_with_retries
+
+
+@pytest.fixture(autouse=True)
+def mock_sleep():
+    with patch("dsets.lib.retry.time.sleep") as mock_sleep:
+        yield mock_sleep
+
+
+def test_call_with_retries(mock_sleep):
+    """Test that ``call_with_retries()`` retries until the call succeeds,
+    with exponential backoff."""
+    func = MagicMock(side_effect=[OSError(), OSError(), "result"])
+
+    assert call_with_retries(func, (OSError,), 1, attempts=3, backoff=0.5) == "result"
+    func.assert_called_with(1)
+    assert [call.args[0] for call in mock_sleep.call_args_list] == [0.5, 1.0]
+
+
+def test_call_with_retries_exhausted():
+    """Test that the last error is raised if all attempts fail."""
+    func = MagicMock(side_effect=[OSError("1"), OSError("2")])
+
+    with pytest.raises(OSError, match="2"):
+        call_with_retries(func, (OSError,), attempts=2)
+
+
+def test_call_with_retries_not_retried():
+    """Test that errors not in ``retry_on`` are raised immediately."""
+    func = MagicMock(side_effect=ValueError())
+
+    with pytest.raises(ValueError):
+        call_with_retries(func, (OSError,))
+
+    assert func.call_count == 1
@@ -1,3 +1,4 @@
+import os
 import re
 from collections.abc import Iterator
 from datetime import datetime, timezone
@@ -7,7 +8,14 @@ from unittest.mock import MagicMock, patch
 import boto3
 import moto
 import pytest
-from dsets.lib.s3 import S3Client, S3DatasetRepo, S3Path, object_exists
+from dsets.lib.file_hash import DigestCache
+from dsets.lib.s3 import (
+    S3Client,
+    S3DatasetRepo,
+    S3Path,
+    list_keys,
+    object_exists,
+)
 
 
 @pytest.fixture
@@ -57,6 +65,18 @@ def test_object_exists_not_exists(s3_client: S3Client, s3_bucket: str):
     assert object_exists(s3_client, s3_bucket, S3Path("not", "a", "path")) is False
 
 
+def test_list_keys(s3_client: S3Client, s3_bucket: str):
+    """Test that `list_keys()` returns the keys of all objects under
+    ``prefix``, and no others."""
+    for key in ("assets/a", "assets/b", "assets-other/c", "d"):
+        s3_client.put_object(Bucket=s3_bucket, Key=key)
+
+    assert list_keys(s3_client, s3_bucket, S3Path("assets")) == {
+        S3Path("assets/a"),
+        S3Path("assets/b"),
+    }
+
+
 class TestS3DatasetRepo:
     """Tests for `S3DatasetRepo`."""
 
@@ -96,6 +116,25 @@ class TestS3DatasetRepo:
         assert s3_repo.upload_file(file_path) == s3_path
         assert s3_repo.get_obj_with_hash(bytes.fromhex(content_hash)) == s3_path
 
+    @patch("dsets.lib.s3.utcnow")
+    def test_upload_file_digest_cache(
+        self, utcnow: MagicMock, s3_repo: S3DatasetRepo, tmpdir: Path
+    ):
+        """Test that `upload_file()` hashes the file through the repo's
+        digest cache."""
+        utcnow.return_value = datetime(2000, 1, 2, 3, 4, 5, 6, tzinfo=timezone.utc)
+        file_path = Path(tmpdir / "file.data")
+        file_path.write_text("abcdefghijklmnop", encoding="utf-8")
+        # Files modified in the last few seconds are not cached
+        os.utime(file_path, (946684800, 946684800))
+        s3_repo.digest_cache = DigestCache(Path(tmpdir / "digests.sqlite"))
+
+        s3_repo.upload_file(file_path)
+
+        assert s3_repo.digest_cache.get(file_path.stat(), "sha1") == bytes.fromhex(
+            "14f3995288acd189e6e50a7af47ee7099aa682b9"
+        )
+
     @patch("dsets.lib.s3.utcnow")
     def test_upload_file_content_exists(
         self, utcnow: MagicMock, s3_repo: S3DatasetRepo, tmpdir: Path
@@ -0,0 +1,66 @@
+from pathlib import Path
+
+import pytest
+from dsets.lib.upload_journal import UploadJournal
+
+
+@pytest.fixture
+def journal_path(tmp_path: Path) -> Path:
+    return tmp_path / ".upload-journal.json"
+
+
+@pytest.fixture
+def data_file(tmp_path: Path) -> Path:
+    path = tmp_path / "data.h5"
+    path.write_bytes(b"abcdefghij")
+
+    return path
+
+
+def test_resumable(journal_path, data_file):
+    """Test that an upload of the same file is resumable, with the parts
+    recorded by the previous run."""
+    journal = UploadJournal(journal_path, "data.h5", data_file, 10, b"\x01")
+    journal.start()
+    journal.add_part(0, 5)
+
+    journal = UploadJournal(journal_path, "data.h5", data_file, 10, b"\x01")
+
+    assert journal.resumable
+    assert journal.uploaded_parts == {(0, 5)}
+
+
+@pytest.mark.parametrize("size, checksum", [(11, b"\x01"), (10, b"\x02")])
+def test_not_resumable_changed(journal_path, data_file, size, checksum):
+    """Test that an upload is not resumable if the file has changed."""
+    journal = UploadJournal(journal_path, "data.h5", data_file, 10, b"\x01")
+    journal.start()
+    journal.add_part(0, 5)
+
+    journal = UploadJournal(journal_path, "data.h5", data_file, size, checksum)
+
+    assert not journal.resumable
+    assert journal.uploaded_parts == set()
+
+
+def test_remove(journal_path, data_file):
+    """Test that ``remove()`` only removes the entry for its upload."""
+    journal = UploadJournal(journal_path, "data.h5", data_file, 10, b"\x01")
+    other = UploadJournal(journal_path, "other.h5", data_file, 10, b"\x01")
+    journal.start()
+    other.start()
+
+    journal.remove()
+
+    assert not UploadJournal(journal_path, "data.h5", data_file, 10, b"\x01").resumable
+    assert UploadJournal(journal_path, "other.h5", data_file, 10, b"\x01").resumable
+
+
+def test_invalid_journal(journal_path, data_file):
+    """Test that an invalid journal file is ignored."""
+    journal_path.write_text("not json", encoding="utf-8")
+
+    journal = UploadJournal(journal_path, "data.h5", data_file, 10, b"\x01")
+    journal.start()
+
+    assert UploadJournal(journal_path, "data.h5", data_file, 10, b"\x01").resumable
@@ -0,0 +1,82 @@
+import pydantic
+import pytest
+from dsets.schemas import Dataset, DatasetTable
+
+TABLE = {
+    "dataUrl": ["https://datasets.com/0.h5", "https://datasets.com/1.h5"],
+    "parameters": {"molname": ["H2", "H2"], "bondlength": ["0.5", None]},
+    "extra": [{"terms": "Z0"}, {}],
+}
+
+
+class TestDatasetTable:
+    """Tests for `DatasetTable`."""
+
+    def test_validate(self):
+        """Test that a table validates from its JSON form."""
+        table = DatasetTable.model_validate(TABLE)
+
+        assert len(table) == 2
+        assert list(table.iter_rows()) == [
+            ("https://datasets.com/0.h5", {"molname": "H2", "bondlength": "0.5"}),
+            ("https://datasets.com/1.h5", {"molname": "H2"}),
+        ]
+
+    def test_model_dump_rows(self):
+        """Test that a table is dumped in the same form as a list of
+        ``Dataset``."""
+        rows = [
+            Dataset(
+                data_url="https://datasets.com/0.h5",
+                parameters={"molname": "H2", "bondlength": "0.5"},
+                extra={"terms": "Z0"},
+            ),
+            Dataset(data_url="https://datasets.com/1.h5", parameters={"molname": "H2"}),
+        ]
+
+        assert DatasetTable.model_validate(TABLE).model_dump(
+            mode="json", by_alias=True
+        ) == [row.model_dump(mode="json", by_alias=True) for row in rows]
+
+    def test_model_dump_columns(self):
+        """Test that a table is dumped as columns if the context has
+        'columnar' set."""
+        table = DatasetTable.model_validate(TABLE)
+
+        assert (
+            table.model_dump(mode="json", by_alias=True, context={"columnar": True})
+            == TABLE
+        )
+
+    def test_append(self):
+        """Test that appended datasets keep the table's columnar shape, with a
+        new column for a new parameter."""
+        table = DatasetTable.model_validate(TABLE)
+
+        table.append(Dataset(parameters={"molname": "LiH", "basis": "STO-3G"}))
+
+        assert table.model_dump(
+            mode="json", by_alias=True, context={"columnar": True}
+        ) == {
+            "dataUrl": [*TABLE["dataUrl"], None],
+            "parameters": {
+                "molname": ["H2", "H2", "LiH"],
+                "bondlength": ["0.5", None, None],
+                "basis": [None, None, "STO-3G"],
+            },
+            "extra": [{"terms": "Z0"}, {}, {}],
+        }
+
+    @pytest.mark.parametrize(
+        "table, match",
+        [
+            ({**TABLE, "dataUrl": ["https://datasets.com/0.h5"]}, "same length"),
+            ({**TABLE, "dataUrl": ["not a url", None]}, "URL"),
+            ({**TABLE, "parameters": {"not-an-identifier": ["a", "b"]}}, "identifier"),
+        ],
+    )
+    def test_validate_invalid(self, table, match):
+        """Test that columns of different lengths, invalid URLs and invalid
+        parameter names are rejected."""
+        with pytest.raises(pydantic.ValidationError, match=match):
+            DatasetTable.model_validate(table)
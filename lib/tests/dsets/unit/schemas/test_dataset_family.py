@@ -8,6 +8,7 @@ from dsets.schemas import (
     DatasetClass,
     DatasetFamily,
     DatasetParameter,
+    DatasetTable,
 )
 
 
@@ -142,3 +143,23 @@ class TestDatasetFamily:
         assert DatasetFamily.model_validate_json(self.JSON).model_dump(
             mode="json", exclude_unset=True, by_alias=True
         ) == json.loads(self.JSON)
+
+    def test_validate_json_table(self):
+        """Test that 'data' may be a ``DatasetTable``, and that it is dumped as
+        a list of datasets."""
+        family_json = json.loads(self.JSON)
+        family_json["data"] = {
+            "dataUrl": ["https://pennylane.ai/datasets/h2.h5"],
+            "parameters": {"molname": ["h2"], "bond_length": ["0.5"]},
+        }
+
+        family = DatasetFamily.model_validate(family_json)
+
+        assert isinstance(family.data, DatasetTable)
+        assert family.model_dump(mode="json", by_alias=True)["data"] == [
+            {
+                "dataUrl": "https://pennylane.ai/datasets/h2.h5",
+                "parameters": {"molname": "h2", "bond_length": "0.5"},
+                "extra": {},
+            }
+        ]